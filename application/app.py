@@ -1,17 +1,34 @@
-import csv
+import atexit
+import json
 import logging
+import os
 
-import pandas as pd
-import requests
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+
+from booking_store import DEFAULT_NAMESPACE, create_store
 
 app = Flask(__name__)
 path_to_csv_isolated = '../data/bookings_isolated.csv'
 path_to_csv = '../data/bookings.csv'
+path_to_db = '../data/bookings.db'
+
+# Storage backend the application is started with: 'csv' (default) or 'sqlite'
+storage_backend = os.environ.get('BOOKING_BACKEND', 'csv')
+# Requests carrying this header only see and change the bookings of the given namespace
+namespace_header = 'X-Booking-Namespace'
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+if storage_backend == 'sqlite':
+    store = create_store(storage_backend, path_to_db)
+else:
+    store = create_store(storage_backend, path_to_csv_isolated, archive_path=path_to_csv)
+atexit.register(store.close)
+
+def get_namespace():
+    return request.headers.get(namespace_header, DEFAULT_NAMESPACE)
+
 @app.route('/book_time', methods=['POST'])
 def book_time():
     # Get data from request payload
@@ -19,75 +36,60 @@ def book_time():
     project = request.json['project']
     time = request.json['time']
 
-    # Write data to CSV file
-    with open(path_to_csv_isolated, 'a', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow([employee, project, time])
+    store.book(employee, project, time, namespace=get_namespace())
 
     return 'Time booking recorded successfully.'
 
+@app.route('/book_time/batch', methods=['POST'])
+def book_time_batch():
+    # Payload is a list of bookings: [{"employee": ..., "project": ..., "time": ...}, ...]
+    try:
+        bookings = [(entry['employee'], entry['project'], entry['time']) for entry in request.json]
+    except (KeyError, TypeError):
+        return 'Every booking needs an employee, a project and a time.', 400
+
+    store.book_many(bookings, namespace=get_namespace())
+
+    return jsonify({'booked': len(bookings)})
+
+def get_filter(name):
+    # A filter can be given several times (?employee=Max&employee=Julia), one of the values has to match
+    values = [value for value in request.args.getlist(name) if value]
+    return values or None
+
+def stream_json_array(entries):
+    yield '['
+    for index, entry in enumerate(entries):
+        yield (',' if index else '') + json.dumps(entry)
+    yield ']'
+
 @app.route('/read_time', methods=['GET'])
 def read_time():
-    employee_filter = request.args.get('employee')
-    project_filter = request.args.get('project')
-    time_filter = request.args.get('time')
-    data = []
-
-    # Read data from CSV file
-    with open(path_to_csv_isolated, 'r') as csvfile:
-        reader = csv.reader(csvfile)
-        # Skip the header row (if it exists)
-        next(reader, None)
-
-        for row in reader:
-            employee, project, time = row
-            if (not employee_filter or employee_filter == employee) and \
-               (not project_filter or project_filter == project) and \
-               (not time_filter or time_filter == time):
-                data.append({
-                    'employee': employee,
-                    'project': project,
-                    'time': time
-                })
-
-    return jsonify(data)
+    employee_filter = get_filter('employee')
+    project_filter = get_filter('project')
+    time_filter = get_filter('time')
+
+    data = store.iter_read(employee_filter, project_filter, time_filter, namespace=get_namespace())
+
+    return Response(stream_json_array(data), mimetype='application/json')
+
+def get_payload_filter(payload, name):
+    # A missing, null or empty value does not filter, a time of 0 does
+    value = payload.get(name)
+    return None if value is None or value == '' else value
 
 @app.route('/delete_time', methods=['DELETE'])
 def delete_time():
-    try:
-        employee_filter = request.json['employee']
-    except:
-        employee_filter = None
-    try:
-        project_filter = request.json['project']
-    except:
-        project_filter = None
-    try:
-        time_filter = request.json['time']
-    except:
-        time_filter = None
-
-    # Read CSV file into a pandas DataFrame
-    df = pd.read_csv(path_to_csv)
-
-    # Apply filters using pandas query
-    combined_filter = ""
-    if employee_filter:
-        combined_filter += f'employee != "{employee_filter}"'
-    if project_filter:
-        if combined_filter:
-            combined_filter += ' and '
-        combined_filter += f'project != "{project_filter}"'
-    if time_filter:
-        if combined_filter:
-            combined_filter += ' and '
-        combined_filter += f'time != "{time_filter}"'
-
-    if combined_filter:
-        df = df.query(combined_filter)
-
-    # Write filtered data back to CSV file
-    df.to_csv(path_to_csv, index=False)
+    payload = request.get_json(silent=True)
+    if payload is None:
+        payload = {}
+    if not isinstance(payload, dict):
+        return 'The payload has to be an object with the filters employee, project and time.', 400
+    employee_filter = get_payload_filter(payload, 'employee')
+    project_filter = get_payload_filter(payload, 'project')
+    time_filter = get_payload_filter(payload, 'time')
+
+    store.delete(employee_filter, project_filter, time_filter, namespace=get_namespace())
 
     return 'Time entry deleted successfully.'
 
@@ -98,28 +100,54 @@ def change_time():
     project_to_change = request.json['project']
     new_time = request.json['new_time']
 
-    # Read data from CSV file and find the entry to change
-    with open(path_to_csv_isolated, 'r') as csvfile:
-        reader = csv.reader(csvfile)
-        rows = list(reader)
-
-    found = False
-    with open(path_to_csv_isolated, 'w', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(['employee', 'project', 'time'])
-
-        for row in rows:
-            employee, project, time = row
-            if employee == employee_to_change and project == project_to_change:
-                writer.writerow([employee, project, new_time])
-                found = True
-            else:
-                writer.writerow([employee, project, time])
-
-    if found:
+    if store.change(employee_to_change, project_to_change, new_time, namespace=get_namespace()):
         return 'Time entry updated successfully.'
     else:
         return 'No matching entry found for the given employee and project.', 404
 
+@app.route('/change_time/batch', methods=['PUT'])
+def change_time_batch():
+    # Payload is a list of changes: [{"employee": ..., "project": ..., "new_time": ...}, ...]
+    try:
+        changes = [(entry['employee'], entry['project'], entry['new_time']) for entry in request.json]
+    except (KeyError, TypeError):
+        return 'Every change needs an employee, a project and a new_time.', 400
+
+    changed = store.change_many(changes, namespace=get_namespace())
+    not_found = [{'employee': employee, 'project': project}
+                 for (employee, project, _), count in zip(changes, changed) if not count]
+
+    return jsonify({'updated': sum(changed), 'not_found': not_found})
+
+@app.route('/namespaces/<namespace>', methods=['DELETE'])
+def drop_namespace(namespace):
+    if namespace == DEFAULT_NAMESPACE:
+        return 'The default namespace cannot be dropped.', 400
+
+    removed = store.drop_namespace(namespace)
+
+    return jsonify({'removed': removed})
+
+@app.route('/namespaces/<namespace>/snapshot', methods=['POST'])
+def snapshot_namespace(namespace):
+    # Payload names the namespace the snapshot is stored in: {"target": ...}
+    payload = request.get_json(silent=True) or {}
+    target = payload.get('target')
+    if not target:
+        return 'A target namespace for the snapshot is required.', 400
+
+    copied = store.snapshot_namespace(namespace, target)
+
+    return jsonify({'copied': copied})
+
+@app.route('/namespaces/<namespace>/archive', methods=['POST'])
+def archive_namespace(namespace):
+    if namespace == DEFAULT_NAMESPACE:
+        return 'The default namespace cannot be archived.', 400
+
+    archived = store.archive_namespace(namespace)
+
+    return jsonify({'archived': archived})
+
 if __name__ == '__main__':
     app.run()
@@ -0,0 +1,275 @@
+"""
+Load test of the time booking application. Run from the application directory:
+
+    python benchmark.py [--backends csv sqlite] [--sizes 1000 10000 100000 1000000] [--concurrency 16]
+                        [--requests 2000] [--mix read_time=60,book_time=20,change_time=10,delete_time=10]
+
+For every backend and number of seeded bookings a fresh copy of the application is started on a temporary data
+directory and driven with the request mix. Throughput and latency percentiles per endpoint are printed and
+appended to ../data/benchmarks/api_benchmark.jsonl, so results of different backends and versions can be
+compared (python benchmark.py --compare).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+import numpy as np
+
+from booking_store import BACKENDS, create_store
+
+path_to_results = '../data/benchmarks/api_benchmark.jsonl'
+DEFAULT_MIX = {'read_time': 60, 'book_time': 20, 'change_time': 10, 'delete_time': 10}
+PERCENTILES = [50, 95, 99]
+
+
+def seed_bookings(backend, data_dir, size, seed=0, employees=1000, projects=100):
+    """
+    Creates the store of the application in data_dir with size random bookings.
+
+    Returns:
+        tuple: Employee and project names of the bookings.
+    """
+    rng = random.Random(seed)
+    employee_names = [f'employee-{index:04d}' for index in range(min(employees, size))]
+    project_names = [f'project-{index:03d}' for index in range(min(projects, size))]
+    bookings = [(rng.choice(employee_names), rng.choice(project_names), rng.randint(1, 8)) for _ in range(size)]
+
+    if backend == 'sqlite':
+        store = create_store(backend, os.path.join(data_dir, 'bookings.db'))
+    else:
+        store = create_store(backend, os.path.join(data_dir, 'bookings_isolated.csv'),
+                             archive_path=os.path.join(data_dir, 'bookings.csv'))
+    store.book_many(bookings)
+    store.close()
+    return employee_names, project_names
+
+
+def plan_requests(mix, number_of_requests, employee_names, project_names, seed=0):
+    """
+    The requests of a run as (endpoint, method, path, keyword arguments of the request), always the same for the
+    same seed.
+    """
+    rng = random.Random(seed)
+    endpoints = rng.choices(list(mix), weights=list(mix.values()), k=number_of_requests)
+    requests = []
+    for endpoint in endpoints:
+        employee, project, time = rng.choice(employee_names), rng.choice(project_names), rng.randint(1, 8)
+        if endpoint == 'read_time':
+            requests.append((endpoint, 'GET', '/read_time', {'params': {'employee': employee}}))
+        elif endpoint == 'book_time':
+            requests.append((endpoint, 'POST', '/book_time',
+                             {'json': {'employee': employee, 'project': project, 'time': time}}))
+        elif endpoint == 'change_time':
+            requests.append((endpoint, 'PUT', '/change_time',
+                             {'json': {'employee': employee, 'project': project, 'new_time': time}}))
+        elif endpoint == 'delete_time':
+            requests.append((endpoint, 'DELETE', '/delete_time',
+                             {'json': {'employee': employee, 'project': project, 'time': time}}))
+        else:
+            raise ValueError(f"Unknown endpoint '{endpoint}'")
+    return requests
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_application(backend, data_dir, port, timeout=600):
+    """
+    Starts the application on the data directory (as ../data of its working directory).
+
+    Returns:
+        tuple: The process and the seconds until it accepted the first connection.
+    """
+    work_dir = os.path.join(os.path.dirname(data_dir), 'application')
+    os.makedirs(work_dir, exist_ok=True)
+    environment = dict(os.environ, BOOKING_BACKEND=backend,
+                       PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-c', f'from app import app; app.run(host="127.0.0.1", port={port}, threaded=True)'],
+        cwd=work_dir, env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f'The application exited with code {process.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return process, time.perf_counter() - started
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise TimeoutError('The application did not start')
+
+
+async def drive(base_url, requests, concurrency):
+    """
+    Sends the requests with concurrency clients.
+
+    Returns:
+        tuple: Latencies and failed requests by endpoint, total seconds.
+    """
+    latencies = {endpoint: [] for endpoint, _, _, _ in requests}
+    errors = dict.fromkeys(latencies, 0)
+    iterator = iter(requests)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def client():
+            for endpoint, method, path, kwargs in iterator:
+                started = time.perf_counter()
+                try:
+                    async with session.request(method, base_url + path, **kwargs) as response:
+                        await response.read()
+                        # change_time answers 404 if there is nothing to change
+                        if response.status >= 500 or (response.status >= 400 and endpoint != 'change_time'):
+                            errors[endpoint] += 1
+                except aiohttp.ClientError:
+                    errors[endpoint] += 1
+                latencies[endpoint].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[client() for _ in range(concurrency)])
+        return latencies, errors, time.perf_counter() - started
+
+
+def summarize(latencies, errors, duration):
+    summary = {}
+    for endpoint, values in latencies.items():
+        values = np.array(values) * 1000
+        summary[endpoint] = {
+            'requests': len(values),
+            'errors': errors[endpoint],
+            'throughput': round(len(values) / duration, 2),
+            'mean_ms': round(float(values.mean()), 3),
+            **{f'p{percentile}_ms': round(float(np.percentile(values, percentile)), 3)
+               for percentile in PERCENTILES},
+        }
+    return summary
+
+
+def git_version():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmark(backend, size, concurrency=16, number_of_requests=2000, mix=None, seed=0):
+    """
+    Seeds size bookings, starts the application with the backend and measures the request mix.
+
+    Returns:
+        dict: The result, see summarize() for the entries of every endpoint.
+    """
+    mix = mix or DEFAULT_MIX
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = os.path.join(tmp, 'data')
+        os.makedirs(data_dir)
+        started = time.perf_counter()
+        employee_names, project_names = seed_bookings(backend, data_dir, size, seed)
+        seed_seconds = time.perf_counter() - started
+
+        port = free_port()
+        process, startup_seconds = start_application(backend, data_dir, port)
+        try:
+            requests = plan_requests(mix, number_of_requests, employee_names, project_names, seed)
+            latencies, errors, duration = asyncio.run(drive(f'http://127.0.0.1:{port}', requests, concurrency))
+        finally:
+            process.terminate()
+            process.wait()
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'version': git_version(),
+        'python': platform.python_version(),
+        'backend': backend,
+        'bookings': size,
+        'concurrency': concurrency,
+        'requests': number_of_requests,
+        'mix': mix,
+        'seed': seed,
+        'seed_seconds': round(seed_seconds, 3),
+        'startup_seconds': round(startup_seconds, 3),
+        'duration_seconds': round(duration, 3),
+        'throughput': round(number_of_requests / duration, 2),
+        'endpoints': summarize(latencies, errors, duration),
+    }
+
+
+def store_result(result, path=path_to_results):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as results_file:
+        results_file.write(json.dumps(result) + '\n')
+
+
+def print_result(result):
+    print(f"\n{result['backend']} with {result['bookings']} bookings, {result['concurrency']} clients: "
+          f"{result['throughput']} requests/s (startup {result['startup_seconds']}s)")
+    print(f"{'endpoint':<12} {'requests':>8} {'errors':>6} {'req/s':>9} {'mean ms':>9} " +
+          ' '.join(f"{f'p{percentile} ms':>9}" for percentile in PERCENTILES))
+    for endpoint, values in sorted(result['endpoints'].items()):
+        print(f"{endpoint:<12} {values['requests']:>8} {values['errors']:>6} {values['throughput']:>9} "
+              f"{values['mean_ms']:>9} " + ' '.join(f"{values[f'p{percentile}_ms']:>9}" for percentile in PERCENTILES))
+
+
+def compare_results(path=path_to_results):
+    """
+    Prints the p95 latency per endpoint of the latest result of every version, backend and size.
+    """
+    import pandas as pd
+
+    rows = []
+    with open(path, 'r') as results_file:
+        for line in results_file:
+            result = json.loads(line)
+            for endpoint, values in result['endpoints'].items():
+                rows.append({'version': result['version'], 'backend': result['backend'],
+                             'bookings': result['bookings'], 'concurrency': result['concurrency'],
+                             'endpoint': endpoint, 'p95_ms': values['p95_ms'], 'timestamp': result['timestamp']})
+    results = pd.DataFrame(rows).sort_values('timestamp')
+    results = results.groupby(['version', 'backend', 'bookings', 'concurrency', 'endpoint']).last()
+    print(results['p95_ms'].unstack('endpoint').to_string())
+
+
+def parse_mix(value):
+    mix = {}
+    for entry in value.split(','):
+        endpoint, weight = entry.split('=')
+        mix[endpoint.strip()] = float(weight)
+    return mix
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test of the time booking application.')
+    parser.add_argument('--backends', nargs='+', default=BACKENDS, choices=BACKENDS)
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000],
+                        help='Numbers of seeded bookings, e.g. 1000 10000 100000 1000000')
+    parser.add_argument('--concurrency', type=int, default=16, help='Number of concurrent clients')
+    parser.add_argument('--requests', type=int, default=2000, help='Number of requests per run')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='Weights of the endpoints, e.g. read_time=60,book_time=20,change_time=10,delete_time=10')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--compare', action='store_true', help='Only print the stored results')
+    arguments = parser.parse_args()
+
+    if arguments.compare:
+        compare_results()
+    else:
+        for backend in arguments.backends:
+            for size in arguments.sizes:
+                result = run_benchmark(backend, size, arguments.concurrency, arguments.requests, arguments.mix,
+                                       arguments.seed)
+                store_result(result)
+                print_result(result)
@@ -0,0 +1,538 @@
+import csv
+import json
+import os
+import threading
+from collections import defaultdict
+
+CSV_HEADER = ['employee', 'project', 'time']
+BACKENDS = ['csv', 'sqlite']
+# Namespace of the bookings that are persisted to the configured file, other namespaces are scratch space
+DEFAULT_NAMESPACE = ''
+
+
+class BookingStore:
+    """
+    Interface of the storage backends used by the time booking application.
+
+    Filters which are None match every booking, a filter can also be a list of values of which one has to
+    match. All values are stored and returned as strings.
+
+    Bookings are partitioned by namespace: every operation only sees the bookings of its namespace, so
+    parallel evaluation workers do not interfere with each other.
+    """
+
+    def book(self, employee, project, time, namespace=DEFAULT_NAMESPACE):
+        raise NotImplementedError
+
+    def book_many(self, bookings, namespace=DEFAULT_NAMESPACE):
+        """
+        Adds several bookings at once.
+
+        Parameters:
+            bookings (list): A list of (employee, project, time) tuples.
+            namespace (str): Namespace the bookings are added to.
+        """
+        for employee, project, time in bookings:
+            self.book(employee, project, time, namespace=namespace)
+
+    def read(self, employee=None, project=None, time=None, namespace=DEFAULT_NAMESPACE):
+        raise NotImplementedError
+
+    def iter_read(self, employee=None, project=None, time=None, namespace=DEFAULT_NAMESPACE):
+        """
+        Yields the bookings of read() one by one, so a response can be written while they are read. The bookings
+        are those matching when the iteration starts.
+        """
+        yield from self.read(employee, project, time, namespace=namespace)
+
+    def change(self, employee, project, new_time, namespace=DEFAULT_NAMESPACE):
+        raise NotImplementedError
+
+    def change_many(self, changes, namespace=DEFAULT_NAMESPACE):
+        """
+        Applies several changes at once.
+
+        Parameters:
+            changes (list): A list of (employee, project, new_time) tuples.
+            namespace (str): Namespace of the changed bookings.
+
+        Returns:
+            list: The number of changed bookings for every change.
+        """
+        return [self.change(employee, project, new_time, namespace=namespace)
+                for employee, project, new_time in changes]
+
+    def delete(self, employee=None, project=None, time=None, namespace=DEFAULT_NAMESPACE):
+        raise NotImplementedError
+
+    def drop_namespace(self, namespace):
+        """
+        Removes all bookings of a namespace.
+
+        Returns:
+            int: Number of removed bookings.
+        """
+        raise NotImplementedError
+
+    def snapshot_namespace(self, namespace, target):
+        """
+        Copies the bookings of a namespace into the target namespace, replacing its bookings.
+
+        Returns:
+            int: Number of copied bookings.
+        """
+        raise NotImplementedError
+
+    def archive_namespace(self, namespace):
+        """
+        Removes a namespace from the active bookings and keeps its bookings in the archive.
+
+        Returns:
+            int: Number of archived bookings.
+        """
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def create_store(backend, path, archive_path=None):
+    """
+    Creates the storage backend the application is started with.
+
+    Parameters:
+        backend (str): One of BACKENDS.
+        path (str): CSV file or SQLite database the bookings are stored in.
+        archive_path (str, optional): CSV file archived namespaces are appended to (CSV backend only).
+
+    Returns:
+        BookingStore: The opened store.
+    """
+    if backend == 'csv':
+        return CsvBookingStore(path, archive_path=archive_path)
+    if backend == 'sqlite':
+        from sqlite_store import SqliteBookingStore
+        return SqliteBookingStore(path)
+    raise ValueError(f"Unknown storage backend '{backend}', expected one of {BACKENDS}")
+
+
+def filter_values(value):
+    """
+    Normalizes a filter to None (match everything) or a tuple of strings of which one has to match.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple, set)):
+        return tuple(str(item) for item in value)
+    return (str(value),)
+
+
+class _Partition:
+    """
+    Bookings of one namespace, indexed by employee, project and (employee, project).
+
+    A partition can be shared by several namespaces (snapshots) and the archive writer, refs counts them.
+    Shared partitions are copied before they are changed.
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.by_employee = defaultdict(set)
+        self.by_project = defaultdict(set)
+        self.by_pair = defaultdict(set)
+        self.next_id = 0
+        self.refs = 1
+
+    def copy(self):
+        partition = _Partition()
+        partition.rows = dict(self.rows)
+        for name in ('by_employee', 'by_project', 'by_pair'):
+            getattr(partition, name).update((key, set(ids)) for key, ids in getattr(self, name).items())
+        partition.next_id = self.next_id
+        return partition
+
+    def insert(self, row):
+        row_id = self.next_id
+        employee, project, _ = row
+        self.rows[row_id] = row
+        self.by_employee[employee].add(row_id)
+        self.by_project[project].add(row_id)
+        self.by_pair[(employee, project)].add(row_id)
+        self.next_id += 1
+        return row_id
+
+    def remove(self, row_id):
+        employee, project, _ = self.rows.pop(row_id)
+        for index, key in ((self.by_employee, employee), (self.by_project, project),
+                           (self.by_pair, (employee, project))):
+            ids = index[key]
+            ids.discard(row_id)
+            if not ids:
+                del index[key]
+
+    def set_time(self, ids, new_time):
+        for row_id in ids:
+            self.rows[row_id] = self.rows[row_id][:2] + (new_time,)
+
+    def pair_ids(self, employee, project):
+        return sorted(self.by_pair.get((employee, project), ()))
+
+    def matching_ids(self, employee, project, time):
+        employees, projects, times = filter_values(employee), filter_values(project), filter_values(time)
+        if employees is not None and projects is not None:
+            ids = self._union(self.by_pair, [(e, p) for e in employees for p in projects])
+        elif employees is not None:
+            ids = self._union(self.by_employee, employees)
+        elif projects is not None:
+            ids = self._union(self.by_project, projects)
+        else:
+            ids = self.rows.keys()
+        if times is not None:
+            ids = [row_id for row_id in ids if self.rows[row_id][2] in times]
+        return sorted(ids)
+
+    def sorted_rows(self):
+        return [self.rows[row_id] for row_id in sorted(self.rows)]
+
+    @staticmethod
+    def _union(index, keys):
+        if len(keys) == 1:
+            return index.get(keys[0], ())
+        ids = set()
+        for key in keys:
+            ids.update(index.get(key, ()))
+        return ids
+
+
+class CsvBookingStore(BookingStore):
+    """
+    In-memory booking store that persists to a CSV file.
+
+    All bookings are kept in memory and indexed by employee, project and (employee, project), so requests
+    do not have to scan the file. Every change is applied in memory first and written to disk by a
+    background thread (write-behind):
+        - new bookings are appended to the CSV file, the position of a row in the file is its id
+        - changes and deletions are appended to a journal next to the CSV file (<path>.journal)
+    Once the journal grows past compact_threshold entries (or on flush/close) the CSV file is rewritten
+    from memory and the journal is truncated, so the CSV file keeps the format employee,project,time.
+
+    Only the default namespace is persisted, all other namespaces live in memory. Snapshots share the
+    bookings of their source until one of them is changed, archived namespaces are appended to the CSV file
+    archive_path by the background thread, so both are O(1) for the caller.
+    If the CSV file is modified by someone else while the store is idle, it is reloaded.
+    """
+
+    def __init__(self, path, archive_path=None, flush_interval=0.05, compact_threshold=1000):
+        self.path = path
+        self.archive_path = archive_path
+        self.journal_path = path + '.journal'
+        self.flush_interval = flush_interval
+        self.compact_threshold = compact_threshold
+
+        self._lock = threading.RLock()
+        self._io_lock = threading.Lock()
+        self._default = _Partition()
+        self._namespaces = {}
+        self._pending_rows = []
+        self._pending_journal = []
+        self._pending_archive = []
+        self._journal_entries = 0
+        self._writing = False
+        self._disk_signature = None
+        self._closed = False
+
+        self._load()
+
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._writer = threading.Thread(target=self._write_behind, name='booking-store-writer', daemon=True)
+        self._writer.start()
+
+    # ---- public interface ----
+
+    def book(self, employee, project, time, namespace=DEFAULT_NAMESPACE):
+        """
+        Adds a new booking.
+
+        Parameters:
+            employee (str): Name of the employee.
+            project (str): Name of the project.
+            time (str|int): Booked hours.
+            namespace (str): Namespace the booking is added to.
+        """
+        self.book_many([(employee, project, time)], namespace=namespace)
+
+    def book_many(self, bookings, namespace=DEFAULT_NAMESPACE):
+        rows = [(str(employee), str(project), str(time)) for employee, project, time in bookings]
+        with self._lock:
+            partition = self._partition(namespace, create=True, write=True)
+            for row in rows:
+                partition.insert(row)
+            if partition is self._default:
+                self._pending_rows.extend(rows)
+                self._wakeup.set()
+
+    def read(self, employee=None, project=None, time=None, namespace=DEFAULT_NAMESPACE):
+        """
+        Returns all bookings matching the given filters, a filter which is None matches everything.
+
+        Returns:
+            list: A list of dictionaries with the keys employee, project and time.
+        """
+        with self._lock:
+            partition = self._partition(namespace)
+            if partition is None:
+                return []
+            return [dict(zip(CSV_HEADER, partition.rows[row_id]))
+                    for row_id in partition.matching_ids(employee, project, time)]
+
+    def iter_read(self, employee=None, project=None, time=None, namespace=DEFAULT_NAMESPACE):
+        # Only the matching rows are taken under the lock, they are immutable tuples, so the bookings are built
+        # and yielded without holding the lock (or a reference to the partition, which writers would copy)
+        with self._lock:
+            partition = self._partition(namespace)
+            if partition is None:
+                return
+            rows = [partition.rows[row_id] for row_id in partition.matching_ids(employee, project, time)]
+        for row in rows:
+            yield dict(zip(CSV_HEADER, row))
+
+    def change(self, employee, project, new_time, namespace=DEFAULT_NAMESPACE):
+        """
+        Sets the time of all bookings of the employee on the project.
+
+        Returns:
+            int: Number of changed bookings.
+        """
+        return self.change_many([(employee, project, new_time)], namespace=namespace)[0]
+
+    def change_many(self, changes, namespace=DEFAULT_NAMESPACE):
+        changed = []
+        with self._lock:
+            partition = self._partition(namespace, write=True)
+            for employee, project, new_time in changes:
+                if partition is None:
+                    changed.append(0)
+                    continue
+                ids = partition.pair_ids(str(employee), str(project))
+                new_time = str(new_time)
+                partition.set_time(ids, new_time)
+                if ids and partition is self._default:
+                    self._pending_journal.append({'op': 'change', 'ids': ids, 'time': new_time})
+                    self._wakeup.set()
+                changed.append(len(ids))
+        return changed
+
+    def delete(self, employee=None, project=None, time=None, namespace=DEFAULT_NAMESPACE):
+        """
+        Deletes all bookings matching the given filters. Without any filter nothing is deleted.
+
+        Returns:
+            int: Number of deleted bookings.
+        """
+        if employee is None and project is None and time is None:
+            return 0
+        with self._lock:
+            partition = self._partition(namespace, write=True)
+            if partition is None:
+                return 0
+            ids = partition.matching_ids(employee, project, time)
+            for row_id in ids:
+                partition.remove(row_id)
+            if ids and partition is self._default:
+                self._pending_journal.append({'op': 'delete', 'ids': ids})
+                self._wakeup.set()
+        return len(ids)
+
+    def drop_namespace(self, namespace):
+        if namespace == DEFAULT_NAMESPACE:
+            raise ValueError('The default namespace cannot be dropped')
+        with self._lock:
+            partition = self._namespaces.pop(namespace, None)
+            if partition is None:
+                return 0
+            partition.refs -= 1
+        return len(partition.rows)
+
+    def snapshot_namespace(self, namespace, target):
+        if target == DEFAULT_NAMESPACE:
+            raise ValueError('The default namespace cannot be overwritten by a snapshot')
+        with self._lock:
+            partition = self._partition(namespace)
+            if partition is None:
+                partition = _Partition()
+            else:
+                partition.refs += 1
+            replaced = self._namespaces.get(target)
+            if replaced is not None:
+                replaced.refs -= 1
+            self._namespaces[target] = partition
+        return len(partition.rows)
+
+    def archive_namespace(self, namespace):
+        if namespace == DEFAULT_NAMESPACE:
+            raise ValueError('The default namespace cannot be archived')
+        with self._lock:
+            partition = self._namespaces.pop(namespace, None)
+            if partition is None:
+                return 0
+            if self.archive_path is None:
+                partition.refs -= 1
+            else:
+                # The reference of the namespace is handed to the writer, which appends the rows to the archive
+                self._pending_archive.append(partition)
+                self._wakeup.set()
+        return len(partition.rows)
+
+    def flush(self):
+        """
+        Writes all pending changes and compacts the journal into the CSV file.
+        """
+        self._write_pending(compact=True)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        self._wakeup.set()
+        self._writer.join()
+        self.flush()
+
+    def _partition(self, namespace, create=False, write=False):
+        if namespace == DEFAULT_NAMESPACE:
+            self._check_disk()
+            partition = self._default
+        else:
+            partition = self._namespaces.get(namespace)
+            if partition is None and create:
+                partition = self._namespaces[namespace] = _Partition()
+        if write and partition is not None and partition.refs > 1:
+            # Copy on write, the other references keep the unchanged bookings
+            partition.refs -= 1
+            partition = partition.copy()
+            if namespace == DEFAULT_NAMESPACE:
+                self._default = partition
+            else:
+                self._namespaces[namespace] = partition
+        return partition
+
+    # ---- persistence ----
+
+    def _load(self):
+        self._default = _Partition()
+        try:
+            with open(self.path, 'r', newline='') as csvfile:
+                reader = csv.reader(csvfile)
+                # Skip the header row (if it exists)
+                next(reader, None)
+                for row in reader:
+                    if row:
+                        self._default.insert(tuple(row))
+                    else:
+                        # keep the ids in line with the positions in the file
+                        self._default.next_id += 1
+        except FileNotFoundError:
+            self._write_csv([])
+
+        self._journal_entries = 0
+        try:
+            with open(self.journal_path, 'r') as journal:
+                for line in journal:
+                    self._apply(json.loads(line))
+                    self._journal_entries += 1
+        except FileNotFoundError:
+            pass
+        self._disk_signature = self._signature()
+
+    def _apply(self, entry):
+        ids = [row_id for row_id in entry['ids'] if row_id in self._default.rows]
+        if entry['op'] == 'delete':
+            for row_id in ids:
+                self._default.remove(row_id)
+        elif entry['op'] == 'change':
+            self._default.set_time(ids, entry['time'])
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    def _check_disk(self):
+        # Only look at the file while nothing is waiting to be written, otherwise the difference is our own
+        if self._pending_rows or self._pending_journal or self._writing:
+            return
+        if self._signature() != self._disk_signature:
+            self._load()
+            self._truncate_journal()
+
+    def _write_behind(self):
+        while not self._stop.is_set():
+            self._wakeup.wait()
+            # Give concurrent requests the chance to add their changes to the same write
+            self._stop.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._write_pending()
+
+    def _write_pending(self, compact=False):
+        with self._io_lock:
+            with self._lock:
+                compact = compact or self._journal_entries + len(self._pending_journal) >= self.compact_threshold
+                if compact and (self._journal_entries or self._pending_journal):
+                    # Renumber the remaining rows so that ids match the positions in the rewritten file
+                    rows = self._default.sorted_rows()
+                    self._default.refs -= 1
+                    self._default = _Partition()
+                    for row in rows:
+                        self._default.insert(row)
+                    new_rows, journal, rewrite = None, None, rows
+                else:
+                    new_rows, journal, rewrite = self._pending_rows, self._pending_journal, None
+                archive = self._pending_archive
+                self._pending_rows, self._pending_journal, self._pending_archive = [], [], []
+                if not new_rows and not journal and rewrite is None and not archive:
+                    return
+                self._writing = True
+
+            try:
+                if rewrite is not None:
+                    self._write_csv(rewrite)
+                    self._truncate_journal()
+                else:
+                    if new_rows:
+                        with open(self.path, 'a', newline='') as csvfile:
+                            csv.writer(csvfile).writerows(new_rows)
+                    if journal:
+                        with open(self.journal_path, 'a') as journal_file:
+                            journal_file.writelines(json.dumps(entry) + '\n' for entry in journal)
+                if archive:
+                    with open(self.archive_path, 'a', newline='') as csvfile:
+                        writer = csv.writer(csvfile)
+                        for partition in archive:
+                            writer.writerows(partition.sorted_rows())
+            finally:
+                with self._lock:
+                    for partition in archive:
+                        partition.refs -= 1
+                    if journal:
+                        self._journal_entries += len(journal)
+                    self._disk_signature = self._signature()
+                    self._writing = False
+
+    def _write_csv(self, rows):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(CSV_HEADER)
+            writer.writerows(rows)
+        os.replace(tmp_path, self.path)
+
+    def _truncate_journal(self):
+        self._journal_entries = 0
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
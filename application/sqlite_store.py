@@ -0,0 +1,196 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from booking_store import BookingStore, CSV_HEADER, DEFAULT_NAMESPACE, filter_values
+
+
+class SqliteBookingStore(BookingStore):
+    """
+    Booking store backed by a SQLite database in WAL mode.
+
+    Every request is a single indexed statement in its own transaction, so concurrent requests (also from
+    several application processes sharing the same database file) cannot corrupt the stored bookings.
+    Every request borrows a connection from a pool of at most pool_size connections and returns it when it is
+    done, so a server that starts a thread per request does not open a connection per thread. Namespaces are
+    stored in their own column, archived namespaces are moved to the table archived_bookings.
+
+    Parameters:
+        path (str): The database file.
+        timeout (float): Seconds a request waits for a lock of the database or a free connection.
+        pool_size (int): Maximum number of open connections.
+    """
+
+    _update = 'UPDATE bookings SET time = ? WHERE namespace = ? AND employee = ? AND project = ?'
+
+    def __init__(self, path, timeout=30.0, pool_size=8):
+        self.path = path
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._pool = queue.Queue(pool_size)
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+        with self._connection() as connection:
+            self._create_tables(connection)
+
+    @staticmethod
+    def _create_tables(connection):
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript('''
+            CREATE TABLE IF NOT EXISTS bookings (
+                id INTEGER PRIMARY KEY,
+                namespace TEXT NOT NULL DEFAULT '',
+                employee TEXT NOT NULL,
+                project TEXT NOT NULL,
+                time TEXT NOT NULL
+            );
+        ''')
+        columns = [column[1] for column in connection.execute('PRAGMA table_info(bookings)')]
+        if 'namespace' not in columns:
+            # Databases created before namespaces were introduced
+            connection.executescript('''
+                ALTER TABLE bookings ADD COLUMN namespace TEXT NOT NULL DEFAULT '';
+                DROP INDEX IF EXISTS bookings_employee_project;
+                DROP INDEX IF EXISTS bookings_project;
+            ''')
+        connection.executescript('''
+            CREATE TABLE IF NOT EXISTS archived_bookings (
+                id INTEGER PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                employee TEXT NOT NULL,
+                project TEXT NOT NULL,
+                time TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS bookings_namespace_employee_project ON bookings (namespace, employee, project);
+            CREATE INDEX IF NOT EXISTS bookings_namespace_project ON bookings (namespace, project);
+        ''')
+
+    def _open(self):
+        # isolation_level=None: every statement is committed on its own
+        connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        connection.execute(f'PRAGMA busy_timeout={int(self.timeout * 1000)}')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    @contextmanager
+    def _connection(self):
+        """
+        Borrows a connection from the pool. A new connection is opened as long as there are fewer than pool_size,
+        otherwise the request waits up to timeout seconds for one to be returned.
+        """
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            with self._connections_lock:
+                opened = len(self._connections) < self.pool_size
+                if opened:
+                    connection = self._open()
+                    self._connections.append(connection)
+            if not opened:
+                try:
+                    connection = self._pool.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise sqlite3.OperationalError(f'No free connection to {self.path} within {self.timeout}s') from None
+        try:
+            yield connection
+        finally:
+            self._pool.put(connection)
+
+    @staticmethod
+    @contextmanager
+    def _transaction(connection):
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    @staticmethod
+    def _where(employee, project, time, namespace):
+        # The (namespace, employee, project) index also serves lookups by employee only
+        conditions, parameters = ['namespace = ?'], [namespace]
+        for column, values in zip(CSV_HEADER, map(filter_values, (employee, project, time))):
+            if values is None:
+                continue
+            if len(values) == 1:
+                conditions.append(f'{column} = ?')
+            else:
+                conditions.append(f'{column} IN ({", ".join("?" * len(values))})')
+            parameters.extend(values)
+        return ' WHERE ' + ' AND '.join(conditions), parameters
+
+    def book(self, employee, project, time, namespace=DEFAULT_NAMESPACE):
+        with self._connection() as connection:
+            connection.execute('INSERT INTO bookings (namespace, employee, project, time) VALUES (?, ?, ?, ?)',
+                               (namespace, str(employee), str(project), str(time)))
+
+    def book_many(self, bookings, namespace=DEFAULT_NAMESPACE):
+        rows = [(namespace, str(employee), str(project), str(time)) for employee, project, time in bookings]
+        with self._connection() as connection, self._transaction(connection):
+            connection.executemany('INSERT INTO bookings (namespace, employee, project, time) VALUES (?, ?, ?, ?)',
+                                   rows)
+
+    def read(self, employee=None, project=None, time=None, namespace=DEFAULT_NAMESPACE):
+        where, parameters = self._where(employee, project, time, namespace)
+        with self._connection() as connection:
+            rows = connection.execute(f'SELECT employee, project, time FROM bookings{where} ORDER BY id', parameters)
+            return [dict(zip(CSV_HEADER, row)) for row in rows]
+
+    def iter_read(self, employee=None, project=None, time=None, namespace=DEFAULT_NAMESPACE):
+        # The connection stays borrowed until the bookings are yielded, WAL lets writers go on meanwhile
+        where, parameters = self._where(employee, project, time, namespace)
+        with self._connection() as connection:
+            for row in connection.execute(f'SELECT employee, project, time FROM bookings{where} ORDER BY id',
+                                          parameters):
+                yield dict(zip(CSV_HEADER, row))
+
+    def change(self, employee, project, new_time, namespace=DEFAULT_NAMESPACE):
+        with self._connection() as connection:
+            return connection.execute(self._update, (str(new_time), namespace, str(employee), str(project))).rowcount
+
+    def change_many(self, changes, namespace=DEFAULT_NAMESPACE):
+        with self._connection() as connection, self._transaction(connection):
+            return [connection.execute(self._update, (str(new_time), namespace, str(employee), str(project))).rowcount
+                    for employee, project, new_time in changes]
+
+    def delete(self, employee=None, project=None, time=None, namespace=DEFAULT_NAMESPACE):
+        if employee is None and project is None and time is None:
+            return 0
+        where, parameters = self._where(employee, project, time, namespace)
+        with self._connection() as connection:
+            return connection.execute(f'DELETE FROM bookings{where}', parameters).rowcount
+
+    def drop_namespace(self, namespace):
+        if namespace == DEFAULT_NAMESPACE:
+            raise ValueError('The default namespace cannot be dropped')
+        with self._connection() as connection:
+            return connection.execute('DELETE FROM bookings WHERE namespace = ?', (namespace,)).rowcount
+
+    def snapshot_namespace(self, namespace, target):
+        if target == DEFAULT_NAMESPACE:
+            raise ValueError('The default namespace cannot be overwritten by a snapshot')
+        with self._connection() as connection, self._transaction(connection):
+            connection.execute('DELETE FROM bookings WHERE namespace = ?', (target,))
+            return connection.execute('INSERT INTO bookings (namespace, employee, project, time) '
+                                      'SELECT ?, employee, project, time FROM bookings WHERE namespace = ? ORDER BY id',
+                                      (target, namespace)).rowcount
+
+    def archive_namespace(self, namespace):
+        if namespace == DEFAULT_NAMESPACE:
+            raise ValueError('The default namespace cannot be archived')
+        with self._connection() as connection, self._transaction(connection):
+            connection.execute('INSERT INTO archived_bookings (namespace, employee, project, time) '
+                               'SELECT namespace, employee, project, time FROM bookings WHERE namespace = ? ORDER BY id',
+                               (namespace,))
+            return connection.execute('DELETE FROM bookings WHERE namespace = ?', (namespace,)).rowcount
+
+    def close(self):
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+            self._pool = queue.Queue(self.pool_size)
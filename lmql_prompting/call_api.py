@@ -1,31 +1,117 @@
 import asyncio
-import os
+import contextvars
+import threading
+import time
 
+import aiohttp
 import lmql
-from data.descriptions.book_time import instruction
 import requests
-import re
 import json
-from lmql.lib.actions import reAct, calc, wiki
-
-# Get the current working directory
-current_dir = os.getcwd()
-
-# Create relative paths
-csv_data_path = "../data/test_data.csv"
-csv_use_case_path = "../data/use_cases.csv"
-csv_types_path = "../data/data_types.csv"
-csv_bookings_isolated_path = "../data/bookings_isolated.csv"
-csv_bookings_path = "../data/bookings.csv"
-csv_results = "../data/results.csv"
-csv_results_lmql = "../data/results_lmql.csv"
-base_url = 'http://127.0.0.1:5000'
-endpoint_book = '/book_time'
-endpoint_read = '/read_time'
-endpoint_delete = '/delete_time'
-endpoint_change = '/change_time'
-provided_endpoints = ['book_time', 'read_time', 'delete_time']
-optional_endpoints = ['read_time']
+from lmql.lib.actions import reAct
+from lmql_prompting.streaming import streamed_tool
+from lmql_prompting.settings import csv_data_path, csv_use_case_path, csv_types_path, csv_bookings_isolated_path, \
+    csv_bookings_path, csv_results, csv_results_lmql, jsonl_results_lmql, jsonl_run_manifest, sqlite_response_cache, \
+    data_run_dirs, trace_dir, report_cache_dir, base_url, endpoint_book, endpoint_read, endpoint_delete, \
+    endpoint_change, endpoint_namespaces, namespace_header, provided_endpoints, optional_endpoints
+from lmql_prompting.tracing import record_http, trace_tool
+
+# Connection pool shared by all tool calls, so concurrent queries reuse keep-alive connections
+http_timeout = aiohttp.ClientTimeout(total=30, connect=5)
+http_pool_size = 100
+http_keepalive_timeout = 60
+_http_loop = None
+_http_session = None
+_http_lock = threading.Lock()
+
+# Booking namespace of the test case that is currently evaluated, None uses the default namespace
+booking_namespace = contextvars.ContextVar('booking_namespace', default=None)
+
+
+def get_http_loop():
+    """
+    Returns the event loop the shared HTTP session runs on, it is started on first use.
+
+    aiohttp sessions are bound to the event loop they are created in, while LMQL runs every synchronous
+    query in a new event loop (and evaluation workers run queries in several threads). All requests are
+    therefore sent from one background loop, so every query uses the same connection pool.
+    """
+    global _http_loop, _http_session
+    with _http_lock:
+        if _http_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='http-client', daemon=True).start()
+
+            async def create_session():
+                connector = aiohttp.TCPConnector(limit=http_pool_size, keepalive_timeout=http_keepalive_timeout)
+                return aiohttp.ClientSession(connector=connector, timeout=http_timeout)
+
+            _http_session = asyncio.run_coroutine_threadsafe(create_session(), loop).result()
+            _http_loop = loop
+        return _http_loop
+
+
+async def http_request(method, url, read_json=False, **kwargs):
+    """
+    Sends a request with the shared HTTP session, can be awaited from any event loop.
+
+    Returns:
+        tuple: The status code and, if read_json is set and the request was successful, the JSON response.
+    """
+    async def send():
+        async with _http_session.request(method, url, **kwargs) as response:
+            data = await response.json() if read_json and response.status == 200 else None
+            return response.status, data
+
+    loop = get_http_loop()
+    started = time.perf_counter()
+    status, data = await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(send(), loop))
+    record_http(status, time.perf_counter() - started)
+    return status, data
+
+
+def close_session():
+    """
+    Closes the shared HTTP session and stops its event loop.
+    """
+    global _http_loop, _http_session
+    with _http_lock:
+        if _http_loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(_http_session.close(), _http_loop).result()
+        _http_loop.call_soon_threadsafe(_http_loop.stop)
+        _http_loop, _http_session = None, None
+
+
+def namespace_headers():
+    namespace = booking_namespace.get()
+    return {namespace_header: namespace} if namespace is not None else {}
+
+
+async def drop_namespace(namespace):
+    """
+    Removes all bookings of the given namespace from the application.
+    """
+    status, _ = await http_request('DELETE', base_url + endpoint_namespaces + namespace)
+    if status != 200:
+        raise RuntimeError(f"Dropping the namespace {namespace} failed with status code: {status}")
+
+
+async def archive_namespace(namespace):
+    """
+    Moves all bookings of the given namespace to the archive of the application (bookings.csv).
+    """
+    status, _ = await http_request('POST', base_url + endpoint_namespaces + namespace + '/archive')
+    if status != 200:
+        raise RuntimeError(f"Archiving the namespace {namespace} failed with status code: {status}")
+
+
+def to_query_params(json_q):
+    # aiohttp only accepts strings as query values, lists are sent as repeated parameters
+    params = []
+    for key, value in json_q.items():
+        for item in value if isinstance(value, list) else [value]:
+            params.append((key, str(item)))
+    return params
 
 
 def make_request(params=None):
@@ -39,6 +125,11 @@ def make_request(params=None):
         print(f"Request failed with status code: {response.status_code}")
 
 
+# Model and decoder of reAct_booking, part of the key of its cached responses
+reAct_booking_config = {'model': 'openai/gpt-3.5-turbo', 'decoder': 'argmax',
+                        'tools': ['book_time', 'read_time', 'delete_time']}
+
+
 @lmql.query
 def reAct_booking(content, few_shot_examples):
     '''lmql
@@ -57,6 +148,7 @@ def reAct_booking(content, few_shot_examples):
     '''
 
 
+@streamed_tool
 async def read_time(q: str, lookup=None):
     """
     Returns values in the local database which match the parameters.
@@ -64,21 +156,22 @@ async def read_time(q: str, lookup=None):
     Example: read_time('{"employee": "Max"}')
     Result: [{'employee': 'Max', 'project': 'Bachelor Thesis', 'time': '7'}]
     """
-    try:
+    with trace_tool('read_time'):
         try:
-            json_q = json.loads(q)
+            try:
+                json_q = json.loads(q)
+            except:
+                return "You did not provide a String that can be converted to a JSON Object"
+            status, data = await http_request('GET', base_url + endpoint_read, read_json=True,
+                                              params=to_query_params(json_q), headers=namespace_headers())
+            if status != 200:
+                return f"The response status code of the request is: {status}"
+            return str(data)
         except:
-            return "You did not provide a String that can be converted to a JSON Object"
-        response = requests.get(base_url + endpoint_read, params=json_q)
-        if response.status_code == 200:
-            data = response.json()
-        else:
-            return f"The response status code of the request is: {response.status_code}"
-        return str(data)
-    except:
-        return "No results (try differently)"
+            return "No results (try differently)"
 
 
+@streamed_tool
 async def book_time(q: str, lookup=None):
     """
     Adds new booking entry in the local database.
@@ -86,19 +179,22 @@ async def book_time(q: str, lookup=None):
     Example: book_time('{"employee": "Max", "project": "test_project","time": 5}')
     Result: "book time: 200"
     """
-    try:
+    with trace_tool('book_time'):
         try:
-            json_q = json.loads(q)
+            try:
+                json_q = json.loads(q)
+            except:
+                return "You did not provide a String that can be converted to a JSON Object"
+            status, _ = await http_request('POST', base_url + endpoint_book, json=json_q,
+                                           headers=namespace_headers())
+            if status != 200:
+                return f"The response status code of the request is: {status}"
+            return "book time: 200"
         except:
-            return "You did not provide a String that can be converted to a JSON Object"
-        response = requests.post(base_url + endpoint_book, json=json_q)
-        if response.status_code != 200:
-            return f"The response status code of the request is: {response.status_code}"
-        return "book time: 200"
-    except:
-        return "The booking did not work correctly"
+            return "The booking did not work correctly"
 
 
+@streamed_tool
 async def delete_time(q: str, lookup=None):
     """
     Deletes all entries in the local database that match the given parameters.
@@ -106,14 +202,16 @@ async def delete_time(q: str, lookup=None):
     Example: delete_time('{"employee": "Max", "project": "test_project","time": 5}')
     Result: delete time: 200
     """
-    try:
+    with trace_tool('delete_time'):
         try:
-            json_q = json.loads(q)
+            try:
+                json_q = json.loads(q)
+            except:
+                return "You did not provide a String that can be converted to a JSON Object"
+            status, _ = await http_request('DELETE', base_url + endpoint_delete, json=json_q,
+                                           headers=namespace_headers())
+            if status != 200:
+                return f"The response status code of the request is: {status}"
+            return "delete time: 200"
         except:
-            return "You did not provide a String that can be converted to a JSON Object"
-        response = requests.delete(base_url + endpoint_delete, json=json_q)
-        if response.status_code != 200:
-            return f"The response status code of the request is: {response.status_code}"
-        return "delete time: 200"
-    except:
-        return "The deletion did not work correctly"
+            return "The deletion did not work correctly"
@@ -1,5 +1,9 @@
 import lmql
 
+# Model and decoder of compare_reasoning, part of the key of its cached responses
+compare_reasoning_config = {'model': 'openai/text-davinci-003', 'decoder': 'argmax'}
+
+
 @lmql.query
 def compare_reasoning(solution, result):
     '''lmql
@@ -0,0 +1,31 @@
+from lmql_prompting.call_api import reAct_booking
+from lmql_prompting.evaluate_reasoning import compare_reasoning
+from lmql_prompting.generate_data import generate_prompt
+from lmql_prompting.streaming import StreamOutputWriter, current_stream
+
+
+class LMQLBackend:
+    """
+    Runs the LMQL queries with the OpenAI models, the default backend.
+    """
+    name = 'lmql'
+    call_tools = True
+
+    def config(self, config):
+        """
+        Config the results of a query are cached under, see ResponseCache.
+        """
+        return config
+
+    def reAct_booking(self, content, few_shot_examples):
+        if current_stream.get() is not None:
+            # the stream gets the reasoning while it is generated, not only the tool calls
+            return reAct_booking(content, few_shot_examples, output_writer=StreamOutputWriter())
+        return reAct_booking(content, few_shot_examples)
+
+    def compare_reasoning(self, solution, result):
+        return compare_reasoning(solution, result)
+
+    def generate_prompt(self, use_case, new_actions):
+        # LMQL cannot compile subscripts like use_case['Prompt'] in a query string, the prompt is passed on its own
+        return generate_prompt(use_case['Prompt'], new_actions)
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from lmql import LMQLResult
+
+
+class ResponseCache:
+    """
+    On-disk cache for the results of LMQL queries.
+
+    Results are stored in a SQLite file under the SHA-256 of (query name, model, decoding parameters, inputs),
+    so a rerun with identical inputs is answered locally. Once the stored results exceed max_bytes the least
+    recently used ones are evicted. Note that a cached query does not run its tools again, e.g. a cached
+    reAct_booking makes no bookings.
+
+    Parameters:
+        path (str): SQLite file of the cache.
+        max_bytes (int): Maximum size of the stored results.
+        enabled (bool): With False every call goes to the LLM and nothing is stored.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, enabled=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = None
+        self._size = 0
+
+    def _open(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )''')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)')
+            self._size = self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        return self._connection
+
+    @staticmethod
+    def key(query, config, inputs):
+        """
+        Content address of a query call.
+
+        Parameters:
+            query (str): Name of the query.
+            config (dict): Model and decoding parameters of the query.
+            inputs (dict): Arguments of the query.
+        """
+        content = json.dumps({'query': query, 'config': config, 'inputs': inputs}, sort_keys=True, default=str)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            connection = self._open()
+            row = connection.execute('SELECT value FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            connection.execute('UPDATE responses SET last_used = ? WHERE key = ?', (time.time(), key))
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, key, value):
+        value = json.dumps(value, default=str)
+        with self._lock:
+            connection = self._open()
+            old = connection.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            connection.execute('INSERT OR REPLACE INTO responses (key, value, size, last_used) VALUES (?, ?, ?, ?)',
+                               (key, value, len(value), time.time()))
+            self._size += len(value) - (old[0] if old else 0)
+            while self._size > self.max_bytes:
+                evicted = connection.execute('SELECT key, size FROM responses ORDER BY last_used LIMIT 100').fetchall()
+                if not evicted:
+                    break
+                connection.executemany('DELETE FROM responses WHERE key = ?', [(key,) for key, _ in evicted])
+                self._size -= sum(size for _, size in evicted)
+
+    def load(self, query, config, inputs):
+        """
+        Returns the cached result of a query call as LMQLResult, None if it is not cached or the cache is disabled.
+
+        Parameters:
+            query, config, inputs: See key().
+        """
+        if not self.enabled:
+            return None
+        cached = self.get(self.key(query, config, inputs))
+        return None if cached is None else LMQLResult(cached['prompt'], cached['variables'])
+
+    def save(self, query, config, inputs, result):
+        """
+        Caches the LMQLResult of a query call, see load().
+        """
+        if self.enabled:
+            self.put(self.key(query, config, inputs), {'prompt': result.prompt, 'variables': result.variables})
+
+    def cached_query(self, query, config, inputs, call):
+        """
+        Returns the cached result of the query call or runs call() and caches its result.
+
+        Parameters:
+            query, config, inputs: See key().
+            call (callable): Runs the query, returns an LMQLResult.
+
+        Returns:
+            LMQLResult: The (cached) result.
+        """
+        result = self.load(query, config, inputs)
+        if result is None:
+            result = call()
+            self.save(query, config, inputs, result)
+        return result
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'bytes': self._size}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.enabled:
+            print(f"Response cache: {self.hits} hits, {self.misses} misses")
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
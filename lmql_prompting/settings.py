@@ -0,0 +1,31 @@
+"""
+Paths and endpoints of the project, relative to the time_testing and lmql_prompting directories the scripts are
+run from. Kept apart from call_api.py, which defines the LMQL queries, so scripts that only read the data (report,
+rescore) do not have to import LMQL.
+"""
+
+# Create relative paths
+csv_data_path = "../data/test_data.csv"
+csv_use_case_path = "../data/use_cases.csv"
+csv_types_path = "../data/data_types.csv"
+csv_bookings_isolated_path = "../data/bookings_isolated.csv"
+csv_bookings_path = "../data/bookings.csv"
+csv_results = "../data/results.csv"
+csv_results_lmql = "../data/results_lmql.csv"
+jsonl_results_lmql = "../data/results_lmql.jsonl"
+jsonl_run_manifest = "../data/run_manifest.jsonl"
+sqlite_response_cache = "../data/response_cache.sqlite"
+data_run_dirs = "../data/data_run_*"
+# Results of a run re-scored by rescore.py, next to the results.csv of the run, which is never overwritten
+rescored_results_name = "results_rescored.csv"
+trace_dir = "../data/traces"
+report_cache_dir = "../data/report_cache"
+base_url = 'http://127.0.0.1:5000'
+endpoint_book = '/book_time'
+endpoint_read = '/read_time'
+endpoint_delete = '/delete_time'
+endpoint_change = '/change_time'
+endpoint_namespaces = '/namespaces/'
+namespace_header = 'X-Booking-Namespace'
+provided_endpoints = ['book_time', 'read_time', 'delete_time']
+optional_endpoints = ['read_time']
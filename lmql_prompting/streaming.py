@@ -0,0 +1,107 @@
+import asyncio
+import contextvars
+import functools
+
+from lmql.runtime.output_writer import BaseOutputWriter
+
+# Stream the running reAct_booking generation is reported to (e.g. an ActionStream), None if nothing streams
+current_stream = contextvars.ContextVar('current_stream', default=None)
+
+# Last line of the instructions reAct writes, the REASONING it returns is everything generated after it
+REACT_START = 'Now you can start reasoning.\n'
+
+
+class GenerationStopped(BaseException):
+    """
+    Raised into a running generation once its stream asked to stop, e.g. because all expected actions are done.
+
+    Like asyncio.CancelledError it is no Exception, so the except Exception around the tool calls of LMQL's reAct
+    does not turn it into an "Error. Try differently." observation.
+    """
+
+    def __init__(self, reason):
+        super().__init__(f'Generation stopped: {reason}')
+        self.reason = reason
+
+
+def stream_text(text, generated=True):
+    """
+    Reports text of the generation to the current stream, generated is False for text the model did not generate
+    (the observation of a tool).
+
+    Returns:
+        str: Why the stream wants to stop the generation, None to go on or if nothing streams.
+    """
+    stream = current_stream.get()
+    if stream is None:
+        return None
+    return stream.feed(text, generated)
+
+
+class StreamOutputWriter(BaseOutputWriter):
+    """
+    LMQL output writer that reports the reasoning of a reAct generation to the current stream while it is
+    generated. LMQL calls it with the whole prompt for every generated token, the reasoning is the part reAct
+    returns as REASONING: a line break and everything after its instructions, the Thought: text and the line that
+    is being generated included. So a generation that is stopped early keeps the text the model generated, and a
+    stop condition reached while the model writes (e.g. max_tokens) ends it with GenerationStopped right away.
+    """
+
+    def __init__(self):
+        super().__init__(allows_input=False)
+
+    async def add_interpreter_head_state(self, variable, head, prompt, where, trace, is_valid, is_final, mask,
+                                         num_tokens, program_variables):
+        stream = current_stream.get()
+        start = prompt.find(REACT_START)
+        if stream is not None and start != -1 and stream.sync('\n' + prompt[start + len(REACT_START):]) is not None:
+            raise GenerationStopped(stream.stop_reason)
+
+
+def check_stopped():
+    """
+    Raises GenerationStopped if the current stream asked to stop. Called before the next step of a generation,
+    never after a tool has run, so the side effects of a tool are always reported with its observation.
+    """
+    stream = current_stream.get()
+    if stream is not None and stream.stop_reason is not None:
+        raise GenerationStopped(stream.stop_reason)
+
+
+def streamed_tool(tool):
+    """
+    Reports the observation of every call of a reAct tool to the current stream, the generated text up to the call
+    was reported by StreamOutputWriter. The tool calls are the points where a ReAct step of an LMQL generation is
+    complete, so this is where an LMQL generation can be stopped early.
+
+    The tool that completes a stop condition still returns its observation. The query task is cancelled instead,
+    which ends the generation at its next model call with an asyncio.CancelledError that reAct does not catch.
+    A tool called after the stream asked to stop raises GenerationStopped before it runs.
+    """
+    @functools.wraps(tool)
+    async def call(q: str, lookup=None):
+        check_stopped()
+        observation = await tool(q, lookup)
+        # the observation as reAct writes it after the call
+        if stream_text(f"Observation: {observation}", generated=False) is not None:
+            asyncio.current_task().cancel()
+        return observation
+    return call
+
+
+def run_streamed(query, stream, *args):
+    """
+    Runs a blocking query (e.g. reAct_booking) with the stream as current stream.
+
+    Returns:
+        The result of the query, None if the stream stopped the generation early.
+    """
+    token = current_stream.set(stream)
+    try:
+        return query(*args)
+    except (GenerationStopped, asyncio.CancelledError):
+        if stream.stop_reason is None:
+            raise
+        return None
+    finally:
+        current_stream.reset(token)
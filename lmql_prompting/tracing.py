@@ -0,0 +1,246 @@
+import contextvars
+import functools
+import glob
+import json
+import math
+import os
+import re
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import tiktoken
+
+# Trace of the test case that is currently run, None if nothing is traced
+current_trace = contextvars.ContextVar('current_trace', default=None)
+# Tool call of the current trace that is currently running
+_current_tool_call = contextvars.ContextVar('current_tool_call', default=None)
+
+PERCENTILES = [0.5, 0.95, 0.99]
+
+
+def estimate_tokens(text):
+    """
+    Rough number of tokens of a text (about 4 characters per token), for models without tiktoken encoding.
+    """
+    return math.ceil(len(text) / 4) if text else 0
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model):
+    try:
+        # LMQL model names have the provider as prefix, e.g. openai/gpt-3.5-turbo
+        return tiktoken.encoding_for_model(model.split('/')[-1])
+    except Exception as e:
+        # unknown model, or the encoding could not be downloaded
+        print(f'No tiktoken encoding for {model}, its tokens are estimated:', e)
+        return None
+
+
+def count_tokens(text, model=None):
+    """
+    Number of tokens of a text for the model (e.g. openai/gpt-3.5-turbo), the LMQL results carry no token counts.
+    The tokens are counted with the tiktoken encoding of the model, estimated if there is none or if model is None.
+    """
+    if not text:
+        return 0
+    encoding = _encoding(model) if model else None
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+class TokenCounter:
+    """
+    Counts the tokens of a text that grows at its end, e.g. a generation that is streamed. The text up to the last
+    line break between two characters that are no whitespace is counted once, such a line break is a token of its
+    own in the encodings of tiktoken.
+
+    Parameters:
+        model (str, optional): Model whose tokens are counted, see count_tokens().
+    """
+
+    def __init__(self, model=None):
+        self.model = model
+        self.estimated = model is None or _encoding(model) is None
+        self._counted = 0
+        self._counted_tokens = 0
+
+    def count(self, text):
+        """
+        Number of tokens of the text, which has to start with the text of the previous call.
+        """
+        if self.estimated:
+            return estimate_tokens(text)
+        end = text.rfind('\n', self._counted)
+        while end != -1 and (end == self._counted or end + 1 == len(text) or text[end - 1].isspace() or
+                             text[end + 1].isspace()):
+            end = text.rfind('\n', self._counted, end)
+        if end != -1:
+            self._counted_tokens += count_tokens(text[self._counted:end + 1], self.model)
+            self._counted = end + 1
+        return self._counted_tokens + count_tokens(text[self._counted:], self.model)
+
+
+class TestCaseTrace:
+    """
+    Timings of one test case: the attempts of the reAct_booking query and the tool calls of the last attempt.
+
+    Parameters:
+        test_data_id, use_case_id (int): Test case that is traced.
+        model (str, optional): Model of the query, its tokens are counted with count_tokens().
+    """
+
+    def __init__(self, test_data_id, use_case_id, model=None):
+        self.test_data_id = int(test_data_id)
+        self.use_case_id = int(use_case_id)
+        self.model = model
+        self.attempts = 0
+        self.started = time.perf_counter()
+        self.query_started = self.query_finished = None
+        self.tool_calls = []
+        self.stop_reason = None
+
+    def start_attempt(self):
+        self.attempts += 1
+        self.query_started = time.perf_counter()
+        self.tool_calls = []
+
+    def finish_attempt(self):
+        self.query_finished = time.perf_counter()
+
+    def steps(self, result):
+        """
+        One entry per ReAct step: the model output up to the action and the tool call of the action, the last
+        step is the final answer without tool call. Tokens are counted from the transcript, see count_tokens().
+        """
+        reasoning = result.variables.get('REASONING') or ''
+        reasoning_start = result.prompt.find(reasoning) if reasoning else -1
+        prompt = result.prompt[:reasoning_start] if reasoning_start >= 0 else result.prompt
+
+        # the model writes everything up to an observation, the observation line is the tool result
+        segments, position = [], 0
+        for observation in re.finditer(r'Observation:[^\n]*\n?', reasoning):
+            segments.append((position, observation.start()))
+            position = observation.end()
+        segments.append((position, len(reasoning)))
+
+        steps = []
+        previous_end = self.query_started
+        for index, (start, end) in enumerate(segments):
+            tool_call = self.tool_calls[index] if index < len(self.tool_calls) else None
+            finished = tool_call['started'] if tool_call else self.query_finished
+            step = {
+                'step': index,
+                'model_latency': round(finished - previous_end, 4),
+                'tokens_in': count_tokens(prompt, self.model) + count_tokens(reasoning[:start], self.model),
+                'tokens_out': count_tokens(reasoning[start:end], self.model),
+            }
+            if tool_call:
+                step.update({key: value for key, value in tool_call.items() if key != 'started'})
+                previous_end = tool_call['started'] + tool_call['tool_latency']
+            steps.append(step)
+        return steps
+
+    def to_record(self, run_id, status, result=None):
+        return {
+            'run_id': run_id,
+            'test_data_id': self.test_data_id,
+            'use_case_id': self.use_case_id,
+            'status': status,
+            'attempts': self.attempts,
+            'retries': max(self.attempts - 1, 0),
+            'latency': round(time.perf_counter() - self.started, 4),
+            'query_latency': round(self.query_finished - self.query_started, 4)
+            if self.query_finished and self.query_started else None,
+            'steps': self.steps(result) if result is not None and self.query_started else [],
+            'stop_reason': self.stop_reason,
+        }
+
+
+@contextmanager
+def trace_tool(tool):
+    """
+    Records the duration of a tool call in the current trace, if there is one.
+    """
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    tool_call = {'tool': tool, 'started': time.perf_counter()}
+    token = _current_tool_call.set(tool_call)
+    try:
+        yield
+    finally:
+        _current_tool_call.reset(token)
+        tool_call['tool_latency'] = round(time.perf_counter() - tool_call['started'], 4)
+        trace.tool_calls.append(tool_call)
+
+
+def record_http(status, latency):
+    """
+    Adds the status and duration of an HTTP request to the running tool call, if it is traced.
+    """
+    tool_call = _current_tool_call.get()
+    if tool_call is not None:
+        tool_call['http_status'] = status
+        tool_call['http_latency'] = round(latency, 4)
+
+
+class TraceWriter:
+    """
+    Appends one JSON line per test case to the trace file of a run.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def write(self, record):
+        with open(self.path, 'a', encoding='utf-8') as trace_file:
+            trace_file.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+
+def latest_trace(trace_dir):
+    """
+    Returns the most recently written trace file in trace_dir, None if there is none.
+    """
+    traces = glob.glob(os.path.join(trace_dir, '*.jsonl'))
+    return max(traces, key=os.path.getmtime) if traces else None
+
+
+def summarize_traces(path):
+    """
+    p50/p95/p99 of the test case latency, model and tool latency per step and tokens per step, by use case.
+
+    Returns:
+        DataFrame: One row per use case (and 'all'), one column per measure and percentile.
+    """
+    records = []
+    with open(path, 'r', encoding='utf-8') as trace_file:
+        for line in trace_file:
+            if line.endswith('\n'):
+                records.append(json.loads(line))
+    if not records:
+        return pd.DataFrame()
+
+    cases = pd.DataFrame([{'use_case_id': record['use_case_id'], 'latency': record['latency'],
+                           'retries': record['retries']} for record in records])
+    steps = pd.DataFrame([{'use_case_id': record['use_case_id'], **step}
+                          for record in records for step in record['steps']])
+    measures = {'latency': cases, 'retries': cases}
+    for column in ['model_latency', 'tool_latency', 'http_latency', 'tokens_in', 'tokens_out']:
+        if column in steps:
+            measures[column] = steps
+
+    summaries = []
+    for column, frame in measures.items():
+        values = frame[['use_case_id', column]].dropna()
+        by_use_case = values.groupby('use_case_id')[column].quantile(PERCENTILES).unstack()
+        overall = values[column].quantile(PERCENTILES).to_frame('all').T
+        summary = pd.concat([overall, by_use_case])
+        summary.columns = [f'{column}_p{round(percentile * 100)}' for percentile in PERCENTILES]
+        summaries.append(summary)
+    summary = pd.concat(summaries, axis=1)
+    summary.index.name = 'use_case_id'
+    return summary
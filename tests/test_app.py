@@ -0,0 +1,50 @@
+"""
+Requests to the time booking application.
+"""
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'application'))
+
+from booking_store import CsvBookingStore  # noqa: E402
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # the application opens ../data/bookings_isolated.csv on import, which has to be in tmp_path
+    (tmp_path / 'application').mkdir()
+    (tmp_path / 'data').mkdir()
+    monkeypatch.chdir(tmp_path / 'application')
+    monkeypatch.delenv('BOOKING_BACKEND', raising=False)
+    app = importlib.import_module('app')
+    app.store.close()
+    store = CsvBookingStore(str(tmp_path / 'data' / 'bookings_isolated.csv'))
+    monkeypatch.setattr(app, 'store', store)
+    store.book_many([('Max', 'AI', 0), ('Max', 'AI', 5), ('Julia', 'XYZ', 0)])
+    yield app.app.test_client()
+    store.close()
+
+
+def test_delete_time_filters_by_a_time_of_0(client):
+    response = client.delete('/delete_time', json={'employee': 'Max', 'project': '', 'time': 0})
+
+    assert response.status_code == 200
+    assert client.get('/read_time').get_json() == [{'employee': 'Max', 'project': 'AI', 'time': '5'},
+                                                   {'employee': 'Julia', 'project': 'XYZ', 'time': '0'}]
+
+
+@pytest.mark.parametrize('payload', [['Max'], 'Max', 5])
+def test_delete_time_rejects_payloads_that_are_no_object(client, payload):
+    response = client.delete('/delete_time', json=payload)
+
+    assert response.status_code == 400
+    assert len(client.get('/read_time').get_json()) == 3
+
+
+def test_delete_time_without_filters_deletes_nothing(client):
+    assert client.delete('/delete_time').status_code == 200
+    assert client.delete('/delete_time', json={'employee': None}).status_code == 200
+    assert len(client.get('/read_time').get_json()) == 3
@@ -0,0 +1,229 @@
+"""
+Storage backends of the time booking application.
+"""
+import csv
+import os
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'application'))
+
+from booking_store import CSV_HEADER, CsvBookingStore, create_store  # noqa: E402
+from sqlite_store import SqliteBookingStore  # noqa: E402
+
+BOOKINGS = [('Max', 'AI', 5), ('Julia', 'XYZ', 2), ('Max', 'XYZ', 3), ('Anna', 'AI', 8), ('Max', 'AI', 1)]
+
+
+def booking(employee, project, time):
+    return {'employee': employee, 'project': project, 'time': str(time)}
+
+
+def read_file(path):
+    with open(path, 'r', newline='') as csvfile:
+        return [tuple(row) for row in csv.reader(csvfile)]
+
+
+@pytest.fixture
+def csv_store(tmp_path):
+    # flush_interval: the writer thread does not write while a test looks at the files
+    store = CsvBookingStore(str(tmp_path / 'bookings.csv'), flush_interval=60)
+    store.book_many(BOOKINGS)
+    yield store
+    store.close()
+
+
+@pytest.fixture(params=['csv', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'csv':
+        store = CsvBookingStore(str(tmp_path / 'bookings.csv'), flush_interval=60)
+    else:
+        store = create_store('sqlite', str(tmp_path / 'bookings.db'))
+    store.book_many(BOOKINGS)
+    yield store
+    store.close()
+
+
+def test_read_uses_the_filters(store):
+    assert store.read('Max') == [booking('Max', 'AI', 5), booking('Max', 'XYZ', 3), booking('Max', 'AI', 1)]
+    assert store.read(project='AI') == [booking('Max', 'AI', 5), booking('Anna', 'AI', 8),
+                                            booking('Max', 'AI', 1)]
+    assert store.read('Max', 'AI') == [booking('Max', 'AI', 5), booking('Max', 'AI', 1)]
+    assert store.read(['Julia', 'Anna'], time=8) == [booking('Anna', 'AI', 8)]
+    assert store.read('Max', ['AI', 'XYZ'], ['1', '3']) == [booking('Max', 'XYZ', 3), booking('Max', 'AI', 1)]
+    assert store.read('Nobody') == []
+    assert len(store.read()) == len(BOOKINGS)
+
+
+def test_indexes_follow_changes_and_deletions(store):
+    assert store.change('Max', 'AI', 7) == 2
+    assert store.change('Max', 'Unknown', 7) == 0
+    assert store.delete(project='XYZ') == 2
+    assert store.delete() == 0
+    store.book('Julia', 'XYZ', 4)
+
+    assert store.read('Max') == [booking('Max', 'AI', 7), booking('Max', 'AI', 7)]
+    assert store.read(project='XYZ') == [booking('Julia', 'XYZ', 4)]
+    assert store.read(time=7) == [booking('Max', 'AI', 7), booking('Max', 'AI', 7)]
+
+
+def test_journal_is_replayed_on_load(csv_store):
+    csv_store.change('Max', 'AI', 7)
+    csv_store.delete('Julia')
+    csv_store.book('Julia', 'AI', 6)
+    csv_store._write_pending()
+
+    # new bookings are appended to the CSV file, changes and deletions only to the journal
+    assert read_file(csv_store.path) == [tuple(CSV_HEADER)] + [tuple(map(str, row)) for row in BOOKINGS] + \
+        [('Julia', 'AI', '6')]
+    assert os.path.exists(csv_store.journal_path)
+
+    reopened = CsvBookingStore(csv_store.path, flush_interval=60)
+    try:
+        assert reopened.read() == csv_store.read()
+    finally:
+        reopened.close()
+
+
+def test_compaction_rewrites_the_file(csv_store):
+    csv_store.change('Max', 'AI', 7)
+    csv_store.delete('Julia')
+    csv_store.flush()
+
+    assert read_file(csv_store.path) == [tuple(CSV_HEADER), ('Max', 'AI', '7'), ('Max', 'XYZ', '3'),
+                                         ('Anna', 'AI', '8'), ('Max', 'AI', '7')]
+    assert not os.path.exists(csv_store.journal_path)
+
+    # the ids are the positions in the rewritten file again
+    csv_store.delete('Anna')
+    csv_store.flush()
+    assert read_file(csv_store.path)[1:] == [('Max', 'AI', '7'), ('Max', 'XYZ', '3'), ('Max', 'AI', '7')]
+
+
+def test_file_changed_by_someone_else_is_reloaded(csv_store):
+    csv_store.flush()
+    with open(csv_store.path, 'a', newline='') as csvfile:
+        csv.writer(csvfile).writerow(['Tom', 'AI', '2'])
+
+    assert csv_store.read('Tom') == [booking('Tom', 'AI', 2)]
+
+
+def test_sqlite_statements_use_the_indexes(tmp_path):
+    store = SqliteBookingStore(str(tmp_path / 'bookings.db'))
+    store.close()
+    connection = sqlite3.connect(str(tmp_path / 'bookings.db'))
+    try:
+        assert connection.execute('PRAGMA journal_mode').fetchone() == ('wal',)
+        for statement, parameters in [SqliteBookingStore._where('Max', None, None, ''),
+                                      SqliteBookingStore._where('Max', 'AI', None, ''),
+                                      SqliteBookingStore._where(None, ['AI', 'XYZ'], 5, '')]:
+            plan = connection.execute('EXPLAIN QUERY PLAN DELETE FROM bookings' + statement, parameters).fetchall()
+            assert 'USING INDEX' in ' '.join(row[-1] for row in plan)
+    finally:
+        connection.close()
+
+
+def test_sqlite_requests_share_the_pooled_connections(tmp_path):
+    store = SqliteBookingStore(str(tmp_path / 'bookings.db'), pool_size=2)
+    try:
+        with ThreadPoolExecutor(16) as pool:
+            list(pool.map(lambda index: store.book(f'Employee {index % 4}', 'AI', index), range(200)))
+        assert len(store._connections) <= 2
+        assert len(store.read()) == 200
+        assert store.change_many([('Employee 0', 'AI', 1), ('Nobody', 'AI', 1)]) == [50, 0]
+        assert store.delete('Employee 1') == 50
+        assert len(store.read(time=1)) == 50
+    finally:
+        store.close()
+
+
+def test_namespaces_are_isolated(store):
+    store.book('Tom', 'AI', 2, namespace='case-1')
+    store.book('Tom', 'XYZ', 4, namespace='case-2')
+
+    assert store.read('Tom') == []
+    assert store.read('Tom', namespace='case-1') == [booking('Tom', 'AI', 2)]
+    assert store.change('Tom', 'AI', 3, namespace='case-2') == 0
+    assert store.delete('Tom', namespace='case-2') == 1
+    assert store.read(namespace='case-1') == [booking('Tom', 'AI', 2)]
+    assert store.read(namespace='unknown') == []
+    assert len(store.read()) == len(BOOKINGS)
+
+
+def test_snapshot_is_not_changed_with_its_source(store):
+    store.book_many(BOOKINGS[:2], namespace='case-1')
+
+    assert store.snapshot_namespace('case-1', 'saved') == 2
+    store.change('Max', 'AI', 9, namespace='case-1')
+    store.book('Tom', 'AI', 2, namespace='saved')
+
+    assert store.read(namespace='case-1') == [booking('Max', 'AI', 9), booking('Julia', 'XYZ', 2)]
+    assert store.read(namespace='saved') == [booking('Max', 'AI', 5), booking('Julia', 'XYZ', 2),
+                                             booking('Tom', 'AI', 2)]
+
+    # a snapshot of the default namespace, which is restored into a test case
+    assert store.snapshot_namespace('', 'case-2') == len(BOOKINGS)
+    store.delete('Max', namespace='case-2')
+    assert len(store.read('Max')) == 3
+    assert store.snapshot_namespace('saved', 'case-2') == 3
+    assert store.read(namespace='case-2') == store.read(namespace='saved')
+
+
+def test_drop_and_archive_remove_the_namespace(store):
+    store.book_many(BOOKINGS[:2], namespace='case-1')
+    store.book_many(BOOKINGS[2:], namespace='case-2')
+
+    assert store.drop_namespace('case-1') == 2
+    assert store.archive_namespace('case-2') == 3
+    assert store.read(namespace='case-1') == store.read(namespace='case-2') == []
+    assert store.drop_namespace('case-1') == 0
+    with pytest.raises(ValueError):
+        store.archive_namespace('')
+    with pytest.raises(ValueError):
+        store.snapshot_namespace('case-1', '')
+    assert len(store.read()) == len(BOOKINGS)
+
+
+def test_archived_namespaces_are_kept(tmp_path):
+    archive_path = str(tmp_path / 'archive.csv')
+    store = create_store('csv', str(tmp_path / 'bookings.csv'), archive_path=archive_path)
+    store.book_many(BOOKINGS[:2], namespace='case-1')
+    store.snapshot_namespace('case-1', 'case-2')
+    store.book('Tom', 'AI', 2, namespace='case-2')
+    store.archive_namespace('case-1')
+    store.archive_namespace('case-2')
+    store.close()
+
+    assert read_file(archive_path) == [('Max', 'AI', '5'), ('Julia', 'XYZ', '2')] * 2 + [('Tom', 'AI', '2')]
+    assert read_file(str(tmp_path / 'bookings.csv')) == [tuple(CSV_HEADER)]
+
+    store = SqliteBookingStore(str(tmp_path / 'bookings.db'))
+    store.book_many(BOOKINGS[:2], namespace='case-1')
+    store.archive_namespace('case-1')
+    store.close()
+    connection = sqlite3.connect(str(tmp_path / 'bookings.db'))
+    try:
+        assert connection.execute('SELECT namespace, employee, project, time FROM archived_bookings').fetchall() == \
+            [('case-1', 'Max', 'AI', '5'), ('case-1', 'Julia', 'XYZ', '2')]
+    finally:
+        connection.close()
+
+
+def test_sqlite_database_without_namespaces_is_migrated(tmp_path):
+    connection = sqlite3.connect(str(tmp_path / 'bookings.db'))
+    connection.executescript('''
+        CREATE TABLE bookings (id INTEGER PRIMARY KEY, employee TEXT NOT NULL, project TEXT NOT NULL,
+                               time TEXT NOT NULL);
+        CREATE INDEX bookings_employee_project ON bookings (employee, project);
+        INSERT INTO bookings (employee, project, time) VALUES ('Max', 'AI', '5');
+    ''')
+    connection.close()
+
+    store = SqliteBookingStore(str(tmp_path / 'bookings.db'))
+    try:
+        assert store.read('Max') == [booking('Max', 'AI', 5)]
+        assert store.read('Max', namespace='case-1') == []
+    finally:
+        store.close()
@@ -0,0 +1,23 @@
+"""
+Conversion of the CSV files of a run to columnar copies and back.
+"""
+import pandas as pd
+
+from time_testing.columnar import columnar_path, convert_run, export_csv, is_fresh, read_columnar
+
+
+def test_export_keeps_the_delimiter(tmp_path):
+    results = pd.DataFrame({'Use_case_id': [0, 0, 1], 'Test_data_id': [0, 0, 1], 'Correct': [True, False, True],
+                            'Action_solution': ["book_time(employee: Max, project: AI, time: 5)",
+                                                "read_time(employee: Max)", None]})
+    results.to_csv(tmp_path / 'results.csv', sep=',', index=False)
+    text = (tmp_path / 'results.csv').read_text()
+
+    assert convert_run(str(tmp_path)) == [str(tmp_path / 'results.csv')]
+    assert is_fresh(str(tmp_path / 'results.csv'))
+    assert list(read_columnar(columnar_path(str(tmp_path / 'results.csv')), ['Correct'])['Correct']) == \
+        [True, False, True]
+
+    (tmp_path / 'results.csv').unlink()
+    assert export_csv(str(tmp_path)) == [str(tmp_path / 'results.csv')]
+    assert (tmp_path / 'results.csv').read_text() == text
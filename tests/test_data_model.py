@@ -0,0 +1,29 @@
+"""
+Serialization of the test cases and score rows to the columns of test_data.csv and results.csv.
+"""
+import pandas as pd
+
+from time_testing.data_model import Action, ScoreRow, TestCase, read_test_cases
+
+ACTIONS = "['book_time(employee: Max, project: AI, time: 5)', 'read_time(employee: Max)']"
+
+
+def test_test_cases_round_trip(tmp_path):
+    test_cases = [TestCase(0, 3, 'Please book 5 hours for Max on AI.', ACTIONS, '1. book\n2. read'),
+                  TestCase(1, 3, 'Show the bookings of Max.', "['read_time(employee: Max)']", '1. read')]
+    pd.DataFrame([test_case.to_csv_row() for test_case in test_cases],
+                 columns=['Use_case_id', 'Test_data_id', 'Prompt', 'Actions', 'Reasoning']) \
+        .to_csv(tmp_path / 'test_data.csv', sep=';', index=False)
+
+    read = read_test_cases(str(tmp_path / 'test_data.csv'))
+
+    assert [test_case.to_csv_row() for test_case in read] == [test_case.to_csv_row() for test_case in test_cases]
+    assert read[0].expected_actions == [Action('book_time', 'Max', 'AI', '5'), Action('read_time', 'Max')]
+
+
+def test_score_row_writes_actions_as_dictionaries():
+    done = ScoreRow(3, 0, True, False, False, Action('book_time', 'Max', 'AI', '5'), [True] * 4)
+    missing = ScoreRow(3, 0, False, False, False, [Action('read_time', 'Max')], [False] * 4)
+
+    assert done.to_csv_row()[5] == {'endpoint': 'book_time', 'employee': 'Max', 'project': 'AI', 'time': '5'}
+    assert str(missing.to_csv_row()[5]) == "[{'endpoint': 'read_time', 'employee': 'Max'}]"
@@ -0,0 +1,41 @@
+"""
+parse_literal() reads the list and dict literals of the CSV files like ast.literal_eval().
+"""
+import ast
+
+import pytest
+
+from time_testing.literals import parse_literal
+
+LITERALS = [
+    "['book_time(employee: Julia, project: AI, time: 5)', 'read_time(employee: Julia)']",
+    '["book_time(employee: O\'Brien, project: AI, time: 5)"]',
+    "[ 'a' ,'b',  ]",
+    "[]",
+    "{'REASONING': '\\n  Thought: I book the time.\\n\\nAction: book_time(\\'{\"employee\": \"Max\"}\\')\\t\\u00e4'}",
+    "{'REASONING': 'Straße \\\\ done', \"other\": \"\"}",
+    "{}",
+    # not only strings, parsed by ast.literal_eval()
+    "[1, 2]",
+    "{'time': 5}",
+    "('a', 'b')",
+    "['a' 'b']",
+]
+
+
+@pytest.mark.parametrize('text', LITERALS)
+def test_literals_are_parsed_like_literal_eval(text):
+    assert parse_literal(text) == ast.literal_eval(text)
+
+
+def test_repr_round_trip():
+    value = {'REASONING': "Thought: it's \"quoted\"\nAction: x('\\n')\x00 ü", 'x': ''}
+
+    assert parse_literal(repr(value)) == value
+    assert parse_literal(repr(list(value.values()))) == list(value.values())
+
+
+@pytest.mark.parametrize('text', ["['a'", "['a'] + ['b']", "__import__('os')"])
+def test_no_literal_is_rejected(text):
+    with pytest.raises((ValueError, SyntaxError)):
+        parse_literal(text)
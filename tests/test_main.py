@@ -0,0 +1,60 @@
+"""
+Importing the harness compiles all LMQL queries, which LMQL rejects e.g. for subscripts in a query string.
+"""
+import asyncio
+import importlib
+
+import pandas as pd
+
+
+def test_import_main():
+    main = importlib.import_module('time_testing.main')
+
+    assert callable(main.go_through_test_data)
+    assert callable(main.generate_test_data_from_use_case)
+
+
+def test_import_benchmark_harness():
+    harness = importlib.import_module('time_testing.benchmark_harness')
+
+    assert callable(harness.run_benchmark)
+
+
+def test_failing_test_case_does_not_stop_the_run(tmp_path, monkeypatch):
+    from time_testing.mock_backend import MockBackend
+    from time_testing import main
+    from time_testing.result_sink import ResultSink
+    from time_testing.run_manifest import RunManifest
+    from time_testing.scoring import result_columns
+    from time_testing.transcript_store import TranscriptStore
+
+    test_data = pd.DataFrame({'Use_case_id': 0, 'Prompt': ['Book 5 hours for Max on AI.', 'Show the bookings of Max.',
+                                                            'Book 2 hours for Julia on XYZ.'],
+                              'Actions': ["['book_time(employee: Max, project: AI, time: 5)']",
+                                          "['read_time(employee: Max)']",
+                                          "['book_time(employee: Julia, project: XYZ, time: 2)']"]})
+    variables = ['employee', 'project', 'time']
+    evaluate = main.evaluate_actions_and_reasoning
+
+    def evaluate_or_fail(result, actions, result_actions, index, *args):
+        if index == 1:
+            raise ValueError('broken transcript')
+        return evaluate(result, actions, result_actions, index, *args)
+
+    monkeypatch.setattr(main, 'evaluate_actions_and_reasoning', evaluate_or_fail)
+    monkeypatch.setattr(main.response_cache, 'enabled', False)
+    previous = main.use_model_backend(MockBackend(test_data=test_data, call_tools=False))
+    manifest = RunManifest(str(tmp_path / 'manifest.jsonl'))
+    try:
+        with ResultSink(str(tmp_path / 'results.csv'), result_columns(variables)) as result_actions:
+            asyncio.run(main.run_test_data_concurrently(
+                test_data, False, variables, result_actions, 2, transcripts=TranscriptStore(
+                    str(tmp_path / 'results_lmql.jsonl')), trace_path=str(tmp_path / 'trace.jsonl'),
+                manifest=manifest))
+    finally:
+        main.use_model_backend(previous)
+
+    assert manifest.counts() == {'done': 2, 'failed': 1}
+    assert manifest.entries[1]['error'] == 'ValueError: broken transcript'
+    assert manifest.entries[1]['attempts'] == 1
+    assert sorted(pd.read_csv(tmp_path / 'results.csv', sep=';')['Test_data_id']) == [0, 2]
@@ -0,0 +1,33 @@
+"""
+Choice between the recorded and the re-scored results of a run.
+"""
+import pandas as pd
+
+from lmql_prompting.settings import rescored_results_name
+from time_testing.report import run_results_path
+
+
+def write_results(path, test_data_ids):
+    pd.DataFrame({'Use_case_id': 0, 'Test_data_id': test_data_ids, 'Correct': True}).to_csv(path, sep=';',
+                                                                                          index=False)
+
+
+def test_recorded_results_without_rescoring(tmp_path):
+    write_results(tmp_path / 'results.csv', [0, 0, 1])
+
+    assert run_results_path(str(tmp_path)) == str(tmp_path / 'results.csv')
+
+
+def test_rescored_results_with_the_same_rows(tmp_path):
+    write_results(tmp_path / 'results.csv', [0, 0, 1])
+    write_results(tmp_path / rescored_results_name, [0, 0, 1])
+
+    assert run_results_path(str(tmp_path)) == str(tmp_path / rescored_results_name)
+
+
+def test_rescored_results_with_other_rows_are_not_used(tmp_path, capsys):
+    write_results(tmp_path / 'results.csv', [0, 0, 1])
+    write_results(tmp_path / rescored_results_name, [0, 1])
+
+    assert run_results_path(str(tmp_path)) == str(tmp_path / 'results.csv')
+    assert 'has 2 rows, results.csv 3' in capsys.readouterr().out
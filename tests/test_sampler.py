@@ -0,0 +1,71 @@
+"""
+Seeded sampling of the field values of the generated test data.
+"""
+import itertools
+
+import numpy as np
+import pytest
+
+from time_testing.action_parser import parse_actions
+from time_testing.literals import parse_literal
+from time_testing.sampler import STRATEGIES, sample_actions, sample_assignments
+
+CONSTRAINTS = {'employee': ['Dominik', 'Daniel', 'Julia', 'Christoph'],
+               'project': ['Bachelor Thesis', 'Railway App', 'AI Time', 'My Doctor'], 'time': 'INT'}
+ACTIONS = ('["book_time(employee: Hans, project: AI Time, time: 4)", '
+           '"delete_time(employee: Hans, project: XYZ, time: 1)"]')
+
+
+def distinct_rows(rows):
+    return len({tuple(row) for row in rows.tolist()})
+
+
+@pytest.mark.parametrize('strategy', STRATEGIES)
+@pytest.mark.parametrize('sizes, n', [([4, 4, 8], 50), ([4, 4, 8], 120), ([4, 4, 8], 500), ([3, 3], 8),
+                                      ([9], 5), ([2, 3, 4, 5], 110)])
+def test_rows_are_distinct_and_seeded(sizes, n, strategy):
+    rows = sample_assignments(sizes, n, np.random.default_rng(7), strategy)
+
+    assert rows.shape == (min(n, np.prod(sizes)), len(sizes))
+    assert distinct_rows(rows) == len(rows)
+    assert ((rows >= 0) & (rows < sizes)).all()
+    assert (sample_assignments(sizes, n, np.random.default_rng(7), strategy) == rows).all()
+
+
+@pytest.mark.parametrize('sizes, n', [([4, 4, 8], 50), ([4, 4, 8], 120), ([3, 3], 8), ([2, 3, 4, 5], 110)])
+def test_stratified_rows_are_balanced(sizes, n):
+    # n close to the number of combinations gives many duplicates that have to be swapped away
+    for seed in range(5):
+        rows = sample_assignments(sizes, n, np.random.default_rng(seed), 'stratified')
+
+        for slot, size in enumerate(sizes):
+            counts = np.bincount(rows[:, slot], minlength=size)
+            assert counts.max() - counts.min() <= 1
+
+
+def test_pairwise_rows_cover_all_pairs():
+    sizes = [4, 4, 8, 3]
+    rows = sample_assignments(sizes, 40, np.random.default_rng(0), 'pairwise')
+
+    assert len(rows) <= 40
+    for first, second in itertools.combinations(range(len(sizes)), 2):
+        assert len({(row[first], row[second]) for row in rows.tolist()}) == sizes[first] * sizes[second]
+
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        sample_assignments([2, 2], 2, np.random.default_rng(0), 'greedy')
+
+
+@pytest.mark.parametrize('strategy', STRATEGIES)
+def test_sampled_actions(strategy):
+    sampled = sample_actions(ACTIONS, CONSTRAINTS, 50, seed=3, strategy=strategy)
+
+    assert len(set(sampled)) == 50
+    assert sampled == sample_actions(ACTIONS, CONSTRAINTS, 50, seed=3, strategy=strategy)
+    for actions in sampled:
+        book, delete = [parse_actions(action)[0] for action in parse_literal(actions)]
+        # Hans is one slot, both actions get the same employee
+        assert book.employee == delete.employee in CONSTRAINTS['employee']
+        assert book.project in CONSTRAINTS['project'] and delete.project in CONSTRAINTS['project']
+        assert 1 <= int(book.time) <= 8 and 1 <= int(delete.time) <= 8
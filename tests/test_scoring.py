@@ -0,0 +1,91 @@
+"""
+The vectorized score_test_cases() gives the rows of score_actions(), which scores one test case at a time.
+"""
+import json
+import os
+
+import pytest
+
+from lmql_prompting.settings import optional_endpoints
+from time_testing.data_model import TestCase, read_test_cases
+from time_testing.main import score_actions
+from time_testing.scoring import data_formatting, result_columns, score_test_cases
+from time_testing.transcript_store import Transcript, TranscriptStore
+
+VARIABLES = ['employee', 'project', 'time']
+RUN_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'data_run_3')
+
+BOOK_MAX = "book_time(employee: Max, project: AI, time: 5)"
+BOOK_JULIA = "book_time(employee: Julia, project: XYZ, time: 2)"
+READ_MAX = "read_time(employee: Max)"
+DELETE_MAX = "delete_time(employee: Max, project: AI)"
+
+
+def transcript(*actions):
+    # the LLM calls the tools with a JSON argument
+    steps = []
+    for endpoint, arguments in actions:
+        steps.append(f"  Thought: I call {endpoint}.\n\nAction: {endpoint}('{json.dumps(arguments)}')\n"
+                     f"Observation: The response status code of the request is: 200\n")
+    return Transcript('', {'REASONING': '\n' + ''.join(steps)})
+
+
+def max_booking(time=5, employee='Max'):
+    return 'book_time', {'employee': employee, 'project': 'AI', 'time': time}
+
+
+# (expected actions, transcript) of test cases for every way an action can be scored
+TEST_CASES = [
+    ([BOOK_MAX], transcript(max_booking())),
+    ([BOOK_MAX, BOOK_JULIA], transcript(('book_time', {'employee': 'Julia', 'project': 'XYZ', 'time': 2}),
+                                        max_booking())),
+    ([BOOK_MAX], transcript(('read_time', {'employee': 'Max'}), max_booking())),
+    ([BOOK_MAX], transcript(max_booking(time=6))),
+    ([BOOK_MAX, DELETE_MAX], transcript(max_booking(employee='Julia'))),
+    ([READ_MAX, BOOK_MAX], transcript()),
+    ([], transcript(max_booking(), ('read_time', {'employee': 'Max'}))),
+    ([BOOK_MAX, BOOK_MAX], transcript(max_booking(), max_booking(), max_booking())),
+]
+
+
+def score_one_by_one(test_cases):
+    rows = []
+    for test_case, result in test_cases:
+        case_rows, _, _ = score_actions(result, test_case.actions, test_case.test_data_id, test_case.use_case_id,
+                                        VARIABLES)
+        rows.extend(row.to_csv_row() for row in case_rows)
+    return rows
+
+
+def score_vectorized(test_cases):
+    formatted = []
+    for test_case, result in test_cases:
+        data_solution, data_result, reasoning = data_formatting(result, test_case.actions)
+        formatted.append((test_case.use_case_id, test_case.test_data_id, data_solution, data_result, reasoning))
+    frame = score_test_cases(formatted, VARIABLES, optional_endpoints)
+    assert list(frame.columns) == result_columns(VARIABLES)
+    return [list(row) for row in frame.itertuples(index=False, name=None)]
+
+
+def test_vectorized_scoring_scores_like_score_actions():
+    test_cases = [(TestCase(test_data_id, test_data_id // 3, '', str(actions), ''), result)
+                  for test_data_id, (actions, result) in enumerate(TEST_CASES)]
+
+    rows = score_vectorized(test_cases)
+
+    assert rows == score_one_by_one(test_cases)
+    assert {(row[2], row[3], row[4]) for row in rows} == {(True, True, False), (False, True, False),
+                                                         (False, False, True), (False, False, False)}
+
+
+@pytest.mark.skipif(not os.path.isdir(RUN_DIR), reason='data/data_run_3 is not there')
+def test_vectorized_scoring_of_a_stored_run(tmp_path):
+    transcripts = TranscriptStore(str(tmp_path / 'results_lmql.jsonl'))
+    transcripts.import_csv(os.path.join(RUN_DIR, 'results_lmql.csv'), os.path.join(RUN_DIR, 'test_data.csv'),
+                           os.path.join(RUN_DIR, 'results.csv'))
+    test_cases = [test_case for test_case in read_test_cases(os.path.join(RUN_DIR, 'test_data.csv'))
+                  if test_case.test_data_id in transcripts]
+    test_cases = list(zip(test_cases, transcripts.load_many([test_case.test_data_id for test_case in test_cases])))
+
+    assert test_cases
+    assert score_vectorized(test_cases) == score_one_by_one(test_cases)
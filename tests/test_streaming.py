@@ -0,0 +1,165 @@
+"""
+Early stopping of streamed reAct generations, run through LMQL's reAct with a scripted model instead of OpenAI.
+"""
+import functools
+import json
+
+import lmql
+from lmql import LMQLResult
+import numpy as np
+import tiktoken
+from lmql.lib.actions import reAct  # used by react_booking
+from lmql.models.lmtp.backends.lmtp_model import LMTPModel, LMTPModelResult
+from lmql.runtime.tokenizer import LMQLTokenizer, runtime_tokenizers
+from lmql.runtime.tokenizers.tiktoken_tokenizer import TiktokenTokenizer
+
+from lmql_prompting.streaming import StreamOutputWriter, run_streamed, streamed_tool
+from lmql_prompting.tracing import estimate_tokens
+from time_testing.action_parser import Endpoint
+from time_testing.action_stream import ActionStream, StopPolicy
+from time_testing.data_model import Action
+from time_testing.scoring import get_reasoning
+
+# reAct writes its instructions before the reasoning, the scripted model continues after them
+REASONING_START = 'Now you can start reasoning.\n'
+END_OF_TEXT = 256
+
+FIRST_BOOKING = "Action: book_time('{\"employee\": \"Max\", \"project\": \"AI\", \"time\": 5}')\n"
+SECOND_BOOKING = "Action: book_time('{\"employee\": \"Max\", \"project\": \"XYZ\", \"time\": 1}')\n"
+FIRST_THOUGHT = "Thought: I book the hours on AI first.\n\n"
+SECOND_THOUGHT = "Thought: Then the hours on XYZ.\n\n"
+SCRIPT = f"{FIRST_THOUGHT}{FIRST_BOOKING}Observation: book time: 200\n{SECOND_THOUGHT}{SECOND_BOOKING}" \
+         f"Observation: book time: 200\nDone."
+
+
+class ByteTokenizer(TiktokenTokenizer):
+    """
+    One token per byte, so no tokenizer has to be downloaded.
+    """
+
+    def __init__(self):
+        self.model_identifier = 'scripted-bytes'
+        self.enc = tiktoken.Encoding('scripted-bytes', pat_str=r'[\s\S]',
+                                     mergeable_ranks={bytes([byte]): byte for byte in range(256)},
+                                     special_tokens={'<|endoftext|>': END_OF_TEXT})
+        self.bytes_can_concat = True
+        self.vocab = {self.enc.decode([byte]): byte for byte in range(256)}
+
+    def decode_tokens_bytes(self, ids):
+        # LMQL also passes the already decoded tokens of fixed text, e.g. reAct's "Observation:"
+        return [bytes(token) if isinstance(token, bytes) else self.enc.decode_single_token_bytes(int(token))
+                for token in ids]
+
+
+class ScriptedModel(LMTPModel):
+    """
+    Writes SCRIPT as reasoning, one byte per token. Once the reasoning differs from SCRIPT (e.g. because of an
+    unexpected observation) or SCRIPT is done, the generation ends.
+    """
+    script = ''
+
+    def __init__(self, **kwargs):
+        super().__init__()
+
+    @property
+    def eos_token_id(self):
+        return END_OF_TEXT
+
+    def next_token(self, input_ids):
+        text = bytes(int(token) for token in input_ids if token < 256).decode('utf-8')
+        reasoning = text.split(REASONING_START, 1)[1] if REASONING_START in text else ''
+        if len(reasoning) < len(self.script) and self.script.startswith(reasoning):
+            return ord(self.script[len(reasoning)])
+        return END_OF_TEXT
+
+    def generate(self, input_ids, attention_mask, temperature, max_new_tokens, bias_tensor, streamer, **kwargs):
+        scores = []
+        for step in range(max_new_tokens):
+            next_ids = np.array([[self.next_token(ids[mask == 1])] for ids, mask in zip(input_ids, attention_mask)])
+            logits = np.full((len(input_ids), END_OF_TEXT + 1), -100.0)
+            logits[np.arange(len(input_ids)), next_ids[:, 0]] = 0.0
+            scores.append(logits)
+            input_ids = np.concatenate([input_ids, next_ids], axis=-1)
+            attention_mask = np.concatenate([attention_mask, np.ones_like(next_ids, dtype=attention_mask.dtype)],
+                                            axis=-1)
+            if (next_ids == END_OF_TEXT).all() or step + 1 >= max_new_tokens:
+                break
+            streamer(input_ids, scores)
+        return LMTPModelResult(sequences=input_ids, scores=scores)
+
+
+tokenizer = LMQLTokenizer('scripted-bytes', tokenizer_impl=ByteTokenizer())
+runtime_tokenizers['scripted-bytes'] = tokenizer
+LMTPModel.registry['scripted'] = ScriptedModel
+
+bookings = []
+
+
+@streamed_tool
+async def book_time(q: str, lookup=None):
+    """
+    Adds new booking entry in the local database.
+
+    Example: book_time('{"employee": "Max", "project": "test_project","time": 5}')
+    Result: book time: 200
+    """
+    bookings.append(json.loads(q))
+    return 'book time: 200'
+
+
+@lmql.query
+def react_booking(content):
+    '''lmql
+    argmax
+        "Task: {content}\n"
+        "[REASONING]\n" where reAct(REASONING, [book_time])
+        "Request successfully handled."
+    '''
+
+
+def run(policy):
+    ScriptedModel.script = SCRIPT
+    bookings.clear()
+    stream = ActionStream([Action(Endpoint.BOOK_TIME, 'Max', 'AI', '5')], policy)
+    model = lmql.model('local:scripted', tokenizer='scripted-bytes', async_transport=True)
+    # LMQL's token cache would answer a variable that directly follows a stopped one with the stop
+    query = functools.partial(react_booking, model=model, cache=False, output_writer=StreamOutputWriter())
+    return run_streamed(query, stream, 'Book 5 hours for Max on the project AI.'), stream
+
+
+def test_stop_after_all_actions_done():
+    result, stream = run(StopPolicy())
+
+    assert result is None
+    assert stream.stop_reason == 'all_actions_done'
+    # the booking that completed the actions ran once and kept its observation, the second one never ran
+    assert bookings == [{'employee': 'Max', 'project': 'AI', 'time': 5}]
+    assert stream.text.endswith('Observation: book time: 200')
+    assert 'Error' not in stream.text
+    # the kept reasoning is the text the model generated, with its thought
+    assert stream.text == f"\n{FIRST_THOUGHT}{FIRST_BOOKING}Observation: book time: 200"
+    assert get_reasoning(LMQLResult('', {'REASONING': stream.text})) == '1.  I book the hours on AI first.'
+
+
+def test_stop_after_max_tokens_of_generated_text():
+    # the observation is no generated text, the stop comes within the second thought
+    max_tokens = estimate_tokens(f"\n{FIRST_THOUGHT}{FIRST_BOOKING}\nThought: Then")
+    result, stream = run(StopPolicy(all_actions_done=False, max_tokens=max_tokens))
+
+    assert result is None
+    assert stream.stop_reason == 'max_tokens'
+    assert len(bookings) == 1
+    assert stream.tokens == max_tokens
+    assert 'book time: 200' not in stream.generated_text
+    assert stream.text.startswith(f"\n{FIRST_THOUGHT}{FIRST_BOOKING}Observation: book time: 200\nThought:")
+    assert SECOND_BOOKING not in stream.text
+
+
+def test_no_stop_without_policy():
+    result, stream = run(StopPolicy(all_actions_done=False))
+
+    assert stream.stop_reason is None
+    assert len(bookings) == 2
+    assert result.variables['REASONING'].count('Observation: book time: 200') == 2
+    assert stream.text == result.variables['REASONING']
+    assert 'Error' not in result.variables['REASONING']
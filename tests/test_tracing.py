@@ -0,0 +1,41 @@
+"""
+Token counts of the traces and of streamed generations.
+"""
+import random
+
+import tiktoken
+
+from lmql_prompting import tracing
+from lmql_prompting.tracing import TokenCounter, count_tokens, estimate_tokens
+
+# pre-tokenization of cl100k_base (gpt-3.5-turbo, gpt-4) and r50k_base, with merges of whitespace and line breaks
+PATTERNS = [r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+| ?[^\s\p{L}\p{N}]++[\r\n]*+|\s++$|"""
+            r"""\s*[\r\n]|\s+(?!\S)|\s""",
+            r"""'(?:[sdmt]|ll|ve|re)| ?\p{L}++| ?\p{N}++| ?[^\s\p{L}\p{N}]++|\s++$|\s+(?!\S)|\s"""]
+MERGES = [b'\n\n', b'  ', b'  \n', b' \n', b'.\n', b'Th', b'Tho', b'ought', b' b', b'ok', b'in']
+TEXT = ("\n  Thought: I need to book the time.\n\nAction: book_time('{\"employee\": \"Max\", \"time\": 5}')\n"
+        "Observation: book time: 200\n  \nThought: Done.\n\n\nAction: read_time('{\"employee\": \"Max\"}')\n")
+
+
+def encoding(pattern):
+    ranks = {bytes([byte]): byte for byte in range(256)}
+    for merge in MERGES:
+        ranks[merge] = len(ranks)
+    return tiktoken.Encoding('test', pat_str=pattern, mergeable_ranks=ranks, special_tokens={})
+
+
+def test_streamed_count_equals_count_of_the_whole_text(monkeypatch):
+    for pattern in PATTERNS:
+        monkeypatch.setattr(tracing, '_encoding', lambda model, enc=encoding(pattern): enc)
+        counter = TokenCounter('test-model')
+        random.seed(0)
+        end = 0
+        while end < len(TEXT):
+            end += random.randint(1, 6)
+            assert counter.count(TEXT[:end]) == count_tokens(TEXT[:end], 'test-model')
+
+
+def test_tokens_are_estimated_without_encoding():
+    assert count_tokens(TEXT) == estimate_tokens(TEXT)
+    assert count_tokens(TEXT, 'no-such-model') == estimate_tokens(TEXT)
+    assert TokenCounter().count(TEXT) == estimate_tokens(TEXT)
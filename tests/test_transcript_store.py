@@ -0,0 +1,64 @@
+"""
+Import of the results_lmql.csv transcripts of earlier runs into the TranscriptStore.
+"""
+import pandas as pd
+
+from time_testing.transcript_store import TranscriptStore, transcript_matches
+
+PROMPTS = ['  Please book Max 5 hours on AI.', '  Please book Julia 2 hours on XYZ.', '  Please book Max 5 hours on AI.',
+           '  Delete all bookings of Julia.']
+
+
+def transcript(prompt, reasoning):
+    return f"Task: {prompt}A: Let's think step by step\n\n  Thought: {reasoning}"
+
+
+def write_run(tmp_path, transcripts, evaluated=None):
+    pd.DataFrame({'Use_case_id': 0, 'Test_data_id': range(len(PROMPTS)), 'Prompt': PROMPTS, 'Actions': '[]'}) \
+        .to_csv(tmp_path / 'test_data.csv', sep=';', index=False)
+    pd.DataFrame({'prompt': [prompt for prompt, _ in transcripts],
+                  'variables': [reasoning for _, reasoning in transcripts]}) \
+        .to_csv(tmp_path / 'results_lmql.csv', sep=';', index=False)
+    if evaluated is not None:
+        pd.DataFrame({'Use_case_id': 0, 'Test_data_id': evaluated}).to_csv(tmp_path / 'results.csv', sep=';',
+                                                                          index=False)
+
+
+def import_run(tmp_path, with_results):
+    store = TranscriptStore(str(tmp_path / 'results_lmql.jsonl'))
+    results_path = str(tmp_path / 'results.csv') if with_results else None
+    skipped = store.import_csv(str(tmp_path / 'results_lmql.csv'), str(tmp_path / 'test_data.csv'), results_path)
+    return store, skipped
+
+
+def test_transcripts_of_failed_test_cases_are_skipped(tmp_path):
+    # test case 1 failed, so the second row belongs to test case 2, which has the same prompt as test case 0
+    write_run(tmp_path, [(transcript(PROMPTS[0], 'first'), 'first'), (transcript(PROMPTS[2], 'third'), 'third'),
+                         (transcript(PROMPTS[3], 'fourth'), 'fourth')], evaluated=[0, 2, 3])
+
+    for with_results in (True, False):
+        (tmp_path / 'results_lmql.jsonl').unlink(missing_ok=True)
+        (tmp_path / 'results_lmql.jsonl.idx').unlink(missing_ok=True)
+        store, skipped = import_run(tmp_path, with_results)
+
+        assert skipped == 0
+        assert 1 not in store
+        assert [store.load(index).variables['REASONING'] for index in (0, 2, 3)] == ['first', 'third', 'fourth']
+
+
+def test_unmatched_transcripts_are_not_imported(tmp_path):
+    write_run(tmp_path, [(transcript(PROMPTS[0], 'first'), 'first'),
+                         (transcript('  Book something else.', 'unknown'), 'unknown'),
+                         (transcript(PROMPTS[3], 'fourth'), 'fourth')], evaluated=[0, 1, 3])
+
+    store, skipped = import_run(tmp_path, with_results=True)
+
+    assert skipped == 1
+    assert sorted(store._offsets) == [0, 3]
+    assert store.load(3).variables['REASONING'] == 'fourth'
+
+
+def test_transcript_matches_only_the_task():
+    assert transcript_matches(transcript(PROMPTS[1], 'x'), PROMPTS[1])
+    assert not transcript_matches(transcript(PROMPTS[0], PROMPTS[1]), PROMPTS[1])
+    assert not transcript_matches(float('nan'), PROMPTS[1])
@@ -0,0 +1,124 @@
+import re
+import sys
+from collections import namedtuple
+from enum import Enum
+
+# One action of the grammar endpoint(employee: ..., project: ..., time: ...), project and time are None if not
+# given. time is kept as string, like in the stored actions. The endpoint is an Endpoint, employee and project are
+# interned.
+Action = namedtuple('Action', ['endpoint', 'employee', 'project', 'time'], defaults=[None, None])
+
+ACTION_FIELDS = ('employee', 'project', 'time')
+
+# One action of the grammar endpoint(employee: ..., project: ..., time: ...), project and time are optional
+_ACTION_PATTERN = re.compile(r'(\w+)\(employee:\s*([^,]+)(?:,\s*project:\s*([^,]+))?(?:,\s*time:\s*(\d+)\s*)?\)')
+
+# Quotes and braces of the JSON arguments the LLM passes to the tools, e.g. book_time('{"employee": ...}')
+_JSON_CHARACTERS = re.compile(r'[\'"{}]')
+
+
+class Endpoint(str, Enum):
+    """
+    Endpoints of the time booking application. Members behave like their name as plain string (equality, hash,
+    repr, str), so they can be used in the action dictionaries and written to CSV unchanged.
+    """
+    BOOK_TIME = 'book_time'
+    READ_TIME = 'read_time'
+    DELETE_TIME = 'delete_time'
+    CHANGE_TIME = 'change_time'
+
+    __repr__ = str.__repr__
+    __str__ = str.__str__
+    __format__ = str.__format__
+
+
+_ENDPOINTS = {endpoint.value: endpoint for endpoint in Endpoint}
+
+
+def clean_action(action, remove_double_spaces=False):
+    """
+    Removes the JSON quotes and braces of an action, so book_time('{"employee": "Julia"}') becomes
+    book_time(employee: Julia).
+    """
+    action = _JSON_CHARACTERS.sub('', action)
+    if remove_double_spaces:
+        action = action.replace('  ', '')
+    return action
+
+
+def _value_span(match, group):
+    """
+    Start and end of the value of a field without the surrounding whitespace, None if the field is missing.
+    """
+    start, end = match.span(group)
+    if start == -1:
+        return None
+    value = match.group(group)
+    start += len(value) - len(value.lstrip())
+    end -= len(value) - len(value.rstrip())
+    return start, end
+
+
+def parse_actions(text):
+    """
+    Parses all actions of the text in a single pass.
+
+    Returns:
+        list: Action records, the endpoint is an Endpoint (an unknown name, the LLM may call anything, stays a
+        string), the employee and project names are interned.
+    """
+    # local names, this runs for every action of every transcript. tuple.__new__ skips the argument handling of
+    # Action(), all four fields are always given.
+    new, intern, endpoints = tuple.__new__, sys.intern, _ENDPOINTS
+    return [new(Action, (endpoints.get(endpoint) or endpoint, intern(employee.strip()),
+                         intern(project.strip()) if project else None, time or None))
+            for endpoint, employee, project, time in _ACTION_PATTERN.findall(text)]
+
+
+def action_to_dict(action):
+    """
+    Dictionary of an action without its missing fields, the format results.csv and the tools use.
+    """
+    values = {'endpoint': action.endpoint, 'employee': action.employee}
+    if action.project is not None:
+        values['project'] = action.project
+    if action.time is not None:
+        values['time'] = action.time
+    return values
+
+
+def csv_action(action):
+    """
+    Action_solution of results.csv: the dictionary of an action, or the list of dictionaries of an expected action
+    that was not done (the actions of one entry of the Actions column).
+    """
+    if isinstance(action, list):
+        return [action_to_dict(values) for values in action]
+    return action_to_dict(action)
+
+
+def replace_field_values(text, replace):
+    """
+    Replaces the field values of all actions in the text.
+
+    Parameters:
+        text (str): Text with actions.
+        replace (callable): Called as replace(field, value) for every field value in the order of the text,
+        returns the new value.
+
+    Returns:
+        str: The text with the new values.
+    """
+    parts = []
+    position = 0
+    for match in _ACTION_PATTERN.finditer(text):
+        for group, field in enumerate(ACTION_FIELDS, start=2):
+            span = _value_span(match, group)
+            if span is None:
+                continue
+            start, end = span
+            parts.append(text[position:start])
+            parts.append(replace(field, text[start:end]))
+            position = end
+    parts.append(text[position:])
+    return ''.join(parts)
@@ -0,0 +1,115 @@
+import os
+import re
+from collections import namedtuple
+
+from lmql_prompting.tracing import TokenCounter
+from time_testing.action_parser import clean_action, parse_actions
+from time_testing.literals import parse_literal
+
+# When a streamed reAct_booking generation is stopped early: once all expected actions were performed
+# (all_actions_done), after max_steps actions or after max_tokens generated tokens (None for no limit)
+StopPolicy = namedtuple('StopPolicy', ['all_actions_done', 'max_steps', 'max_tokens'], defaults=[True, None, None])
+
+# A complete Action/Observation block of the REASONING, the same blocks get_actions() extracts
+_ACTION_BLOCK = re.compile(r'Action:(.*?)Observation', re.DOTALL)
+
+
+def expected_actions(provided_actions):
+    """
+    The actions of the Actions column of a test case as Action records, like data_formatting() parses them.
+    """
+    provided_actions = parse_literal(re.sub(r'"', "'", provided_actions))
+    return [action for text in provided_actions for action in parse_actions(clean_action(text))]
+
+
+class ActionStream:
+    """
+    Extracts the actions of a reAct_booking generation while it is generated and scores them against the expected
+    actions of the test case.
+
+    feed() is called with every piece of text of the generation, sync() with the whole text generated so far.
+    Action/Observation blocks are parsed as soon as they are complete, only the new text is searched. An action
+    counts as matched if it equals one of the expected actions that was not matched yet, all others are extra
+    actions. text is the reasoning so far, generated_text the part the model generated (without the observations of
+    the tools), max_tokens counts its tokens.
+
+    Parameters:
+        expected_actions (list): Expected actions as Action records, see expected_actions().
+        policy (StopPolicy): When feed() asks to stop the generation.
+        model (str, optional): Model that generates, its tokens are counted for max_tokens, see count_tokens().
+    """
+
+    def __init__(self, expected_actions, policy=StopPolicy(), model=None):
+        self.expected_actions = list(expected_actions)
+        self.policy = policy
+        self.model = model
+        self.reset()
+
+    def reset(self):
+        """
+        Starts over for a new attempt of the generation.
+        """
+        self.text = ''
+        self.generated_text = ''
+        self._token_counter = TokenCounter(self.model)
+        self.actions = []
+        self.matched = 0
+        self.extra = 0
+        self.stop_reason = None
+        self._remaining = list(self.expected_actions)
+        self._position = 0
+
+    @property
+    def all_actions_done(self):
+        return not self._remaining
+
+    @property
+    def tokens(self):
+        """
+        Number of tokens the model generated.
+        """
+        return self._token_counter.count(self.generated_text)
+
+    def feed(self, text, generated=True):
+        """
+        Adds text of the generation, generated is False for text the model did not generate (the observation of a
+        tool).
+
+        Returns:
+            str: Why the generation should stop ('all_actions_done', 'max_steps', 'max_tokens'), None to go on.
+        """
+        self.text += text
+        if generated:
+            self.generated_text += text
+        for block in _ACTION_BLOCK.finditer(self.text, self._position):
+            self._position = block.end()
+            for action in parse_actions(clean_action(block.group(1).strip(), remove_double_spaces=True)):
+                self.actions.append(action)
+                if action in self._remaining:
+                    self._remaining.remove(action)
+                    self.matched += 1
+                else:
+                    self.extra += 1
+
+        if self.policy.all_actions_done and self.expected_actions and self.all_actions_done:
+            self.stop_reason = 'all_actions_done'
+        elif self.policy.max_steps is not None and len(self.actions) >= self.policy.max_steps:
+            self.stop_reason = 'max_steps'
+        elif self.policy.max_tokens is not None and self.tokens >= self.policy.max_tokens:
+            self.stop_reason = 'max_tokens'
+        return self.stop_reason
+
+    def sync(self, text):
+        """
+        Continues with the whole text generated so far, e.g. the REASONING of an LMQL generation, of which only the
+        part after text is new. If it differs from text (an observation fed by a tool is written differently) the
+        differing end is replaced.
+
+        Returns:
+            str: Why the generation should stop, see feed().
+        """
+        if not text.startswith(self.text):
+            common = len(os.path.commonprefix([self.text, text]))
+            self.text = self.text[:common]
+            self._position = min(self._position, common)
+        return self.feed(text[len(self.text):])
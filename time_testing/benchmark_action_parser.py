@@ -0,0 +1,130 @@
+"""
+Micro-benchmark of the action parser against the former regex implementation of extract_values,
+data_formatting and replace_action_values. Run from the time_testing directory:
+
+    python benchmark_action_parser.py [repetitions]
+"""
+import json
+import random
+import re
+import sys
+import timeit
+
+import pandas as pd
+
+from time_testing.action_parser import action_to_dict, clean_action, parse_actions, replace_field_values
+
+csv_data_path = "../data/test_data.csv"
+constraints = {'employee': ['Dominik', 'Daniel', 'Julia', 'Christoph'],
+               'project': ['Bachelor Thesis', 'Railway App', 'AI Time', 'My Doctor'],
+               'time': 'INT'}
+
+
+def legacy_extract_values(input_string):
+    pattern1 = r'(\w+)\(employee:\s*([^,]+)(?:,\s*project:\s*([^,]+))?(?:,\s*time:\s*(\d+))?\)'
+    pattern2 = r'(\w+)\(employee:\s*([^,]+)(?:,\s*project:\s*([^,]+))?,\s*time:\s*(\d+)\s*\)\.'
+
+    matches = re.findall(pattern1, input_string)
+    if not matches:
+        matches = re.findall(pattern2, input_string)
+
+    extracted_data = []
+    for match in matches:
+        endpoint, employee, project, time = match
+        extracted_item = {'endpoint': endpoint, 'employee': employee.strip()}
+        if project:
+            extracted_item['project'] = project.strip()
+        if time:
+            extracted_item['time'] = time.strip()
+        extracted_data.append(extracted_item)
+    return extracted_data
+
+
+def legacy_replace_action_values(input_string):
+    replacements = {}
+    for action in legacy_extract_values(input_string):
+        for key, value in action.items():
+            if value not in replacements.keys() and key != 'endpoint':
+                if constraints[key] != 'INT':
+                    replacements[value] = random.choice(constraints[key])
+                else:
+                    replacements[value] = str(random.randint(1, 8))
+    pattern = r'\b(' + '|'.join(re.escape(key) for key in replacements.keys()) + r')\b'
+    return re.sub(pattern, lambda x: replacements[x.group()], input_string)
+
+
+def legacy_format(llm_actions):
+    data_result = []
+    for action in llm_actions:
+        action = re.sub(r'[\'"{}]', '', action)
+        action = re.sub(r'  ', '', action)
+        data_result.append(legacy_extract_values(action))
+    return data_result
+
+
+def replace_action_values(input_string):
+    replacements = {}
+
+    def replace(key, value):
+        if value not in replacements:
+            if constraints[key] != 'INT':
+                replacements[value] = random.choice(constraints[key])
+            else:
+                replacements[value] = str(random.randint(1, 8))
+        return replacements[value]
+
+    return replace_field_values(input_string, replace)
+
+
+def parser_format(llm_actions):
+    return [parse_actions(clean_action(action, remove_double_spaces=True)) for action in llm_actions]
+
+
+def as_dicts(actions):
+    return [action_to_dict(action) for action in actions]
+
+
+def to_llm_actions(actions):
+    """
+    Actions in the format the LLM passes them to the tools.
+    """
+    llm_actions = []
+    for action in parse_actions(actions):
+        arguments = {field: getattr(action, field) for field in ('employee', 'project') if getattr(action, field)}
+        if action.time is not None:
+            arguments['time'] = int(action.time)
+        llm_actions.append(f"{action.endpoint}('{json.dumps(arguments)}')")
+    return llm_actions
+
+
+def main(repetitions=20):
+    actions = pd.read_csv(csv_data_path, sep=';')['Actions'].tolist()
+    llm_actions = [to_llm_actions(action) for action in actions]
+
+    for action in actions:
+        assert as_dicts(parse_actions(action)) == legacy_extract_values(action)
+        random.seed(0)
+        expected = legacy_replace_action_values(action)
+        random.seed(0)
+        assert replace_action_values(action) == expected, (action, expected)
+    assert [[as_dicts(actions) for actions in parser_format(a)] for a in llm_actions] == \
+        [legacy_format(a) for a in llm_actions]
+
+    benchmarks = [
+        ('extract_values', lambda: [legacy_extract_values(a) for a in actions],
+         lambda: [parse_actions(action) for action in actions]),
+        ('data_formatting', lambda: [legacy_format(a) for a in llm_actions],
+         lambda: [parser_format(a) for a in llm_actions]),
+        ('replace_action_values', lambda: [legacy_replace_action_values(a) for a in actions],
+         lambda: [replace_action_values(a) for a in actions]),
+    ]
+    print(f'{len(actions)} actions, best of 5 x {repetitions} repetitions')
+    for name, legacy, parser in benchmarks:
+        legacy_time = min(timeit.repeat(legacy, number=repetitions, repeat=5))
+        parser_time = min(timeit.repeat(parser, number=repetitions, repeat=5))
+        print(f'{name:<22} regex: {legacy_time * 1000:8.1f}ms  parser: {parser_time * 1000:8.1f}ms  '
+              f'speedup: {legacy_time / parser_time:.2f}x')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
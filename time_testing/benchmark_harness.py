@@ -0,0 +1,127 @@
+"""
+Throughput of the evaluation harness without a model: reAct_booking, compare_reasoning and generate_prompt are
+answered by a MockBackend. Run from the time_testing directory, with the time booking application running
+unless --no-tools is given:
+
+    python benchmark_harness.py [--mode synthesize|replay] [--latency 0.0] [--jitter 0.0] [--max-in-flight 8]
+                                [--limit N] [--compare-reasoning] [--generate] [--no-tools] [--profile]
+                                [--trailing-steps N] [--stop-when-done] [--max-steps N] [--max-tokens N]
+
+Results, transcripts and traces of the benchmark go to a temporary directory, data/ is not changed.
+"""
+import argparse
+import asyncio
+import cProfile
+import os
+import pstats
+import tempfile
+import time
+
+import pandas as pd
+
+from lmql_prompting.call_api import csv_data_path, csv_use_case_path
+from lmql_prompting.tracing import summarize_traces
+from time_testing import main
+from time_testing.action_stream import StopPolicy
+from time_testing.mock_backend import MockBackend
+from time_testing.result_sink import ResultSink
+from time_testing.scoring import result_columns
+from time_testing.transcript_store import TranscriptStore
+
+
+def benchmark_evaluation(test_data, max_in_flight, compare_reasoning=False, stop_policy=None):
+    """
+    Runs and scores the test cases with the current model backend, like
+    go_through_test_data(use_stored_data=False).
+
+    Returns:
+        dict: Number of test cases, seconds, test cases per second and the trace summary over all use cases.
+    """
+    variables = main.get_variable_names()
+    with tempfile.TemporaryDirectory() as tmp:
+        run_id = time.strftime('benchmark-%Y%m%d-%H%M%S')
+        result_actions = ResultSink(os.path.join(tmp, 'results.csv'), result_columns(variables))
+        transcripts = TranscriptStore(os.path.join(tmp, 'results_lmql.jsonl'))
+        trace_path = os.path.join(tmp, f'{run_id}.jsonl')
+        started = time.perf_counter()
+        with result_actions:
+            asyncio.run(main.run_test_data_concurrently(test_data, compare_reasoning, variables, result_actions,
+                                                        max_in_flight, run_id=run_id, transcripts=transcripts,
+                                                        trace_path=trace_path, stop_policy=stop_policy))
+        duration = time.perf_counter() - started
+        summary = summarize_traces(trace_path)
+
+    return {
+        'test_cases': len(test_data),
+        'seconds': round(duration, 3),
+        'test_cases_per_second': round(len(test_data) / duration, 2),
+        **(summary.loc['all'].round(4).to_dict() if 'all' in summary.index else {}),
+    }
+
+
+def benchmark_generation(max_in_flight, seed=None):
+    """
+    Creates the test data of all use cases in memory, like generate_test_data_from_use_case() without appending
+    it to test_data.csv.
+
+    Returns:
+        dict: Number of prompts, seconds and prompts per second.
+    """
+    use_cases = pd.read_csv(csv_use_case_path, sep=';')
+    variables, constraints = main.get_variables_constraints()
+    started = time.perf_counter()
+    selected = [(example.to_dict(), main.create_test_data_rows(example.to_dict(), variables, constraints, index,
+                                                               seed))
+                for index, example in use_cases.iterrows()]
+    asyncio.run(main.paraphrase_prompts(selected, max_in_flight))
+    duration = time.perf_counter() - started
+    prompts = sum(len(rows) for _, rows in selected)
+    return {'prompts': prompts, 'seconds': round(duration, 3), 'prompts_per_second': round(prompts / duration, 2)}
+
+
+def run_benchmark(arguments):
+    test_data = pd.read_csv(csv_data_path, sep=';')
+    if arguments.limit:
+        test_data = test_data.head(arguments.limit)
+    backend = MockBackend(arguments.mode, test_data=test_data, latency=arguments.latency, jitter=arguments.jitter,
+                          call_tools=not arguments.no_tools, seed=arguments.seed,
+                          trailing_steps=arguments.trailing_steps)
+    previous = main.use_model_backend(backend)
+    main.response_cache.enabled = False
+    try:
+        stop_policy = StopPolicy(arguments.stop_when_done, arguments.max_steps, arguments.max_tokens) \
+            if arguments.stop_when_done or arguments.max_steps or arguments.max_tokens else None
+        print('Evaluation:', benchmark_evaluation(test_data, arguments.max_in_flight, arguments.compare_reasoning,
+                                                  stop_policy))
+        if arguments.generate:
+            print('Generation:', benchmark_generation(arguments.max_in_flight, arguments.seed))
+    finally:
+        main.use_model_backend(previous)
+    print(f'{backend.calls} mocked model calls')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the evaluation harness with a mocked model.')
+    parser.add_argument('--mode', choices=['synthesize', 'replay'], default='synthesize')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds per mocked model call')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Additional random seconds per model call')
+    parser.add_argument('--max-in-flight', type=int, default=8, help='Concurrent test cases')
+    parser.add_argument('--limit', type=int, default=None, help='Only the first N test cases')
+    parser.add_argument('--compare-reasoning', action='store_true', help='Also compare the reasoning')
+    parser.add_argument('--generate', action='store_true', help='Also benchmark the test data generation')
+    parser.add_argument('--no-tools', action='store_true', help='Do not call the time booking application')
+    parser.add_argument('--profile', action='store_true', help='Print the 25 most expensive functions')
+    parser.add_argument('--trailing-steps', type=int, default=0,
+                        help='Synthesized traces go on with this many read_time steps after the last action')
+    parser.add_argument('--stop-when-done', action='store_true', help='Stop generations once all actions are done')
+    parser.add_argument('--max-steps', type=int, default=None, help='Stop generations after this many actions')
+    parser.add_argument('--max-tokens', type=int, default=None, help='Stop generations after this many tokens')
+    parser.add_argument('--seed', type=int, default=0)
+    arguments = parser.parse_args()
+
+    if arguments.profile:
+        profiler = cProfile.Profile()
+        profiler.runcall(run_benchmark, arguments)
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(25)
+    else:
+        run_benchmark(arguments)
@@ -0,0 +1,119 @@
+"""
+Command line entry point of the test harness. Run from the time_testing directory:
+
+    python cli.py generate [--use-case N] [--seed N] [--sampling random|stratified|pairwise] [--max-in-flight N]
+                           [--requests-per-minute N] [--tokens-per-minute N]
+    python cli.py run [--use-case N] [--stored] [--compare-reasoning] [--resume] [--no-cache] [--max-in-flight N]
+                      [--stop-when-done] [--max-steps N] [--max-tokens N]
+    python cli.py rescore [run directories] [--workers N] [--shard-size N] [--compare-reasoning]
+    python cli.py report [run directories | --all] [--baseline DIR] [--output report.csv|report.json] [--trace FILE]
+
+Only the standard library is imported up front. generate and run import main.py and with it LMQL and the LMQL
+queries, rescore and report only read the stored data and start without them (rescore imports LMQL only with
+--compare-reasoning).
+"""
+import argparse
+import sys
+
+
+def generate(arguments):
+    from time_testing.main import generate_test_data_from_use_case
+
+    generate_test_data_from_use_case(arguments.use_case, arguments.max_in_flight, arguments.requests_per_minute,
+                                     arguments.tokens_per_minute, arguments.seed, arguments.sampling)
+
+
+def run(arguments):
+    from time_testing.action_stream import StopPolicy
+    from time_testing.main import go_through_test_data
+    from time_testing.report import display_results
+
+    stop_policy = StopPolicy(arguments.stop_when_done, arguments.max_steps, arguments.max_tokens) \
+        if arguments.stop_when_done or arguments.max_steps or arguments.max_tokens else None
+    go_through_test_data(arguments.stored, arguments.compare_reasoning, arguments.use_case, arguments.max_in_flight,
+                         arguments.requests_per_minute, arguments.tokens_per_minute, run_id=arguments.run_id,
+                         resume=arguments.resume, use_cache=not arguments.no_cache, stop_policy=stop_policy)
+    display_results()
+
+
+def rescore(arguments):
+    from time_testing.rescore import rescore_runs
+
+    rescore_runs(arguments.run_dirs, arguments.workers, arguments.shard_size, arguments.compare_reasoning,
+                 arguments.max_in_flight)
+
+
+def report(arguments):
+    import glob
+    import os
+
+    from lmql_prompting.settings import data_run_dirs
+    from time_testing.report import compare_runs, display_results, write_report
+
+    if not arguments.run_dirs and not arguments.all:
+        display_results(arguments.trace)
+        return
+    run_dirs = arguments.run_dirs or sorted(glob.glob(data_run_dirs)) + [os.path.dirname(data_run_dirs)]
+    results = compare_runs(run_dirs, arguments.baseline)
+    if arguments.output:
+        write_report(results, arguments.output)
+    else:
+        print(results[results['use_case_id'] == 'all'].to_string(index=False))
+
+
+def add_rate_limits(parser):
+    parser.add_argument('--max-in-flight', type=int, default=1, help='Concurrent LLM queries')
+    parser.add_argument('--requests-per-minute', type=int, default=None, help='Request limit of the LLM')
+    parser.add_argument('--tokens-per-minute', type=int, default=None, help='Token limit of the LLM')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Generate test data, evaluate the LLM and report the results.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate_parser = subparsers.add_parser('generate', help='Generate test data from the use cases')
+    generate_parser.add_argument('--use-case', type=int, default=0, help='First use case to generate test data for')
+    generate_parser.add_argument('--seed', type=int, default=None, help='Seed of the sampled values, default: random')
+    generate_parser.add_argument('--sampling', choices=['random', 'stratified', 'pairwise'], default='random',
+                                 help='How the values of the actions are combined')
+    add_rate_limits(generate_parser)
+    generate_parser.set_defaults(handler=generate)
+
+    run_parser = subparsers.add_parser('run', help='Evaluate the LLM on the test data and print the results')
+    run_parser.add_argument('--use-case', type=int, default=0, help='First use case to evaluate')
+    run_parser.add_argument('--stored', action='store_true', help='Score the stored transcripts, no LLM queries')
+    run_parser.add_argument('--compare-reasoning', action='store_true', help='Compare the reasoning with the LLM')
+    run_parser.add_argument('--run-id', default=None, help='Name of the trace file, default: run-<time>')
+    run_parser.add_argument('--resume', action='store_true', help='Continue the interrupted run')
+    run_parser.add_argument('--no-cache', action='store_true', help='Do not use the response cache')
+    run_parser.add_argument('--stop-when-done', action='store_true', help='Stop generations once all actions are done')
+    run_parser.add_argument('--max-steps', type=int, default=None, help='Stop generations after this many actions')
+    run_parser.add_argument('--max-tokens', type=int, default=None, help='Stop generations after this many tokens')
+    add_rate_limits(run_parser)
+    run_parser.set_defaults(handler=run)
+
+    rescore_parser = subparsers.add_parser('rescore', help='Re-score the stored transcripts of earlier runs into results_rescored.csv')
+    rescore_parser.add_argument('run_dirs', nargs='*', help='Run directories, default: all data/data_run_* directories')
+    rescore_parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    rescore_parser.add_argument('--shard-size', type=int, default=50, help='Number of test cases per shard')
+    rescore_parser.add_argument('--compare-reasoning', action='store_true', help='Compare the reasoning with the LLM')
+    rescore_parser.add_argument('--max-in-flight', type=int, default=1, help='Concurrent reasoning comparisons')
+    rescore_parser.set_defaults(handler=rescore)
+
+    report_parser = subparsers.add_parser('report', help='Print the results of the current run or compare runs')
+    report_parser.add_argument('run_dirs', nargs='*', help='Run directories to compare')
+    report_parser.add_argument('--all', action='store_true', help='Compare data/data_run_* and data')
+    report_parser.add_argument('--baseline', default=None, help='Run the others are compared with, default: the first')
+    report_parser.add_argument('--output', default=None, help='report.csv or report.json, default: print to stdout')
+    report_parser.add_argument('--trace', default=None, help='Trace of the current run, default: the latest')
+    report_parser.set_defaults(handler=report)
+    return parser
+
+
+def main(argv=None):
+    arguments = build_parser().parse_args(argv)
+    arguments.handler(arguments)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,190 @@
+"""
+Columnar copies of the CSV files of the runs. Run from the time_testing directory:
+
+    python columnar.py [run directories] [--export-csv]
+
+Every results.csv and results_rescored.csv of the run directories (default: data/ and all data/data_run_*
+directories) is converted to a <name>.columns directory next to it. With --export-csv the CSV files are written
+again from the columnar copies instead, with the delimiter of the converted file.
+
+report.load_results() only uses a columnar copy that is not older than its CSV file, so a CSV file written after
+the conversion is read again until the run directory is converted anew.
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from lmql_prompting.settings import data_run_dirs
+
+# Only the results are read from columnar copies, see report.load_results()
+CONVERTED_FILES = ['results.csv', 'results_rescored.csv']
+# Share of distinct values up to which a text column is read as category
+CATEGORY_RATIO = 0.5
+_META = 'meta.json'
+
+
+def columnar_path(csv_path):
+    """
+    Directory of the columnar copy of a CSV file, e.g. results.columns for results.csv.
+    """
+    return os.path.splitext(csv_path)[0] + '.columns'
+
+
+def is_fresh(csv_path):
+    """
+    Whether the columnar copy exists and is not older than the CSV file (or the CSV file is gone).
+    """
+    meta_path = os.path.join(columnar_path(csv_path), _META)
+    if not os.path.exists(meta_path):
+        return False
+    return not os.path.exists(csv_path) or os.stat(meta_path).st_mtime_ns >= os.stat(csv_path).st_mtime_ns
+
+
+def _header(csv_path):
+    with open(csv_path, 'r') as csvfile:
+        return csvfile.readline()
+
+
+def csv_delimiter(csv_path):
+    """
+    Delimiter of a CSV file of any run format, ';' or ','.
+    """
+    return ';' if ';' in _header(csv_path) else ','
+
+
+def read_csv(csv_path, columns=None):
+    """
+    Reads a CSV file of any run format, ';' or ',' separated.
+    """
+    header = _header(csv_path)
+    delimiter = ';' if ';' in header else ','
+    if columns is not None:
+        available = header.strip().split(delimiter)
+        columns = [column for column in columns if column in available]
+    return pd.read_csv(csv_path, delimiter=delimiter, usecols=columns)
+
+
+def write_columnar(frame, path, delimiter=';'):
+    """
+    Writes a DataFrame as columnar directory: one .npy file per column, text columns dictionary encoded as
+    int32 codes (-1 for missing values) with the distinct values in a JSON file. The directory is replaced as a
+    whole, meta.json is written last and keeps the delimiter of the CSV file for export_csv().
+    """
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    columns = []
+    for position, name in enumerate(frame.columns):
+        values = frame[name]
+        file_name = f'{position}.npy'
+        if values.dtype.kind in 'biuf':
+            kind = 'bool' if values.dtype.kind == 'b' else 'number'
+            np.save(os.path.join(tmp_path, file_name), values.to_numpy())
+        else:
+            codes, categories = pd.factorize(values.map(lambda value: value if pd.isna(value) else str(value)))
+            kind = 'category' if len(categories) <= CATEGORY_RATIO * max(len(values), 1) else 'text'
+            np.save(os.path.join(tmp_path, file_name), codes.astype(np.int32))
+            with open(os.path.join(tmp_path, f'{position}.json'), 'w', encoding='utf-8') as dictionary_file:
+                json.dump(list(categories), dictionary_file)
+        columns.append({'name': str(name), 'kind': kind, 'file': file_name})
+
+    with open(os.path.join(tmp_path, _META), 'w') as meta_file:
+        json.dump({'rows': len(frame), 'delimiter': delimiter, 'columns': columns}, meta_file)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def _read_meta(path):
+    with open(os.path.join(path, _META), 'r') as meta_file:
+        return json.load(meta_file)
+
+
+def columnar_columns(path):
+    """
+    Names of the columns of a columnar directory.
+    """
+    return [column['name'] for column in _read_meta(path)['columns']]
+
+
+def read_columnar(path, columns=None):
+    """
+    Reads a columnar directory. Only the files of the requested columns are read, numeric columns are memory
+    mapped.
+
+    Parameters:
+        path (str): Directory written by write_columnar().
+        columns (list, optional): Columns to read, all if None. Columns the directory does not have are skipped.
+
+    Returns:
+        DataFrame: Columns in the requested order, dictionary encoded columns with few distinct values as category.
+    """
+    meta = _read_meta(path)
+    by_name = {column['name']: column for column in meta['columns']}
+    names = list(by_name) if columns is None else [name for name in columns if name in by_name]
+
+    data = {}
+    for name in names:
+        column = by_name[name]
+        values = np.load(os.path.join(path, column['file']), mmap_mode='r')
+        if column['kind'] in ('bool', 'number'):
+            data[name] = values
+            continue
+        with open(os.path.join(path, os.path.splitext(column['file'])[0] + '.json'), 'r',
+                  encoding='utf-8') as dictionary_file:
+            categories = json.load(dictionary_file)
+        values = pd.Categorical.from_codes(np.asarray(values), categories=pd.Index(categories, dtype=object))
+        data[name] = values if column['kind'] == 'category' else np.asarray(values, dtype=object)
+    return pd.DataFrame(data, index=pd.RangeIndex(meta['rows']))
+
+
+def convert_run(run_dir):
+    """
+    Writes the columnar copies of the CSV files of a run directory.
+
+    Returns:
+        list: The converted CSV files.
+    """
+    converted = []
+    for file_name in CONVERTED_FILES:
+        csv_path = os.path.join(run_dir, file_name)
+        if os.path.exists(csv_path):
+            write_columnar(read_csv(csv_path), columnar_path(csv_path), csv_delimiter(csv_path))
+            converted.append(csv_path)
+    return converted
+
+
+def export_csv(run_dir):
+    """
+    Writes the CSV files of a run directory from their columnar copies, separated by the delimiter of the
+    converted CSV files (';' for copies that did not store it).
+
+    Returns:
+        list: The written CSV files.
+    """
+    exported = []
+    for file_name in CONVERTED_FILES:
+        csv_path = os.path.join(run_dir, file_name)
+        if os.path.isdir(columnar_path(csv_path)):
+            frame = read_columnar(columnar_path(csv_path))
+            delimiter = _read_meta(columnar_path(csv_path)).get('delimiter', ';')
+            frame.to_csv(csv_path + '.tmp', sep=delimiter, index=False)
+            os.replace(csv_path + '.tmp', csv_path)
+            exported.append(csv_path)
+    return exported
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert the CSV files of the runs to columnar copies.')
+    parser.add_argument('run_dirs', nargs='*', help='Run directories, default: data and data/data_run_*')
+    parser.add_argument('--export-csv', action='store_true', help='Write the CSV files from the columnar copies')
+    arguments = parser.parse_args()
+    run_dirs = arguments.run_dirs or [os.path.dirname(data_run_dirs)] + sorted(glob.glob(data_run_dirs))
+    for run_dir in run_dirs:
+        paths = export_csv(run_dir) if arguments.export_csv else convert_run(run_dir)
+        print(f"{run_dir}: {', '.join(os.path.basename(path) for path in paths) or 'nothing to do'}")
@@ -0,0 +1,106 @@
+import asyncio
+import random
+import time
+
+
+class RateLimiter:
+    """
+    Token bucket limiting the requests and tokens sent to the LLM per minute.
+
+    Parameters:
+        requests_per_minute (int, optional): Maximum number of requests per minute, None for no limit.
+        tokens_per_minute (int, optional): Maximum number of tokens per minute, None for no limit.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = requests_per_minute or 0
+        self._tokens = tokens_per_minute or 0
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        minutes = (now - self._updated) / 60
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute, self._requests + minutes * self.requests_per_minute)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + minutes * self.tokens_per_minute)
+
+    def _wait_time(self, tokens):
+        waits = [0]
+        if self.requests_per_minute:
+            waits.append((1 - self._requests) * 60 / self.requests_per_minute)
+        if self.tokens_per_minute:
+            waits.append((tokens - self._tokens) * 60 / self.tokens_per_minute)
+        return max(waits)
+
+    async def acquire(self, tokens=0):
+        """
+        Waits until one request using the given number of tokens may be sent.
+        """
+        if self.tokens_per_minute:
+            # a single request can never use more than a full bucket
+            tokens = min(tokens, self.tokens_per_minute)
+        async with self._lock:
+            self._refill()
+            wait = self._wait_time(tokens)
+            while wait > 0:
+                await asyncio.sleep(wait)
+                self._refill()
+                wait = self._wait_time(tokens)
+            self._requests -= 1
+            self._tokens -= tokens
+
+
+def backoff_delay(attempt, base_delay=1.0, max_delay=60.0):
+    """
+    Exponential backoff with full jitter: a random delay between 0 and base_delay * 2^attempt seconds.
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+async def retry_with_backoff(function, max_attempts=3, base_delay=1.0, max_delay=60.0, description='Calling the LLM'):
+    """
+    Awaits function() until it succeeds, waiting with exponential backoff and jitter between the attempts.
+
+    Parameters:
+        function (callable): Coroutine function without arguments.
+        max_attempts (int): Number of attempts before the last exception is raised.
+        base_delay, max_delay (float): Parameters of backoff_delay().
+        description (str): Used in the retry messages.
+
+    Returns:
+        The result of function().
+    """
+    for attempt in range(max_attempts):
+        try:
+            return await function()
+        except Exception as e:
+            if attempt == max_attempts - 1:
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            print(f'{description} did not work. Retrying in {delay:.1f}s...', e)
+            print("Retries left:", max_attempts - attempt - 1)
+            await asyncio.sleep(delay)
+
+
+async def run_concurrently(items, worker, max_in_flight):
+    """
+    Processes the items with at most max_in_flight workers at the same time.
+
+    Parameters:
+        items (iterable): Items to process.
+        worker (callable): Coroutine function called as worker(worker_id, item), worker_id is between 0 and
+        max_in_flight - 1 and is never used by two items at the same time.
+        max_in_flight (int): Number of workers.
+    """
+    iterator = iter(items)
+
+    async def work(worker_id):
+        for item in iterator:
+            await worker(worker_id, item)
+
+    await asyncio.gather(*[work(worker_id) for worker_id in range(max_in_flight)])
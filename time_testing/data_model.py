@@ -0,0 +1,102 @@
+import pandas as pd
+
+# Action, the record of one action, is defined next to its parser parse_actions()
+from time_testing.action_parser import Action, csv_action
+from time_testing.action_stream import expected_actions
+
+
+class TestCase:
+    """
+    One row of test_data.csv.
+
+    Parameters:
+        test_data_id, use_case_id (int): Identifiers of the test case.
+        prompt (str): User request sent to reAct_booking.
+        actions (str): Expected actions as list literal, e.g. "['book_time(employee: Max, project: X, time: 5)']".
+        reasoning (str): Expected reasoning.
+    """
+    __slots__ = ('test_data_id', 'use_case_id', 'prompt', 'actions', 'reasoning', '_expected_actions')
+
+    def __init__(self, test_data_id, use_case_id, prompt, actions, reasoning):
+        self.test_data_id = int(test_data_id)
+        self.use_case_id = int(use_case_id)
+        self.prompt = prompt
+        self.actions = actions
+        self.reasoning = reasoning
+        self._expected_actions = None
+
+    @property
+    def expected_actions(self):
+        """
+        The expected actions as Action records, parsed on first use.
+        """
+        if self._expected_actions is None:
+            self._expected_actions = expected_actions(self.actions)
+        return self._expected_actions
+
+    @classmethod
+    def from_frame(cls, test_data):
+        """
+        The test cases of a test data DataFrame (Test_data_id is the index), without iterrows().
+        """
+        reasonings = test_data['Reasoning'] if 'Reasoning' in test_data else [None] * len(test_data)
+        return [cls(index, use_case_id, prompt, actions, reasoning)
+                for index, use_case_id, prompt, actions, reasoning in zip(
+                    test_data.index, test_data['Use_case_id'], test_data['Prompt'], test_data['Actions'], reasonings)]
+
+    def to_csv_row(self):
+        """
+        The values in the order of the columns of test_data.csv.
+        """
+        return [self.use_case_id, self.test_data_id, self.prompt, self.actions, self.reasoning]
+
+    def __repr__(self):
+        return f'TestCase({self.test_data_id}, use_case_id={self.use_case_id})'
+
+
+def read_test_cases(path):
+    """
+    Reads the test cases of a test_data.csv.
+    """
+    return TestCase.from_frame(pd.read_csv(path, sep=';'))
+
+
+class ScoreRow:
+    """
+    One row of results.csv: the evaluation of one action of a test case.
+
+    Parameters:
+        use_case_id, test_data_id (int): Test case of the action.
+        correct, correct_wrong_order, optional (bool): Whether the action was expected at this position, expected
+        at another position, or an unexpected call of an optional endpoint.
+        action (Action): The action, or the list of Action of an expected action that was not done. Stored as
+        Action_solution, see csv_action().
+        fields (list): One flag per column after Action_solution: Endpoint and the variables in the order of
+        get_variable_names().
+        reasoning_correct (bool): Whether the reasoning was judged equal to the expected one.
+        reasoning (str): Reasoning of the LLM.
+    """
+    __slots__ = ('use_case_id', 'test_data_id', 'correct', 'correct_wrong_order', 'optional', 'action', 'fields',
+                 'reasoning_correct', 'reasoning')
+
+    def __init__(self, use_case_id, test_data_id, correct, correct_wrong_order, optional, action, fields,
+                 reasoning_correct=False, reasoning=''):
+        self.use_case_id = use_case_id
+        self.test_data_id = test_data_id
+        self.correct = correct
+        self.correct_wrong_order = correct_wrong_order
+        self.optional = optional
+        self.action = action
+        self.fields = fields
+        self.reasoning_correct = reasoning_correct
+        self.reasoning = reasoning
+
+    def to_csv_row(self):
+        """
+        The values in the order of result_columns().
+        """
+        return [self.use_case_id, self.test_data_id, self.correct, self.correct_wrong_order, self.optional,
+                csv_action(self.action), *self.fields, self.reasoning_correct, self.reasoning]
+
+    def __repr__(self):
+        return f'ScoreRow({self.to_csv_row()!r})'
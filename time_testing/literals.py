@@ -0,0 +1,78 @@
+import ast
+import re
+
+# String literals as written by repr(), the escapes are decoded by _unescape()
+_STRING = re.compile(r"'([^'\\]*(?:\\.[^'\\]*)*)'|\"([^\"\\]*(?:\\.[^\"\\]*)*)\"", re.DOTALL)
+_SPACE = re.compile(r'\s*')
+
+
+def _unescape(value):
+    # latin-1 with backslashreplace keeps all other characters, unicode_escape then decodes the escapes in C
+    return value.encode('latin-1', 'backslashreplace').decode('unicode_escape') if '\\' in value else value
+
+
+class _Scanner:
+    def __init__(self, text):
+        self.text = text
+        self.position = 0
+
+    def skip_space(self):
+        self.position = _SPACE.match(self.text, self.position).end()
+
+    def accept(self, character):
+        self.skip_space()
+        if self.text.startswith(character, self.position):
+            self.position += len(character)
+            return True
+        return False
+
+    def expect(self, character):
+        if not self.accept(character):
+            raise ValueError(f'Expected {character!r} at position {self.position}')
+
+    def string(self):
+        self.skip_space()
+        match = _STRING.match(self.text, self.position)
+        if match is None:
+            raise ValueError(f'Expected a string at position {self.position}')
+        self.position = match.end()
+        value = match.group(1) if match.group(1) is not None else match.group(2)
+        return _unescape(value)
+
+    def items(self, closing, item):
+        values = []
+        while not self.accept(closing):
+            values.append(item())
+            if not self.accept(','):
+                self.expect(closing)
+                break
+        self.skip_space()
+        if self.position != len(self.text):
+            raise ValueError(f'Unexpected text at position {self.position}')
+        return values
+
+
+def parse_literal(text):
+    """
+    Parses a list of strings or a dict with string keys and values, as written by repr(), without
+    ast.literal_eval(). Any other literal is passed to ast.literal_eval(), so only literals are ever evaluated.
+
+    Parameters:
+        text (str): The literal, e.g. "['book_time(employee: Julia)']" or "{'REASONING': '...'}".
+
+    Returns:
+        list or dict: The parsed literal.
+    """
+    scanner = _Scanner(text)
+    try:
+        if scanner.accept('['):
+            return scanner.items(']', scanner.string)
+        if scanner.accept('{'):
+            def pair():
+                key = scanner.string()
+                scanner.expect(':')
+                return key, scanner.string()
+            return dict(scanner.items('}', pair))
+    except ValueError:
+        pass
+    return ast.literal_eval(text)
@@ -1,57 +1,55 @@
-import ast
-import csv
+import asyncio
 import os
-import random
+import time
 
-import openai
+import numpy as np
 import pandas as pd
-import re
 
 from lmql import LMQLResult
-from lmql_prompting.call_api import csv_use_case_path, csv_data_path, reAct_booking, csv_types_path, csv_results, \
-    provided_endpoints, optional_endpoints, csv_results_lmql, csv_bookings_isolated_path, csv_bookings_path
-from lmql_prompting.evaluate_reasoning import compare_reasoning
+from lmql_prompting.call_api import csv_use_case_path, csv_data_path, csv_results, optional_endpoints, \
+    booking_namespace, drop_namespace, archive_namespace, close_session, reAct_booking_config, \
+    sqlite_response_cache, trace_dir, jsonl_run_manifest
+from lmql_prompting.evaluate_reasoning import compare_reasoning_config
+from lmql_prompting.model_backend import LMQLBackend
+from lmql_prompting.response_cache import ResponseCache
+from lmql_prompting.streaming import run_streamed
+from lmql_prompting.tracing import TestCaseTrace, TraceWriter, current_trace
+from time_testing.action_parser import parse_actions
+from time_testing.action_stream import ActionStream
+from time_testing.concurrency import RateLimiter, retry_with_backoff, run_concurrently
+from time_testing.data_model import ScoreRow, TestCase
+from time_testing.reasoning_judge import ReasoningJudge
+from time_testing.report import display_results
+from time_testing.result_sink import ResultSink
+from time_testing.run_manifest import RunManifest
+from time_testing.sampler import sample_actions
+from time_testing.scoring import data_formatting, get_actions, get_reasoning, get_variable_names, \
+    get_variables_constraints, result_columns, score_test_cases
+from time_testing.transcript_store import open_transcripts
 
 
 TEST_DATA_ITERATION = 50
-MIN_HOURS_BOOKABLE = 1
-MAX_HOURS_BOOKABLE = 8
+# Rough number of tokens one reAct_booking query uses, needed for the tokens per minute limit
+ESTIMATED_TOKENS_PER_TEST_CASE = 2000
+# Rough number of tokens one generate_prompt query uses
+ESTIMATED_TOKENS_PER_PROMPT = 300
 
-
-def get_actions(result):
-    """
-    Extracts and returns the actions from the given lmql result.
-
-    Parameters:
-        result (dict): A dictionary containing the result.
-
-    Returns:
-        list: A list of strings representing the extracted actions.
-    """
-    variables = result.variables['REASONING']
-    result = re.findall(r'Action:(.*?)Observation', variables, re.DOTALL)
-    result = [action.strip() for action in result]
-    return result
+# Cache of the reAct_booking and compare_reasoning results, disabled by go_through_test_data(use_cache=False)
+response_cache = ResponseCache(sqlite_response_cache)
+# Backend of the reAct_booking, compare_reasoning and generate_prompt queries, see use_model_backend()
+model_backend = LMQLBackend()
 
 
-def get_reasoning(result):
+def use_model_backend(backend):
     """
-    Extracts and returns the reasoning provided by the lmql result.
-
-    Parameters:
-        result (dict): A dictionary containing the result.
+    Sends all following LLM queries to the backend, e.g. a MockBackend to run the harness without a model.
 
     Returns:
-        list: A list of strings representing the extracted actions.
+        The previous backend.
     """
-    try:
-        variables = result.variables['REASONING']
-        result = re.findall(r'Thought:(.*?)\n\nAction', variables, re.DOTALL)
-        result = '\n'.join([f"{i + 1}. {item}" for i, item in enumerate(result)])
-        return result
-    except Exception as e:
-        print("Something went wrong when evaluating the reasoning:", e)
-        return None
+    global model_backend
+    previous, model_backend = model_backend, backend
+    return previous
 
 
 def generate_new_reasoning(new_actions, variables, reasoning):
@@ -69,10 +67,11 @@ def generate_new_reasoning(new_actions, variables, reasoning):
     parameters = extract_values(new_actions)
     for action in parameters:
         for variable in variables:
-            try:
-                reasoning = reasoning.replace(variable, action[variable.replace("[", "").replace("]", "")])
-            except Exception as e:
-                print(f"{variable} not in {action}", e)
+            value = getattr(action, variable.replace("[", "").replace("]", ""), None)
+            if value is None:
+                print(f"{variable} not in {action}")
+                continue
+            reasoning = reasoning.replace(variable, value)
     return reasoning
 
 
@@ -80,251 +79,415 @@ def remove_unecessary_prompt(new_prompt):
     return new_prompt.replace("User_request_new:", "").replace("user_request_new:", "")
 
 
-def generate_test_data(use_case, variables, constraints, index_use_case, index_test_data):
+def create_test_data_rows(use_case, variables, constraints, index_use_case, seed=None, sampling='random'):
     """
-    Generate test data based on the provided use case example.
+    Create the actions and the reasoning of the test data for the provided use case example, the prompts are
+    added by paraphrase_prompts().
+
+    The field values of all rows are drawn at once without repeating a combination, see sample_actions().
 
     Parameters:
         use_case (dict): The use case description in a dictionary.
         variables, constraints (str): from get_variables_constraints()
         index_use_case (int): use case index for which test data is currently generated
-        index_test_data (int): counter which is incremented for each created use case
+        seed (int, optional): Seed of the sampling, together with index_use_case it gives the same rows again.
+        sampling (str): 'random', 'stratified' or 'pairwise', see sample_assignments().
 
-    This function creates multiple examples (TEST_DATA_ITERATION) based on the test data input for the given use case
-    and adds the created data to the test_data.csv
+    Returns:
+        list: TEST_DATA_ITERATION rows [Use_case_id, Prompt (None), Actions, Reasoning], fewer if the use case has
+        fewer combinations of values.
     """
-
     variables = [item.strip() for item in variables.split(',')]
-    actions = use_case['Actions']
     reasoning = use_case['Reasoning']
-    max_retries = 3
+    rng = np.random.default_rng(None if seed is None else [seed, index_use_case])
+    return [[index_use_case, None, new_actions, generate_new_reasoning(new_actions, variables, reasoning)]
+            for new_actions in sample_actions(use_case['Actions'], constraints, TEST_DATA_ITERATION, rng, sampling)]
 
-    for i in range(0, TEST_DATA_ITERATION):
-        new_actions = replace_action_values(actions, constraints)
-        new_reasoning = generate_new_reasoning(new_actions, variables, reasoning)
-        for _ in range(max_retries):
-            try:
-                new_prompt = None
-                break
-            except Exception as e:
-                print('Calling the LLM did not work. Retrying...', e)
-                print("Retries left:", max_retries - _ - 1)
-        new_prompt = remove_unecessary_prompt(new_prompt)
-        test_data = pd.read_csv(csv_data_path, delimiter=";")
-        index_test_data = test_data.shape[0]
-        new_row = [index_use_case, index_test_data, new_prompt, new_actions, new_reasoning]
-        test_data = test_data._append(pd.Series(new_row, index=test_data.columns), ignore_index=True)
-        test_data.to_csv(csv_data_path, sep=';', index=False)
-    return index_test_data
 
+def run_generate_prompt(use_case, new_actions):
+    """
+    Calls the LLM for a new user request based on the use case and the new actions. Blocking.
+    """
+    result = model_backend.generate_prompt(use_case, new_actions)
+    if isinstance(result, list):
+        result = result[0]
+    return remove_unecessary_prompt(result.variables['prompt_new'])
 
-def extract_values(input_string):
-    pattern1 = r'(\w+)\(employee:\s*([^,]+)(?:,\s*project:\s*([^,]+))?(?:,\s*time:\s*(\d+))?\)'
-    pattern2 = r'(\w+)\(employee:\s*([^,]+)(?:,\s*project:\s*([^,]+))?,\s*time:\s*(\d+)\s*\)\.'
-
-    matches = re.findall(pattern1, input_string)
-    if not matches:
-        matches = re.findall(pattern2, input_string)
-
-    extracted_data = []
-    for match in matches:
-        endpoint, employee, project, time = match
-        extracted_item = {'endpoint': endpoint, 'employee': employee.strip()}
-        if project:
-            extracted_item['project'] = project.strip()
-        if time:
-            extracted_item['time'] = time.strip()
-        extracted_data.append(extracted_item)
-
-    return extracted_data
-
-
-def replace_action_values(input_string, constraints):
-    extracted_data = extract_values(input_string)
-    replacements = {}
-    for action in extracted_data:
-        for key, value in action.items():
-            if value not in replacements.keys() and key != 'endpoint':
-                if constraints[key] != 'INT':
-                    replacements[value] = random.choice(constraints[key])
-                else:
-                    replacements[value] = str(random.randint(MIN_HOURS_BOOKABLE, MAX_HOURS_BOOKABLE))
 
-    pattern = r'\b(' + '|'.join(re.escape(key) for key in replacements.keys()) + r')\b'
-    output_string = re.sub(pattern, lambda x: replacements[x.group()], input_string)
+def normalize_prompt(prompt):
+    return ' '.join(str(prompt).lower().split())
+
+
+async def paraphrase_prompts(use_cases, max_in_flight=1, requests_per_minute=None, tokens_per_minute=None,
+                             max_retries=3, existing_prompts=None, on_use_case_done=None):
+    """
+    Fill in the prompts of the created test data rows with up to max_in_flight generate_prompt queries at the same
+    time.
+
+    A paraphrase which is identical (ignoring case and whitespace) to a prompt already produced for the same use
+    case is requested again, up to max_retries times. Failed queries are retried with exponential backoff.
 
-    return output_string
+    Rows for which no prompt could be generated, or only duplicates, keep None as prompt.
 
+    Parameters:
+        use_cases (list): (use_case, rows) pairs, rows from create_test_data_rows().
+        max_in_flight (int): Maximum number of LLM queries at the same time.
+        requests_per_minute, tokens_per_minute (int, optional): Rate limits of the LLM.
+        max_retries (int): Number of attempts for every prompt.
+        existing_prompts (dict, optional): Use_case_id -> prompts that already exist in the test data.
+        on_use_case_done (callable, optional): Called with the index in use_cases once all prompts of the use case
+        are filled in, in the order of use_cases.
+    """
+    rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    existing_prompts = existing_prompts or {}
+    seen = [{normalize_prompt(prompt) for prompt in existing_prompts.get(use_case['Use_case_id'], ())}
+            for use_case, _ in use_cases]
+    missing = [len(rows) for _, rows in use_cases]
+    next_done = 0
+
+    async def paraphrase(worker_id, item):
+        nonlocal next_done
+        use_case_index, row = item
+        use_case = use_cases[use_case_index][0]
+
+        async def query():
+            await rate_limiter.acquire(ESTIMATED_TOKENS_PER_PROMPT)
+            return await asyncio.to_thread(run_generate_prompt, use_case, row[2])
+
+        try:
+            for attempt in range(max_retries):
+                row[1] = await retry_with_backoff(query, max_retries)
+                if normalize_prompt(row[1]) not in seen[use_case_index]:
+                    seen[use_case_index].add(normalize_prompt(row[1]))
+                    break
+                print(f"Duplicate prompt for use case {use_case['Use_case_id']}, attempts left:",
+                      max_retries - attempt - 1)
+            else:
+                # only duplicates, the row is left out of the test data
+                row[1] = None
+        except Exception as e:
+            # the row is left out of the test data
+            print(f"Giving up on a prompt for use case {use_case['Use_case_id']}:", e)
+            row[1] = None
 
-def get_variables_constraints():
+        missing[use_case_index] -= 1
+        while next_done < len(use_cases) and missing[next_done] == 0:
+            if on_use_case_done is not None:
+                on_use_case_done(next_done)
+            next_done += 1
+
+    items = [(use_case_index, row) for use_case_index, (_, rows) in enumerate(use_cases) for row in rows]
+    await run_concurrently(items, paraphrase, max_in_flight)
+
+
+def generate_test_data(use_case, variables, constraints, index_use_case):
     """
-    Generate variable and constraint strings based on data from a CSV file.
+    Generate test data based on the provided use case example.
+
+    Parameters:
+        use_case (dict): The use case description in a dictionary.
+        variables, constraints (str): from get_variables_constraints()
+        index_use_case (int): use case index for which test data is currently generated
+
+    This function creates multiple examples (TEST_DATA_ITERATION) based on the test data input for the given use case.
+    The examples are only kept in memory, see append_test_data() for adding them to the test_data.csv
 
     Returns:
-        tuple: A tuple containing two strings:
-            1. variable_string (str): A string representing a list of variables.
-            2. constraint_string (str): A string representing the constraints for the variables.
-            This string contains a list as a string with all possible values for a variable.
-    """
-    data_dict = {}
-
-    with open(csv_types_path, 'r') as file:
-        csv_reader = csv.DictReader(file)
-        for row in csv_reader:
-            data_dict = row
-    variable_string = ""
-    constraint_string = ""
-    constraint = {}
-    counter = 1
-    for key, value in data_dict.items():
-        variable_string += f"[{key}]"
-        if value == "INT":
-            constraint_string += f"INT({key})"
-            constraint[key] = value
-        else:
-            try:
-                list(value)
-                constraint_string += f"{key} in {value}"
-                constraint[key] = ast.literal_eval(value)
-            except Exception as e:
-                print('You did not provide a correct list filled with values ', e)
-        if counter < len(data_dict):
-            variable_string += ", "
-            constraint_string += " and "
-            counter += 1
-    return variable_string, constraint
+        list: The created rows [Use_case_id, Prompt, Actions, Reasoning].
+    """
+    rows = create_test_data_rows(use_case, variables, constraints, index_use_case)
+    asyncio.run(paraphrase_prompts([(use_case, rows)]))
+    return rows
+
+
+def append_test_data(rows, first_test_data_id):
+    """
+    Add the generated rows of one use case to the test_data.csv with a single append.
+
+    Parameters:
+        rows (list): Rows from generate_test_data(), rows without prompt are left out.
+        first_test_data_id (int): Test_data_id of the first row, the following rows are numbered consecutively.
+
+    Returns:
+        int: The Test_data_id of the next row.
+    """
+    rows = [row for row in rows if row[1] is not None]
+    test_cases = [TestCase(first_test_data_id + i, use_case_id, prompt, actions, reasoning)
+                  for i, (use_case_id, prompt, actions, reasoning) in enumerate(rows)]
+    test_data = pd.DataFrame([test_case.to_csv_row() for test_case in test_cases],
+                             columns=['Use_case_id', 'Test_data_id', 'Prompt', 'Actions', 'Reasoning'])
+    test_data.to_csv(csv_data_path, mode='a', header=False, sep=';', index=False)
+    return first_test_data_id + len(rows)
+
+
+def extract_values(input_string):
+    return parse_actions(input_string)
+
+
+def replace_action_values(input_string, constraints, seed=None):
+    return sample_actions(input_string, constraints, 1, seed)[0]
 
 
-def generate_test_data_from_use_case(use_case_nr=0):
+def generate_test_data_from_use_case(use_case_nr=0, max_in_flight=1, requests_per_minute=None,
+                                     tokens_per_minute=None, seed=None, sampling='random'):
     """
     Go through all provided use cases and start the process of generating test data.
 
     This function reads the use cases from the csv file and generates test data for each use case.
+    The prompts of all use cases are generated with up to max_in_flight LLM queries at the same time. The rows of
+    each use case are appended to the test_data.csv as soon as the use case and all use cases before it are done,
+    so the Test_data_ids do not depend on which prompt finishes first.
 
     Parameters:
     use_case_nr (int, optional): The index from where on test data should be generated.
+    max_in_flight (int, optional): Maximum number of LLM queries at the same time.
+    requests_per_minute, tokens_per_minute (int, optional): Rate limits of the LLM.
+    seed (int, optional): Seed of the sampled values, a random one is drawn and printed if None.
+    sampling (str): 'random', 'stratified' or 'pairwise', see sample_assignments().
     """
     use_cases = pd.read_csv(csv_use_case_path, sep=';')
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    print(f"Sampling seed: {seed}")
 
     variables, constraints = get_variables_constraints()
 
-    counter = 0
+    # Test_data_id is the row number in the test_data.csv
+    test_data = pd.read_csv(csv_data_path, sep=';', usecols=['Use_case_id', 'Prompt'])
+    next_test_data_id = test_data.shape[0]
+    existing_prompts = test_data.groupby('Use_case_id')['Prompt'].apply(list).to_dict()
 
-    for index, example in use_cases.iterrows():
-        if index >= use_case_nr:
-            example = example.to_dict()
-            counter = generate_test_data(example, variables, constraints, index, counter)
+    selected = [(example.to_dict(), create_test_data_rows(example.to_dict(), variables, constraints, index, seed,
+                                                          sampling))
+                for index, example in use_cases.iterrows() if index >= use_case_nr]
 
+    def commit(use_case_index):
+        nonlocal next_test_data_id
+        next_test_data_id = append_test_data(selected[use_case_index][1], next_test_data_id)
 
-def move_entries(source_file, dest_file):
-    """
-    Move entries from a source CSV file to a destination CSV file.
+    asyncio.run(paraphrase_prompts(selected, max_in_flight, requests_per_minute, tokens_per_minute,
+                                   existing_prompts=existing_prompts, on_use_case_done=commit))
 
-    Parameters:
-        source_file (str): Path to the source CSV file.
-        dest_file (str): Path to the destination CSV file.
+
+def go_through_test_data(use_stored_data, compare_reasoning, use_case_id, max_in_flight=1, requests_per_minute=None,
+                         tokens_per_minute=None, run_id=None, resume=False, use_cache=True, stop_policy=None):
     """
-    # Read entries from source CSV and move them to destination CSV
-    source_df = pd.read_csv(source_file, delimiter=';')
-    entries_to_move = source_df.iloc[0:].copy()  # Exclude the header
+        Go through all test data that has been provided, write the prompts and compare the
+        data with the generated test data and then directly post to csv file
 
-    # Delete entries from source CSV
-    source_df.drop(source_df.index[0:], inplace=True)
-    source_df.to_csv(source_file, sep=';', index=False)
+        Up to max_in_flight test cases are sent to the LLM at the same time, see run_test_data_concurrently().
+        The run is checkpointed in the run manifest (status, attempts and error per Test_data_id, see
+        RunManifest). With resume=True the rows already in results.csv are kept and their test cases are skipped,
+        failed and unfinished test cases are queued again and test cases whose transcript was already stored by
+        the interrupted run are only scored, so no LLM call is repeated.
+        Reasonings are compared by reasoning_judge. Stored transcripts are scored all at once, see
+        evaluate_stored_transcripts(), and their reasoning comparisons run concurrently.
+        With use_cache=True results of reAct_booking and compare_reasoning for the same inputs are taken from
+        the response cache instead of querying the LLM again.
+        A stop_policy (StopPolicy) stops every generation early, e.g. once all expected actions are done.
+    """
+    response_cache.enabled = use_cache
+    variables = get_variable_names()
+    result_actions = ResultSink(csv_results, result_columns(variables), resume=resume)
+    test_data = pd.read_csv(csv_data_path, sep=';')
+    test_data = test_data[test_data['Use_case_id'] >= use_case_id]
+    test_data = test_data[~test_data.index.isin(result_actions.completed_test_data_ids)]
+    transcripts = open_transcripts()
+
+    with result_actions, response_cache:
+        if not use_stored_data:
+            run_id = run_id or time.strftime('run-%Y%m%d-%H%M%S')
+            manifest = RunManifest(jsonl_run_manifest, resume=resume)
+            asyncio.run(run_test_data_concurrently(test_data, compare_reasoning, variables, result_actions,
+                                                   max_in_flight, requests_per_minute, tokens_per_minute,
+                                                   run_id=run_id, transcripts=transcripts, manifest=manifest,
+                                                   stop_policy=stop_policy))
+            failures = manifest.failures()
+            print(f"Run manifest: {manifest.counts()}")
+            for entry in failures:
+                print(f"Test data {entry['test_data_id']} failed after {entry['attempts']} attempts: {entry['error']}")
+            if failures:
+                print("Run again with resume=True to retry the failed test cases.")
+        else:
+            test_cases = [test_case for test_case in TestCase.from_frame(test_data)
+                          if test_case.test_data_id in transcripts]
+            evaluate_stored_transcripts(test_cases, transcripts, result_actions, compare_reasoning, variables,
+                                        max_in_flight)
 
-    # Append entries to destination CSV
-    entries_to_move.to_csv(dest_file, mode='a', header=False, sep=';', index=False)
+    if compare_reasoning:
+        print(f"Reasoning: {reasoning_judge.prefiltered} pairs decided locally, "
+              f"{reasoning_judge.judged} compared by the LLM")
 
 
-def go_through_test_data(use_stored_data, compare_reasoning, use_case_id):
+def query_react_booking(prompt, stream=None):
     """
-        Go through all test data that has been provided, write the prompts and compare the
-        data with the generated test data and then directly post to csv file
+    Runs reAct_booking, streamed to the ActionStream if given. If the stream stops the generation early the
+    text generated so far is returned as result.
     """
-    variables, constraints = get_variables_constraints()
-    split_elements = variables.split(', ')
-    variables = [element.strip('[] ') for element in split_elements]
-    variables_capitalized = [element.capitalize() for element in variables]
-    result_actions = pd.DataFrame(
-        columns=['Use_case_id', 'Test_data_id', 'Correct', 'Correct_Wrong_Order', 'Optional', 'Action_solution', 'Endpoint'] +
-                variables_capitalized + ['Reasoning_correct', 'Reasoning'])
-    test_data = pd.read_csv(csv_data_path, sep=';')
-    counter = 0
-    max_retries = 3
-    results_pd = pd.read_csv(csv_results_lmql)
-
-    for index, data in test_data.iterrows():
-        if not use_stored_data and data['Use_case_id'] >= use_case_id:
-            counter += 1
-            for _ in range(max_retries):
-                try:
-                    result = reAct_booking(data['Prompt'], "")[0]
-                    move_entries(csv_bookings_isolated_path, csv_bookings_path)
-                    print(f"Did nr: {counter}")
-                    save_to_csv(csv_results_lmql, result)
-                    counter = evaluate_actions_and_reasoning(result, data['Actions'], result_actions, index,
-                                                             data['Use_case_id'], counter, data['Reasoning'],
-                                                             compare_reasoning,
-                                                             variables)
-                    break
-                except Exception as e:
-                    print('Calling the LLM did not work. Retrying...', e)
-                    print("Retries left:", max_retries - _ - 1)
-        elif use_stored_data and data['Use_case_id'] >= use_case_id:
-            result = load_from_csv(results_pd, index)
-            counter = evaluate_actions_and_reasoning(result, data['Actions'], result_actions, index,
-                                                     data['Use_case_id'], counter, data['Reasoning'], compare_reasoning,
-                                                     variables)
+    if stream is None:
+        return model_backend.reAct_booking(prompt, "")[0]
+    stream.reset()
+    results = run_streamed(model_backend.reAct_booking, stream, prompt, "")
+    if results is None:
+        return LMQLResult(f"Task: {prompt}A: Let's think step by step\n{stream.text}", {'REASONING': stream.text})
+    return results[0]
 
 
-def save_to_csv(filename, instance):
+def run_react_booking(prompt, namespace, trace=None, stream=None):
+    """
+    Runs reAct_booking for one prompt, all bookings of the tools go to the given namespace.
+    The attempt and its tool calls are recorded in the trace (TestCaseTrace), if given. With an ActionStream the
+    actions are scored while they are generated and the generation ends as soon as the stream's policy says so.
+    Blocking, meant to be run in a worker thread.
+    """
+    booking_namespace.set(namespace)
+    if trace is None:
+        return query_react_booking(prompt, stream)
+    current_trace.set(trace)
+    trace.start_attempt()
     try:
-        existing_df = pd.read_csv(filename, delimiter=";")
-    except:
-        existing_df = pd.DataFrame(columns=["prompt", "variables"])
-
-    existing_df.loc[len(existing_df.index)] = [instance.prompt, instance.variables.get('REASONING')]
-    existing_df.to_csv(filename, index=False, sep=";")
+        return query_react_booking(prompt, stream)
+    finally:
+        trace.finish_attempt()
+        trace.stop_reason = stream.stop_reason if stream is not None else None
 
 
-def load_from_csv(df, index):
-    prompt = df.iloc[index]['prompt']
-    variables = ast.literal_eval(df.iloc[index]['variables'])
-    return [LMQLResult(prompt, variables)]
+async def run_test_data_concurrently(test_data, compare_reasoning, variables, result_actions, max_in_flight,
+                                     requests_per_minute=None, tokens_per_minute=None, max_retries=3, run_id='run',
+                                     transcripts=None, trace_path=None, manifest=None, stop_policy=None):
+    """
+    Send the test cases to the LLM with up to max_in_flight queries at the same time.
+
+    Every test case books into its own namespace <run_id>-<Test_data_id> of the time booking application, so
+    test cases do not see each other's bookings. The namespace is emptied before every attempt and archived
+    (appended to bookings.csv by the application) once its result is stored, a failed archiving is only logged and
+    does not discard the result. Failed queries are retried with exponential backoff and jitter, the LLM calls are
+    limited to requests_per_minute and tokens_per_minute.
+    Storing and evaluating the results happens one test case at a time. The timings of every test case
+    (attempts, ReAct steps, tool calls) are appended to the trace file <trace_dir>/<run_id>.jsonl.
+    Without tool calls (a MockBackend with call_tools=False) the namespaces are not touched.
+    The status, attempts and error of every test case are checkpointed in the manifest, if given. Test cases
+    whose transcript the manifest already has are scored again from the transcript instead of querying the LLM.
+    A test case whose result cannot be loaded, queried, stored or evaluated is recorded as failed, the other test
+    cases go on.
+    With a stop_policy the actions are extracted while the LLM generates them and the generation is stopped
+    early (see ActionStream), results of stopped generations are cached separately from complete ones.
 
+    Parameters:
+        test_data (DataFrame): Test cases to run.
+        compare_reasoning (bool): Whether the reasoning is compared as well.
+        variables (list): Variables of the actions, see get_variables_constraints().
+        result_actions (ResultSink): Evaluation results are added to this sink.
+        max_in_flight (int): Maximum number of LLM queries at the same time.
+        requests_per_minute, tokens_per_minute (int, optional): Rate limits of the LLM.
+        max_retries (int): Number of attempts for every test case.
+        run_id (str): Identifier of the run, prefix of the booking namespaces.
+        transcripts (TranscriptStore, optional): Store the transcripts are saved to, see open_transcripts().
+        trace_path (str, optional): Trace file instead of <trace_dir>/<run_id>.jsonl.
+        manifest (RunManifest, optional): Checkpoint of the run.
+        stop_policy (StopPolicy, optional): When generations are stopped early, None to always let them finish.
+    """
+    transcripts = transcripts if transcripts is not None else open_transcripts()
+    rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    evaluation_lock = asyncio.Lock()
+    traces = TraceWriter(trace_path or os.path.join(trace_dir, f'{run_id}.jsonl'))
+    config = model_backend.config(reAct_booking_config)
+    if stop_policy:
+        config = dict(config, stop_policy=stop_policy._asdict())
+
+    async def run_test_case(worker_id, test_case):
+        index = test_case.test_data_id
+        namespace = f'{run_id}-{index}'
+        trace = TestCaseTrace(index, test_case.use_case_id, reAct_booking_config['model'])
+
+        inputs = {'content': test_case.prompt, 'few_shot_examples': ''}
+        stream = ActionStream(test_case.expected_actions, stop_policy, reAct_booking_config['model']) \
+            if stop_policy else None
+
+        async def query():
+            if model_backend.call_tools:
+                await drop_namespace(namespace)
+            await rate_limiter.acquire(ESTIMATED_TOKENS_PER_TEST_CASE)
+            return await asyncio.to_thread(run_react_booking, test_case.prompt, namespace, trace, stream)
+
+        def fail(message, error, attempts):
+            print(message, error)
+            if manifest is not None:
+                manifest.failed(index, attempts, error)
+
+        resumed = manifest is not None and manifest.has_transcript(index) and index in transcripts
+        try:
+            if resumed:
+                # the LLM already answered in an earlier attempt of this run, only the scoring is repeated
+                result = await asyncio.to_thread(transcripts.load, index)
+            else:
+                result = await asyncio.to_thread(response_cache.load, 'reAct_booking', config, inputs)
+        except Exception as e:
+            traces.write(trace.to_record(run_id, 'failed'))
+            fail(f'Could not load the stored result of test data {index}:', e, 0)
+            return
+        if resumed:
+            traces.write(trace.to_record(run_id, 'resumed'))
+        queried = result is None
+        if queried:
+            try:
+                result = await retry_with_backoff(query, max_retries)
+            except Exception as e:
+                traces.write(trace.to_record(run_id, 'failed'))
+                fail(f'Giving up on test data {index} after {trace.attempts} attempts:', e, trace.attempts)
+                return
+            await asyncio.to_thread(response_cache.save, 'reAct_booking', config, inputs, result)
+            traces.write(trace.to_record(run_id, 'done', result))
+        elif not resumed:
+            traces.write(trace.to_record(run_id, 'cached'))
+
+        async with evaluation_lock:
+            print(f"Did nr: {index}")
+            attempts = trace.attempts
+            try:
+                if not resumed:
+                    save_transcript(transcripts, index, result)
+                    if manifest is not None:
+                        manifest.queried(index, attempts)
+                        attempts = 0
+                await asyncio.to_thread(evaluate_actions_and_reasoning, result, test_case.actions, result_actions,
+                                        index, test_case.use_case_id, test_case.reasoning, compare_reasoning,
+                                        variables)
+            except Exception as e:
+                # the other test cases go on, a resumed run queues this one again
+                fail(f'Could not store or evaluate test data {index}:', e, attempts)
+                return
+            if manifest is not None:
+                manifest.done(index)
+
+        if queried and model_backend.call_tools:
+            # the result is stored and scored by now, a failed archiving only loses the bookings of the namespace
+            try:
+                await archive_namespace(namespace)
+            except Exception as e:
+                print(f'Could not archive the bookings of test data {index} (namespace {namespace}):', e)
 
-def data_formatting(result, provided_actions):
-    actions = get_actions(result)
-    reasoning = get_reasoning(result)
     try:
-        actions = list(actions)
-    except Exception as e:
-        return print('Could not cast the provided actions to a list', e)
+        await run_concurrently(TestCase.from_frame(test_data), run_test_case, max_in_flight)
+    finally:
+        close_session()
 
-    data_result = []
 
-    for action in actions:
-        action = re.sub(r'[\'"{}]', '', action)
-        action = re.sub(r'  ', '', action)
-        data_result.append(extract_values(action))
+def save_transcript(transcripts, test_data_id, instance):
+    transcripts.append(test_data_id, LMQLResult(instance.prompt, {'REASONING': instance.variables.get('REASONING')}))
 
-    # remove all empty actions where nothing happend
-    data_result = [sublist for sublist in data_result if sublist]
 
-    data_solution = []
-    provided_actions = re.sub(r'"', "'", provided_actions)
-    provided_actions = ast.literal_eval(provided_actions)
-    for action in provided_actions:
-        action = re.sub(r'[\'"{}]', '', action)
-        data_solution.append(extract_values(action))
-
-    return data_solution, data_result, reasoning
+def load_transcript(transcripts, test_data_id):
+    return transcripts.load(test_data_id)
 
 
 def do_compare_reasoning(reasoning_solution, reasoning_result):
-    result = compare_reasoning(reasoning_solution, reasoning_result)
+    result = response_cache.cached_query('compare_reasoning', model_backend.config(compare_reasoning_config),
+                                         {'solution': reasoning_solution, 'result': reasoning_result},
+                                         lambda: model_backend.compare_reasoning(reasoning_solution,
+                                                                                 reasoning_result)[0])
     try:
-        val = result[0].variables['answer']
+        val = result.variables['answer']
         if val == 'true':
             return True
         else:
@@ -334,6 +497,10 @@ def do_compare_reasoning(reasoning_solution, reasoning_result):
         return False
 
 
+# Compares every distinct pair of reasonings once, obvious (mis)matches without the LLM
+reasoning_judge = ReasoningJudge(do_compare_reasoning)
+
+
 def initialize_status(variables):
     status = {
         'endpoint': True,
@@ -346,14 +513,22 @@ def initialize_status(variables):
     return status
 
 
-def evaluate_actions_and_reasoning(result, provided_actions, result_actions, test_data_id, use_case_id, counter,
-                                   reasoning_solution, compare_reasoning, variables):
+def score_actions(result, provided_actions, test_data_id, use_case_id, variables):
+    """
+    Compares the actions of the LLM result with the provided actions.
+
+    Returns:
+        tuple: The result rows (ScoreRow), the reasoning of the LLM and the rows whose reasoning still has to be
+        compared, see set_reasoning_correct().
+    """
     action_solutions, action_result, reasoning_result = data_formatting(result, provided_actions)
     keys_to_compare = ['endpoint']
     [keys_to_compare.append(element) for element in variables]
+    rows = []
+    reasoning_rows = []
 
     for index, action_result in enumerate(action_result):
-        reasoning_correct = False
+        reasoning_needed = False
         status = initialize_status(variables)
         try:
             new_data_solution = action_solutions
@@ -363,26 +538,25 @@ def evaluate_actions_and_reasoning(result, provided_actions, result_actions, tes
                 if action_result == action_solutions[0]:
                     new_data_solution = action_solutions[1:]
                     # If everything is as expected is also the reasoning correct?
-                    if compare_reasoning:
-                        reasoning_correct = do_compare_reasoning(reasoning_solution, reasoning_result)
+                    reasoning_needed = True
 
                 # Something is definitely wrong
                 else:
                     status['correct'] = False
                     for key in keys_to_compare:
-                        try:
-                            if action_result[0][key] != action_solutions[0][0][key]:
-                                # Set the corresponding variable to False
-                                status[key] = False
-                        except:
-                            None
+                        result_value = getattr(action_result[0], key, None)
+                        solution_value = getattr(action_solutions[0][0], key, None) if action_solutions[0] else None
+                        # a field missing in one of the actions is not compared
+                        if result_value is not None and solution_value is not None and result_value != solution_value:
+                            # Set the corresponding variable to False
+                            status[key] = False
 
             if action_result not in action_solutions:
                 # Something is definitely wrong
                 status['correct'] = False
 
                 # but maybe we did something optional?
-                if action_result[0]['endpoint'] in optional_endpoints:
+                if action_result[0].endpoint in optional_endpoints:
                     status['optional'] = True
                     # the reads could still be incorrect
             else:
@@ -392,69 +566,77 @@ def evaluate_actions_and_reasoning(result, provided_actions, result_actions, tes
         except Exception as e:
             print('Something went wrong when evaluation all inputs:', e)
 
-        result_to_store = [use_case_id, test_data_id, status['correct'], status['correct_wrong_order'], status['optional'],
-                           action_result[0], status['endpoint']]
-
-        for element in variables:
-            result_to_store.append(status[element])
-        result_to_store.append(reasoning_correct)
-        result_to_store.append(reasoning_result)
-
-        result_actions.loc[counter] = result_to_store
-        counter += 1
+        row = ScoreRow(use_case_id, test_data_id, status['correct'], status['correct_wrong_order'],
+                       status['optional'], action_result[0],
+                       [status['endpoint']] + [status[element] for element in variables], False, reasoning_result)
+        rows.append(row)
+        if reasoning_needed:
+            reasoning_rows.append(row)
 
     # we have crucial actions missing:
     for action_solution in action_solutions:
-        result_to_store = [use_case_id, test_data_id, False, False, False, action_solution, False]
-        for el in variables:
-            result_to_store.append(False)
-        result_to_store.append(False)
-        result_to_store.append("")
-        result_actions.loc[counter] = result_to_store
-        counter += 1
+        rows.append(ScoreRow(use_case_id, test_data_id, False, False, False, action_solution,
+                             [False] * (len(variables) + 1)))
 
-    result_actions.to_csv(csv_results, index=False, sep=";")
-    return counter
+    return rows, reasoning_result, reasoning_rows
 
 
-def display_results():
-    # Load the CSV file into a DataFrame
-    results = pd.read_csv(csv_results, delimiter=';')
+def set_reasoning_correct(reasoning_rows, reasoning_correct):
+    for row in reasoning_rows:
+        row.reasoning_correct = reasoning_correct
 
-    # Filter out rows where 'Optional' is False
-    results = results[results['Optional'] == False]
 
-    # Calculate the value counts for 'Correct' column
-    value_counts = results['Correct'].value_counts(normalize=True)
+def evaluate_actions_and_reasoning(result, provided_actions, result_actions, test_data_id, use_case_id,
+                                   reasoning_solution, compare_reasoning, variables):
+    rows, reasoning_result, reasoning_rows = score_actions(result, provided_actions, test_data_id, use_case_id,
+                                                           variables)
+    if compare_reasoning and reasoning_rows:
+        # all correct actions of a test case share the same reasoning, it is compared once
+        set_reasoning_correct(reasoning_rows, reasoning_judge.compare(reasoning_solution, reasoning_result))
+    result_actions.add_rows([row.to_csv_row() for row in rows])
 
-    # Calculate the percentage of 'Correct' values that are True
-    percent_total = round(value_counts.get(True, 0) * 100, 2)
 
-    # Group by 'Use_case_id'
-    results_by_use_case_id = results.groupby('Use_case_id')
+def judge_reasoning(rows, reasoning_solutions, max_in_flight=1):
+    """
+    Sets Reasoning_correct of the rows with correct actions, the reasonings of all test cases are compared
+    together, see ReasoningJudge.compare_many().
+
+    Parameters:
+        rows (DataFrame): Rows of score_test_cases().
+        reasoning_solutions (dict): Expected reasoning by Test_data_id.
+        max_in_flight (int): Maximum number of reasoning comparisons sent to the LLM at the same time.
+    """
+    correct = rows[rows['Correct']].drop_duplicates('Test_data_id')
+    pairs = [(reasoning_solutions[index], reasoning) for index, reasoning in zip(correct['Test_data_id'],
+                                                                                  correct['Reasoning'])]
+    verdicts = dict(zip(correct['Test_data_id'], asyncio.run(reasoning_judge.compare_many(pairs, max_in_flight))))
+    rows['Reasoning_correct'] = rows['Correct'] & rows['Test_data_id'].map(lambda index: verdicts.get(index, False))
 
-    percent_by_use_case = round(results_by_use_case_id['Correct'].mean() * 100, 2)
-    percent_by_use_case_reasoning = round(results_by_use_case_id['Reasoning_correct'].mean() * 100, 2)
 
-    # Group by both 'Use_case_id' and 'Test_data_id'
-    results_grouped = results.groupby(['Use_case_id', 'Test_data_id'])
-    percent_by_test_data = round(results_grouped['Correct'].mean() * 100, 2)
-    percent_by_test_data_reasoning = round(results_grouped['Reasoning_correct'].mean() * 100, 2)
-    percent_wrong_order = round(results_grouped['Correct_Wrong_Order'].mean() * 100, 2)
+def evaluate_stored_transcripts(test_cases, transcripts, result_actions, compare_reasoning, variables,
+                                max_in_flight=1):
+    """
+    Evaluates the stored transcripts of all given test cases at once with the vectorized score_test_cases()
+    and judge_reasoning(), then adds the rows to result_actions.
 
-    print(f"\nPercentage total: {percent_total}% \n")
-    print(f"Percentage by use_case: \n {percent_by_use_case}, {percent_by_use_case_reasoning} \n")
-    print(f"Percentage by test data: \n {percent_by_test_data}, {percent_by_test_data_reasoning}, {percent_wrong_order}\n")
+    Parameters:
+        test_cases (list): TestCase of the test cases.
+        transcripts (TranscriptStore): Store with the transcripts of the test cases.
+        max_in_flight (int): Maximum number of reasoning comparisons sent to the LLM at the same time.
+    """
+    results = transcripts.load_many([test_case.test_data_id for test_case in test_cases])
+    formatted = []
+    for test_case, result in zip(test_cases, results):
+        data_solution, data_result, reasoning_result = data_formatting(result, test_case.actions)
+        formatted.append((test_case.use_case_id, test_case.test_data_id, data_solution, data_result,
+                          reasoning_result))
+    rows = score_test_cases(formatted, variables, optional_endpoints)
 
-    unique_use_case_ids = results['Use_case_id'].unique()
+    if compare_reasoning:
+        judge_reasoning(rows, {test_case.test_data_id: test_case.reasoning for test_case in test_cases},
+                        max_in_flight)
 
-    for use_case_id in unique_use_case_ids:
-        use_case_data = percent_by_test_data[percent_by_test_data.index.get_level_values('Use_case_id') == use_case_id]
-        percent_100 = (use_case_data == 100.00).mean() * 100
-        percent_0 = (use_case_data == 0.00).mean() * 100
-        print(f"Use_case {use_case_id}:")
-        print(f"Percentage of 100.00 test values: {percent_100:.2f}%")
-        print(f"Percentage of 0.00 test values: {percent_0:.2f}%")
+    result_actions.add_rows([list(row) for row in rows.itertuples(index=False, name=None)])
 
 
 def test_application():
@@ -462,6 +644,7 @@ def test_application():
         Main function for testing the application.
         The function will go through all created use cases and for each use case,
         based on the number iteration create test data.
+        cli.py runs every mode as subcommand without editing this function.
     """
     # generate_test_data_from_use_case(use_case_nr=0)
 
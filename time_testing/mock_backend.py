@@ -0,0 +1,175 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+from lmql import LMQLResult
+
+from lmql_prompting.call_api import book_time, delete_time, read_time
+from lmql_prompting.settings import csv_data_path
+from lmql_prompting.streaming import check_stopped, stream_text
+from time_testing.action_parser import Endpoint, action_to_dict, parse_actions
+from time_testing.data_model import Action, TestCase, read_test_cases
+from time_testing.reasoning_judge import normalize_reasoning, token_overlap
+from time_testing.transcript_store import open_transcripts
+
+TOOLS = {'book_time': book_time, 'read_time': read_time, 'delete_time': delete_time}
+# Observations of the tools if they are not called
+OFFLINE_OBSERVATIONS = {'book_time': 'book time: 200', 'read_time': '[]', 'delete_time': 'delete time: 200'}
+
+# Tool call of a transcript, e.g. book_time('{"employee": "Max"}')
+_TOOL_CALL = re.compile(r"Action:\s*(\w+)\('(.*?)'\)")
+
+
+def _prompt_key(prompt):
+    return ' '.join(str(prompt).lower().split())
+
+
+class MockBackend:
+    """
+    Answers the LMQL queries without a model, to measure the overhead of the harness (CSV I/O, parsing, scoring,
+    tool calls) offline and deterministically.
+
+    reAct_booking looks the prompt up in the test data. With mode='replay' the stored transcript of the test case
+    is returned and its tool calls are sent again, test cases without transcript are synthesized. With
+    mode='synthesize' a ReAct trace with one Thought/Action/Observation step per action of the Actions column is
+    written, the observations are the answers of the tools. Prompts that are not in the test data get a trace
+    without actions. compare_reasoning answers 'true' if the token overlap of the reasonings reaches
+    match_threshold and generate_prompt writes a request from the actions.
+
+    Every model call (every ReAct step) sleeps latency seconds plus a uniform jitter of up to jitter seconds.
+    The steps are reported to the current stream (see lmql_prompting.streaming) one by one, so a streamed
+    generation can be stopped early like an LMQL one.
+
+    Parameters:
+        mode (str): 'replay' or 'synthesize'.
+        test_data (DataFrame, optional): Test data with Prompt and Actions, test_data.csv if None.
+        transcripts (TranscriptStore, optional): Transcripts for replay, the ones of open_transcripts() if None.
+        latency, jitter (float): Artificial latency of a model call in seconds.
+        call_tools (bool): Whether the tools are called, without the time booking application is not needed.
+        match_threshold (float): Token overlap from which compare_reasoning answers 'true'.
+        seed (int): Seed of the jitter and of the wording of generated prompts.
+        trailing_steps (int): Synthesized traces go on with this many read_time steps after the last action.
+    """
+
+    def __init__(self, mode='synthesize', test_data=None, transcripts=None, latency=0.0, jitter=0.0,
+                 call_tools=True, match_threshold=0.5, seed=0, trailing_steps=0):
+        if mode not in ('replay', 'synthesize'):
+            raise ValueError(f"Unknown mode '{mode}', expected 'replay' or 'synthesize'")
+        self.name = f'mock-{mode}'
+        self.mode = mode
+        self.latency = latency
+        self.jitter = jitter
+        self.call_tools = call_tools
+        self.match_threshold = match_threshold
+        self.seed = seed
+        self.trailing_steps = trailing_steps
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._prompts_per_actions = {}
+        self._lock = threading.Lock()
+
+        test_cases = read_test_cases(csv_data_path) if test_data is None else TestCase.from_frame(test_data)
+        self._test_cases = {_prompt_key(test_case.prompt): test_case for test_case in test_cases}
+        if mode == 'replay' and transcripts is None:
+            transcripts = open_transcripts()
+        self.transcripts = transcripts
+
+    def config(self, config):
+        # mocked results must never answer queries of the real model from the response cache
+        return dict(config, model=self.name)
+
+    def _wait(self):
+        # like a cancelled LMQL query, a stream that asked to stop ends the generation before its next model call
+        check_stopped()
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _run_tool(self, tool, argument):
+        if not self.call_tools or tool not in TOOLS:
+            return OFFLINE_OBSERVATIONS.get(tool, f'Unknown tool {tool}')
+        # the unwrapped tool, the steps are reported to the stream by _step()
+        return asyncio.run(TOOLS[tool].__wrapped__(argument))
+
+    @staticmethod
+    def _step(reasoning, text, generated=True):
+        stream_text(text, generated)
+        return reasoning + text
+
+    def _synthesize(self, actions):
+        reasoning = ''
+        if actions and self.trailing_steps:
+            # a model that does not stop after the last action and keeps reading the bookings
+            actions = actions + [Action(Endpoint.READ_TIME, actions[0].employee)] * self.trailing_steps
+        for action in actions:
+            # the JSON arguments of the tool call
+            action = action_to_dict(action)
+            endpoint = action.pop('endpoint')
+            if 'time' in action:
+                action['time'] = int(action['time'])
+            argument = json.dumps(action)
+            self._wait()
+            observation = self._run_tool(endpoint, argument)
+            reasoning = self._step(reasoning, f'\n  Thought: I need to use the "{endpoint}" action with the '
+                                              f"appropriate parameters.\n\nAction: {endpoint}('{argument}')\n")
+            reasoning = self._step(reasoning, f"Observation: {observation}", generated=False)
+        self._wait()
+        return self._step(reasoning, '\n  Thought: The request has been handled.')
+
+    def _replay(self, transcript):
+        reasoning, position = '', 0
+        for observation in re.finditer(r'Observation:[^\n]*', transcript):
+            for tool, argument in _TOOL_CALL.findall(transcript, position, observation.start()):
+                self._wait()
+                self._run_tool(tool, argument)
+            reasoning = self._step(reasoning, transcript[position:observation.start()])
+            reasoning = self._step(reasoning, transcript[observation.start():observation.end()], generated=False)
+            position = observation.end()
+        self._wait()
+        return self._step(reasoning, transcript[position:])
+
+    def reAct_booking(self, content, few_shot_examples):
+        test_case = self._test_cases.get(_prompt_key(content))
+        if test_case is not None and self.mode == 'replay' and test_case.test_data_id in self.transcripts:
+            reasoning = self._replay(self.transcripts.load(test_case.test_data_id).variables.get('REASONING') or '')
+        elif test_case is not None:
+            reasoning = self._synthesize(test_case.expected_actions)
+        else:
+            reasoning = self._synthesize([])
+        prompt = f"{few_shot_examples}Task: {content}A: Let's think step by step\n{reasoning}\n" \
+                 f"Request successfully handled."
+        return [LMQLResult(prompt, {'REASONING': reasoning})]
+
+    def compare_reasoning(self, solution, result):
+        self._wait()
+        overlap = token_overlap(normalize_reasoning(solution), normalize_reasoning(result))
+        answer = 'true' if overlap >= self.match_threshold else 'false'
+        return [LMQLResult(f'{solution}\n\n{result}\n\n{answer}', {'answer': answer})]
+
+    def generate_prompt(self, use_case, new_actions):
+        self._wait()
+        # the wording only depends on the seed, the actions and how often they were asked for before, so generated
+        # test data is reproducible and a repeated request gets another wording
+        with self._lock:
+            attempt = self._prompts_per_actions.get(new_actions, 0)
+            self._prompts_per_actions[new_actions] = attempt + 1
+        digest = hashlib.sha256(f'{self.seed}:{new_actions}:{attempt}'.encode('utf-8')).digest()
+        requests = []
+        for action in parse_actions(new_actions):
+            if action.endpoint == 'book_time':
+                requests.append(f"book {action.employee} {action.time} hours on the project {action.project}")
+            elif action.endpoint == 'delete_time':
+                requests.append(f"delete the {action.time} hours of {action.employee} on the project "
+                                f"{action.project}")
+            else:
+                requests.append(f"check all bookings for {action.employee}")
+        opening = ['Please', 'Could you', 'I need you to', 'Can you'][digest[0] % 4]
+        closing = ['.', ', thanks.', ' today.', ', please.'][digest[1] % 4]
+        prompt_new = f"{opening} {'. After that, please '.join(requests)}{closing}"
+        return [LMQLResult(prompt_new, {'prompt_new': prompt_new})]
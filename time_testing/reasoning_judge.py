@@ -0,0 +1,117 @@
+import asyncio
+import re
+
+from time_testing.concurrency import retry_with_backoff, run_concurrently
+
+
+def normalize_reasoning(reasoning):
+    """
+    Lower case text without numbering, punctuation and repeated whitespace, used to compare two reasonings.
+    """
+    if not isinstance(reasoning, str):
+        return ''
+    reasoning = re.sub(r'^\s*\d+\.\s*', ' ', reasoning.lower(), flags=re.MULTILINE)
+    reasoning = re.sub(r'[^\w\s]', ' ', reasoning)
+    return ' '.join(reasoning.split())
+
+
+def token_overlap(reasoning_a, reasoning_b):
+    """
+    Jaccard similarity of the words of two normalized reasonings, between 0 and 1.
+    """
+    tokens_a, tokens_b = set(reasoning_a.split()), set(reasoning_b.split())
+    if not tokens_a and not tokens_b:
+        return 1.0
+    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+
+
+class ReasoningJudge:
+    """
+    Decides whether two reasonings have the same meaning, asking the LLM only if it cannot be decided locally.
+
+    Pairs with the same normalized text are equal, pairs with a token overlap of at least match_threshold are
+    treated as equal and pairs with an overlap of at most mismatch_threshold (or an empty side) as different.
+    Only the remaining pairs are passed to compare. Every verdict is remembered, so a pair is judged once.
+
+    Parameters:
+        compare (callable): Blocking function (solution, result) -> bool asking the LLM, e.g. do_compare_reasoning.
+        match_threshold (float): Token overlap from which two reasonings are equal without asking the LLM.
+        mismatch_threshold (float): Token overlap up to which two reasonings differ without asking the LLM.
+    """
+
+    def __init__(self, compare, match_threshold=0.85, mismatch_threshold=0.1):
+        self.compare_with_llm = compare
+        self.match_threshold = match_threshold
+        self.mismatch_threshold = mismatch_threshold
+        self.prefiltered = 0
+        self.judged = 0
+        self._verdicts = {}
+
+    @staticmethod
+    def _key(solution, result):
+        return normalize_reasoning(solution), normalize_reasoning(result)
+
+    def prefilter(self, solution, result):
+        """
+        Returns True or False if the normalized pair can be decided locally, otherwise None.
+        """
+        if solution == result:
+            return True
+        if not solution or not result:
+            return False
+        overlap = token_overlap(solution, result)
+        if overlap >= self.match_threshold:
+            return True
+        if overlap <= self.mismatch_threshold:
+            return False
+        return None
+
+    def _decide_locally(self, key):
+        if key in self._verdicts:
+            return self._verdicts[key]
+        verdict = self.prefilter(*key)
+        if verdict is not None:
+            self.prefiltered += 1
+            self._verdicts[key] = verdict
+        return verdict
+
+    def compare(self, solution, result):
+        """
+        Blocking comparison of one pair.
+        """
+        key = self._key(solution, result)
+        verdict = self._decide_locally(key)
+        if verdict is None:
+            verdict = self.compare_with_llm(solution, result)
+            self.judged += 1
+            self._verdicts[key] = verdict
+        return verdict
+
+    async def compare_many(self, pairs, max_in_flight=1, max_retries=3):
+        """
+        Compares several (solution, result) pairs, the pairs that are left for the LLM are sent with up to
+        max_in_flight queries at the same time. A pair for which every attempt fails counts as different.
+
+        Returns:
+            list: One verdict per pair.
+        """
+        pairs = list(pairs)
+        keys = [self._key(solution, result) for solution, result in pairs]
+        ambiguous = {}
+        for key, pair in zip(keys, pairs):
+            if key not in ambiguous and self._decide_locally(key) is None:
+                ambiguous[key] = pair
+
+        async def judge(worker_id, item):
+            key, (solution, result) = item
+            try:
+                verdict = await retry_with_backoff(lambda: asyncio.to_thread(self.compare_with_llm, solution, result),
+                                                   max_retries, description='Comparing the reasoning')
+            except Exception as e:
+                print("Something went wrong with the evaluation", e)
+                verdict = False
+            self.judged += 1
+            self._verdicts[key] = verdict
+
+        await run_concurrently(ambiguous.items(), judge, max(1, min(max_in_flight, len(ambiguous))))
+        return [self._verdicts[key] for key in keys]
@@ -0,0 +1,265 @@
+"""
+Compares the results of several runs. Run from the time_testing directory:
+
+    python report.py [run directories] [--baseline DIR] [--output report.csv|report.json]
+
+Without run directories all data/data_run_* directories and the current results in data/ are compared. The
+arguments are parsed by cli.py, like those of python cli.py report --all.
+"""
+import hashlib
+import os
+import pickle
+import sys
+
+import numpy as np
+import pandas as pd
+
+from lmql_prompting.settings import csv_results, report_cache_dir, rescored_results_name, trace_dir
+from lmql_prompting.tracing import latest_trace, summarize_traces
+from time_testing.columnar import columnar_columns, columnar_path, is_fresh, read_columnar, read_csv
+
+# Accuracy metrics of results.csv, columns missing in the results of older runs are skipped
+METRICS = ['Correct', 'Correct_Wrong_Order', 'Endpoint', 'Employee', 'Project', 'Time', 'Reasoning_correct']
+# z value of the 95% confidence intervals
+Z_95 = 1.959963984540054
+
+# Parsed results by path, with the modification time they were parsed at
+_loaded_results = {}
+
+
+def _extract_endpoint(solutions):
+    return solutions.str.extract(r"'endpoint': '(\w+)'", expand=False)
+
+
+def _prepare_results(results):
+    # older runs call the employee column Name
+    results = results.rename(columns={'Name': 'Employee'})
+    if 'Use_case_id' in results:
+        results['Use_case_id'] = results['Use_case_id'].astype('category')
+    if 'Action_solution' in results:
+        solutions = results['Action_solution']
+        if isinstance(solutions.dtype, pd.CategoricalDtype):
+            # dictionary encoded by columnar.py, the endpoint only has to be extracted once per distinct action
+            endpoints = _extract_endpoint(pd.Series(solutions.cat.categories, dtype=object)).to_numpy(dtype=object)
+            # code -1 (missing value) picks the appended NaN
+            endpoints = np.append(endpoints, np.nan)
+            results['Action_endpoint'] = pd.Categorical(endpoints[solutions.cat.codes.to_numpy()])
+        else:
+            results['Action_endpoint'] = _extract_endpoint(solutions).astype('category')
+    return results.drop(columns=['Reasoning', 'Action_solution'], errors='ignore')
+
+
+def _parse_results(path):
+    return _prepare_results(read_csv(path))
+
+
+def _columnar_results(path, columns):
+    stored_columns = columnar_columns(path)
+    if columns is not None:
+        # Employee is stored as Name by older runs, Action_endpoint is extracted from Action_solution
+        columns = [column for column in columns if column not in ('Employee', 'Action_endpoint')] + \
+                  (['Name', 'Employee'] if 'Employee' in columns else []) + \
+                  (['Action_solution'] if 'Action_endpoint' in columns else [])
+    return _prepare_results(read_columnar(path, [column for column in columns or stored_columns
+                                                 if column in stored_columns]))
+
+
+def load_results(path, columns=None):
+    """
+    Loads a results.csv of any run format as DataFrame with categorical Use_case_id and Action_endpoint.
+
+    If the columnar copy of the file (see columnar.py) is up to date, only the requested columns are read from it.
+    Otherwise parsed results are cached in memory and as pickle in report_cache_dir, keyed by the path and the
+    modification time of the file, so unchanged results are only parsed once.
+
+    Parameters:
+        path (str): The results.csv.
+        columns (list, optional): Columns that are needed, all if None. Columns older runs do not have are skipped.
+    """
+    if is_fresh(path):
+        return _columnar_results(columnar_path(path), columns)
+    results = _load_csv_results(path)
+    return results if columns is None else results[[column for column in columns if column in results]]
+
+
+def _load_csv_results(path):
+    path = os.path.abspath(path)
+    modified = os.stat(path).st_mtime_ns
+    cached = _loaded_results.get(path)
+    if cached is not None and cached[0] == modified:
+        return cached[1]
+
+    cache_path = os.path.join(report_cache_dir, hashlib.sha1(path.encode('utf-8')).hexdigest() + '.pkl')
+    try:
+        with open(cache_path, 'rb') as cache_file:
+            cached_modified, results = pickle.load(cache_file)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        cached_modified, results = None, None
+    if cached_modified != modified:
+        results = _parse_results(path)
+        os.makedirs(report_cache_dir, exist_ok=True)
+        with open(cache_path + '.tmp', 'wb') as cache_file:
+            pickle.dump((modified, results), cache_file)
+        os.replace(cache_path + '.tmp', cache_path)
+
+    _loaded_results[path] = (modified, results)
+    return results
+
+
+def wilson_interval(successes, totals, z=Z_95):
+    """
+    Wilson score confidence intervals of proportions, works on arrays.
+
+    Returns:
+        tuple: Lower and upper bounds.
+    """
+    successes, totals = np.asarray(successes, dtype=float), np.asarray(totals, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        proportion = successes / totals
+        center = (proportion + z ** 2 / (2 * totals)) / (1 + z ** 2 / totals)
+        margin = z * np.sqrt(proportion * (1 - proportion) / totals + z ** 2 / (4 * totals ** 2)) / (1 + z ** 2 / totals)
+    return center - margin, center + margin
+
+
+def summarize_run(results):
+    """
+    Accuracy of every metric over all use cases ('all') and per use case, without the optional actions.
+
+    Returns:
+        DataFrame: Columns use_case_id, metric, n, correct, accuracy, ci_low, ci_high.
+    """
+    results = results[results['Optional'] != True]
+    metrics = [metric for metric in METRICS if metric in results and results[metric].notna().any()]
+    by_use_case = results.groupby('Use_case_id', observed=True)[metrics].agg(['sum', 'count'])
+    totals = results[metrics].agg(['sum', 'count'])
+
+    rows = []
+    for metric in metrics:
+        correct = np.concatenate([[totals.loc['sum', metric]], by_use_case[(metric, 'sum')].to_numpy()])
+        n = np.concatenate([[totals.loc['count', metric]], by_use_case[(metric, 'count')].to_numpy()])
+        rows.append(pd.DataFrame({
+            'use_case_id': ['all'] + [str(use_case_id) for use_case_id in by_use_case.index],
+            'metric': metric,
+            'n': n.astype(int),
+            'correct': correct.astype(int),
+        }))
+    summary = pd.concat(rows, ignore_index=True)
+    summary['accuracy'] = summary['correct'] / summary['n']
+    summary['ci_low'], summary['ci_high'] = wilson_interval(summary['correct'], summary['n'])
+    return summary
+
+
+def run_results_path(run_dir):
+    """
+    The results of a run: results_rescored.csv if rescore.py re-scored the run, otherwise results.csv. A
+    re-scoring with another number of rows than results.csv (e.g. from transcripts of other test cases, or of a
+    changed metric) is not used without notice, results.csv is used then.
+    """
+    recorded = os.path.join(run_dir, 'results.csv')
+    rescored = os.path.join(run_dir, rescored_results_name)
+    if not os.path.exists(rescored):
+        return recorded
+    if os.path.exists(recorded):
+        recorded_rows = len(read_csv(recorded, ['Test_data_id']))
+        rescored_rows = len(read_csv(rescored, ['Test_data_id']))
+        if rescored_rows != recorded_rows:
+            print(f'{run_dir}: {rescored_results_name} has {rescored_rows} rows, results.csv {recorded_rows}, '
+                  f'the recorded results.csv is reported')
+            return recorded
+    return rescored
+
+
+def compare_runs(run_dirs, baseline=None):
+    """
+    Accuracy of every run and its difference to the baseline run, per use case and metric.
+
+    Parameters:
+        run_dirs (list): Directories with a results.csv, see run_results_path().
+        baseline (str, optional): Run the others are compared with, the first run if None.
+
+    Returns:
+        DataFrame: One row per run, use case and metric with the columns of summarize_run() and delta,
+        delta_ci_low, delta_ci_high (95% Wald interval of the difference to the baseline).
+    """
+    baseline = baseline or run_dirs[0]
+    summaries = []
+    for run_dir in dict.fromkeys([baseline] + list(run_dirs)):
+        summary = summarize_run(load_results(run_results_path(run_dir), ['Use_case_id', 'Optional'] + METRICS))
+        summary.insert(0, 'run', os.path.basename(os.path.normpath(run_dir)))
+        summaries.append(summary)
+    report = pd.concat(summaries, ignore_index=True)
+
+    base = summaries[0].set_index(['use_case_id', 'metric'])
+    base = base.reindex(pd.MultiIndex.from_frame(report[['use_case_id', 'metric']]))
+    base_accuracy, base_n = base['accuracy'].to_numpy(), base['n'].to_numpy(dtype=float)
+    accuracy, n = report['accuracy'].to_numpy(), report['n'].to_numpy(dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        margin = Z_95 * np.sqrt(accuracy * (1 - accuracy) / n + base_accuracy * (1 - base_accuracy) / base_n)
+    report['baseline'] = summaries[0]['run'].iloc[0]
+    report['delta'] = accuracy - base_accuracy
+    report['delta_ci_low'] = report['delta'] - margin
+    report['delta_ci_high'] = report['delta'] + margin
+    return report
+
+
+def write_report(report, path):
+    """
+    Writes the report as JSON (records) if the path ends with .json, otherwise as semicolon separated CSV.
+    """
+    if path.endswith('.json'):
+        report.to_json(path, orient='records', indent=2)
+    else:
+        report.to_csv(path, sep=';', index=False)
+
+
+def display_results(trace_path=None):
+    # Load the needed columns of the CSV file into a DataFrame, see compare_runs() for comparing several runs
+    results = load_results(csv_results, ['Use_case_id', 'Test_data_id', 'Optional', 'Correct', 'Correct_Wrong_Order',
+                                         'Reasoning_correct'])
+
+    # Filter out rows where 'Optional' is False
+    results = results[results['Optional'] == False]
+
+    # Calculate the value counts for 'Correct' column
+    value_counts = results['Correct'].value_counts(normalize=True)
+
+    # Calculate the percentage of 'Correct' values that are True
+    percent_total = round(value_counts.get(True, 0) * 100, 2)
+
+    # Group by 'Use_case_id'
+    results_by_use_case_id = results.groupby('Use_case_id', observed=True)
+
+    percent_by_use_case = round(results_by_use_case_id['Correct'].mean() * 100, 2)
+    percent_by_use_case_reasoning = round(results_by_use_case_id['Reasoning_correct'].mean() * 100, 2)
+
+    # Group by both 'Use_case_id' and 'Test_data_id'
+    results_grouped = results.groupby(['Use_case_id', 'Test_data_id'], observed=True)
+    percent_by_test_data = round(results_grouped['Correct'].mean() * 100, 2)
+    percent_by_test_data_reasoning = round(results_grouped['Reasoning_correct'].mean() * 100, 2)
+    percent_wrong_order = round(results_grouped['Correct_Wrong_Order'].mean() * 100, 2)
+
+    print(f"\nPercentage total: {percent_total}% \n")
+    print(f"Percentage by use_case: \n {percent_by_use_case}, {percent_by_use_case_reasoning} \n")
+    print(f"Percentage by test data: \n {percent_by_test_data}, {percent_by_test_data_reasoning}, {percent_wrong_order}\n")
+
+    unique_use_case_ids = results['Use_case_id'].unique()
+
+    for use_case_id in unique_use_case_ids:
+        use_case_data = percent_by_test_data[percent_by_test_data.index.get_level_values('Use_case_id') == use_case_id]
+        percent_100 = (use_case_data == 100.00).mean() * 100
+        percent_0 = (use_case_data == 0.00).mean() * 100
+        print(f"Use_case {use_case_id}:")
+        print(f"Percentage of 100.00 test values: {percent_100:.2f}%")
+        print(f"Percentage of 0.00 test values: {percent_0:.2f}%")
+
+    # Latency and token percentiles of the run, by default of the latest trace
+    trace_path = trace_path or latest_trace(trace_dir)
+    if trace_path:
+        print(f"\nLatency (s) and tokens by use_case ({os.path.basename(trace_path)}):")
+        print(summarize_traces(trace_path).round(3).T.to_string())
+
+
+if __name__ == '__main__':
+    # same as python cli.py report --all [run directories] ...
+    from time_testing.cli import main
+    main(['report', '--all'] + sys.argv[1:])
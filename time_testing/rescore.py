@@ -0,0 +1,131 @@
+"""
+Re-scores the stored transcripts of earlier runs with the current metric. Run from the time_testing directory:
+
+    python rescore.py [run directories] [--workers N] [--shard-size N] [--compare-reasoning]
+
+Without run directories all data/data_run_* directories are re-scored. The results are written to
+results_rescored.csv, the results.csv of the run stays as it was recorded. The arguments are parsed by cli.py, like
+those of python cli.py rescore.
+"""
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from lmql_prompting.settings import data_run_dirs, optional_endpoints, rescored_results_name
+from time_testing.columnar import read_csv
+from time_testing.data_model import TestCase
+from time_testing.result_sink import ResultSink
+from time_testing.scoring import data_formatting, get_variable_names, result_columns, score_test_cases
+from time_testing.transcript_store import TranscriptStore, open_transcripts, transcript_matches
+
+
+def score_shard(transcripts_path, test_cases, variables):
+    """
+    Scores a shard of the test cases of one run, runs in a worker process.
+
+    Parameters:
+        transcripts_path (str): Transcript store of the run.
+        test_cases (list): TestCase of the test cases.
+        variables (list): Variables of the actions, see get_variable_names().
+
+    Returns:
+        DataFrame: Rows of score_test_cases().
+    """
+    results = TranscriptStore(transcripts_path).load_many([test_case.test_data_id for test_case in test_cases])
+    formatted = []
+    for test_case, result in zip(test_cases, results):
+        data_solution, data_result, reasoning_result = data_formatting(result, test_case.actions)
+        formatted.append((test_case.use_case_id, test_case.test_data_id, data_solution, data_result,
+                          reasoning_result))
+    return score_test_cases(formatted, variables, optional_endpoints)
+
+
+def recorded_verdicts(results_path):
+    """
+    Reasoning verdict of every test case in the results.csv of a run, True if any of its rows has a correct
+    reasoning.
+
+    Returns:
+        Series: Verdict per Test_data_id, None if the file is missing or the run did not compare the reasoning.
+    """
+    if not os.path.exists(results_path):
+        return None
+    results = read_csv(results_path, ['Test_data_id', 'Reasoning_correct'])
+    if 'Reasoning_correct' not in results:
+        return None
+    return results.groupby('Test_data_id')['Reasoning_correct'].any()
+
+
+def rescore_runs(run_dirs=None, max_workers=None, shard_size=50, compare_reasoning=False, max_in_flight=1):
+    """
+    Re-scores the transcripts of several runs and writes the results to results_rescored.csv of every run.
+
+    The test cases of all runs are split into shards of shard_size test cases that are scored by a pool of
+    max_workers processes. The shards of a run are merged in the order of the Test_data_ids, so the results
+    do not depend on which shard finishes first. Test cases whose transcript does not have their prompt are left
+    out. The recorded results.csv is left untouched. Without
+    compare_reasoning the reasoning verdicts recorded in it are kept for the rows that are still correct, runs
+    that never compared the reasoning get an empty Reasoning_correct. results_rescored.csv is written to a
+    temporary file first and then replaces the one of an earlier re-scoring.
+
+    Parameters:
+        run_dirs (list, optional): Run directories with test_data.csv and results_lmql.csv (or
+        results_lmql.jsonl), all data/data_run_* directories if None.
+        max_workers (int, optional): Number of processes, the number of CPUs if None.
+        shard_size (int): Number of test cases per shard.
+        compare_reasoning (bool): Also compare the reasoning, only for runs whose test data has a Reasoning column.
+        max_in_flight (int): Maximum number of reasoning comparisons sent to the LLM at the same time.
+    """
+    run_dirs = run_dirs or sorted(glob.glob(data_run_dirs))
+    variables = get_variable_names()
+
+    runs = []
+    for run_dir in run_dirs:
+        transcripts_path = os.path.join(run_dir, 'results_lmql.jsonl')
+        # import and index the transcripts once before the workers read them
+        transcripts = open_transcripts(transcripts_path, os.path.join(run_dir, 'results_lmql.csv'),
+                                       os.path.join(run_dir, 'test_data.csv'), os.path.join(run_dir, 'results.csv'))
+        test_data = pd.read_csv(os.path.join(run_dir, 'test_data.csv'), sep=';')
+        test_data = test_data[[index in transcripts for index in test_data.index]]
+        # a transcript stored for another test case (e.g. by an import of an older version) is not scored
+        matches = [transcript_matches(transcript.prompt, prompt)
+                   for transcript, prompt in zip(transcripts.load_many(test_data.index), test_data['Prompt'])]
+        if not all(matches):
+            print(f"{run_dir}: {matches.count(False)} transcripts do not have the prompt of their test case and "
+                  f"are not re-scored")
+        test_data = test_data[matches]
+        test_cases = TestCase.from_frame(test_data)
+        shards = [test_cases[start:start + shard_size] for start in range(0, len(test_cases), shard_size)]
+        runs.append((run_dir, transcripts_path, test_data, shards))
+
+    with ProcessPoolExecutor(max_workers) as pool:
+        futures = [[pool.submit(score_shard, transcripts_path, shard, variables) for shard in shards]
+                   for _, transcripts_path, _, shards in runs]
+
+        for (run_dir, _, test_data, _), run_futures in zip(runs, futures):
+            rows = [future.result() for future in run_futures]
+            rows = pd.concat(rows, ignore_index=True) if rows else pd.DataFrame(columns=result_columns(variables))
+            if compare_reasoning and 'Reasoning' in test_data:
+                # the reasoning is compared by the LLM, only then LMQL is imported
+                from time_testing.main import judge_reasoning
+                judge_reasoning(rows, test_data['Reasoning'].to_dict(), max_in_flight)
+            else:
+                verdicts = recorded_verdicts(os.path.join(run_dir, 'results.csv'))
+                rows['Reasoning_correct'] = None if verdicts is None else \
+                    rows['Correct'] & rows['Test_data_id'].map(verdicts).fillna(False).astype(bool)
+
+            path = os.path.join(run_dir, rescored_results_name)
+            with ResultSink(path + '.tmp', result_columns(variables)) as result_actions:
+                result_actions.add_rows([list(row) for row in rows.itertuples(index=False, name=None)])
+            os.replace(path + '.tmp', path)
+            print(f"{run_dir}: {len(test_data)} test cases, {len(rows)} rows, "
+                  f"{rows['Correct'].mean() * 100 if len(rows) else 0:.2f}% correct")
+
+
+if __name__ == '__main__':
+    # same as python cli.py rescore [run directories] ...
+    from time_testing.cli import main
+    main(['rescore'] + sys.argv[1:])
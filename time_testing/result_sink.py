@@ -0,0 +1,109 @@
+import csv
+import io
+import os
+
+
+class ResultSink:
+    """
+    Appends evaluation rows to a semicolon separated CSV file (same format as DataFrame.to_csv(sep=';')).
+
+    Rows are buffered and written in batches of flush_every rows, the file is never rewritten. Rows of one test
+    case should be added with a single add_rows() call, batches are only cut between such calls, so the file
+    always ends with a complete test case.
+
+    Parameters:
+        path (str): CSV file the rows are written to.
+        columns (list): Column names, written as header of a new file.
+        flush_every (int): Number of buffered rows after which they are written to the file.
+        resume (bool): Keep the rows of an existing file with the same columns and continue after the last
+        complete row, otherwise the file is started anew.
+    """
+
+    def __init__(self, path, columns, flush_every=50, resume=False):
+        self.path = path
+        self.columns = list(columns)
+        self.flush_every = flush_every
+        self.rows_written = 0
+        self.completed_test_data_ids = set()
+        self._buffer = []
+        self._test_data_id = self.columns.index('Test_data_id')
+
+        if not (resume and self._load_existing()):
+            with open(self.path, 'w', newline='', encoding='utf-8') as csvfile:
+                self._writer(csvfile).writerow(self.columns)
+
+    @staticmethod
+    def _writer(file):
+        return csv.writer(file, delimiter=';', lineterminator='\n')
+
+    def _load_existing(self):
+        """
+        Reads the rows of an existing file and cuts off an incomplete last row.
+
+        Returns:
+            bool: Whether the existing file can be continued.
+        """
+        try:
+            with open(self.path, 'r', newline='', encoding='utf-8') as csvfile:
+                content = csvfile.read()
+        except FileNotFoundError:
+            return False
+
+        consumed = 0
+
+        def lines():
+            nonlocal consumed
+            # only split at \n, other line breaks can be part of the stored reasoning
+            while consumed < len(content):
+                end = content.find('\n', consumed)
+                end = len(content) if end == -1 else end + 1
+                line = content[consumed:end]
+                consumed = end
+                yield line
+
+        reader = csv.reader(lines(), delimiter=';')
+        if next(reader, None) != self.columns:
+            return False
+        complete = consumed
+        for row in reader:
+            if len(row) != len(self.columns) or content[consumed - 1] != '\n':
+                break
+            self.completed_test_data_ids.add(int(row[self._test_data_id]))
+            self.rows_written += 1
+            complete = consumed
+
+        if complete < len(content):
+            # The last write was interrupted, drop the incomplete row
+            with open(self.path, 'r+b') as file:
+                file.truncate(len(content[:complete].encode('utf-8')))
+        return True
+
+    def add_rows(self, rows):
+        """
+        Adds the rows (lists in the order of the columns) of one test case.
+        """
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        output = io.StringIO()
+        self._writer(output).writerows(self._buffer)
+        with open(self.path, 'a', newline='', encoding='utf-8') as csvfile:
+            csvfile.write(output.getvalue())
+            csvfile.flush()
+            os.fsync(csvfile.fileno())
+        self.completed_test_data_ids.update(int(row[self._test_data_id]) for row in self._buffer)
+        self.rows_written += len(self._buffer)
+        self._buffer = []
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
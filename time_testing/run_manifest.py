@@ -0,0 +1,96 @@
+import json
+import os
+import time
+
+# Status of a test case in the manifest
+QUERIED = 'queried'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class RunManifest:
+    """
+    Checkpoint of an evaluation run: status, number of LLM attempts and last error of every Test_data_id.
+
+    Every change is appended as one JSON line {"test_data_id": ..., "status": ..., "attempts": ..., "error": ...},
+    the last line of a test case wins. A test case is 'queried' once its transcript is stored, 'done' once it is
+    scored and 'failed' if all attempts failed. A line left incomplete by a crash is dropped when the manifest is
+    opened again.
+
+    Parameters:
+        path (str): JSONL file of the manifest.
+        resume (bool): Continue an existing manifest, otherwise it is started anew.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.entries = {}
+        if resume:
+            self._load()
+        else:
+            open(self.path, 'w').close()
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as manifest_file:
+                content = manifest_file.read()
+        except FileNotFoundError:
+            return
+        complete = content.rfind(b'\n') + 1
+        for line in content[:complete].splitlines():
+            entry = json.loads(line)
+            self.entries[entry['test_data_id']] = entry
+        if complete < len(content):
+            with open(self.path, 'r+b') as manifest_file:
+                manifest_file.truncate(complete)
+
+    def _write(self, test_data_id, status, attempts, error=None):
+        entry = {'test_data_id': int(test_data_id), 'status': status, 'attempts': attempts,
+                 'error': None if error is None else f'{type(error).__name__}: {error}',
+                 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        with open(self.path, 'a', encoding='utf-8') as manifest_file:
+            manifest_file.write(json.dumps(entry) + '\n')
+            manifest_file.flush()
+            os.fsync(manifest_file.fileno())
+        self.entries[entry['test_data_id']] = entry
+
+    def status(self, test_data_id):
+        entry = self.entries.get(int(test_data_id))
+        return entry['status'] if entry else None
+
+    def attempts(self, test_data_id):
+        """
+        Number of LLM attempts of the test case over all runs of this manifest.
+        """
+        entry = self.entries.get(int(test_data_id))
+        return entry['attempts'] if entry else 0
+
+    def has_transcript(self, test_data_id):
+        """
+        Whether the transcript of the test case was stored by this run, so the LLM must not be queried again.
+        """
+        return self.status(test_data_id) in (QUERIED, DONE)
+
+    def queried(self, test_data_id, attempts):
+        self._write(test_data_id, QUERIED, self.attempts(test_data_id) + attempts)
+
+    def done(self, test_data_id):
+        self._write(test_data_id, DONE, self.attempts(test_data_id))
+
+    def failed(self, test_data_id, attempts, error):
+        self._write(test_data_id, FAILED, self.attempts(test_data_id) + attempts, error)
+
+    def failures(self):
+        """
+        Returns the entries of the failed test cases.
+        """
+        return [entry for entry in self.entries.values() if entry['status'] == FAILED]
+
+    def counts(self):
+        """
+        Returns the number of test cases per status.
+        """
+        counts = {}
+        for entry in self.entries.values():
+            counts[entry['status']] = counts.get(entry['status'], 0) + 1
+        return counts
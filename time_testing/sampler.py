@@ -0,0 +1,281 @@
+import collections
+import itertools
+import math
+
+import numpy as np
+
+from time_testing.action_parser import replace_field_values
+
+MIN_HOURS_BOOKABLE = 1
+MAX_HOURS_BOOKABLE = 8
+# Strategies of sample_assignments()
+STRATEGIES = ('random', 'stratified', 'pairwise')
+# Random candidate rows scored for every row added to a pairwise covering set
+PAIRWISE_CANDIDATES = 32
+# Up to this many rows a pairwise set that cannot cover all pairs is searched row by row, larger ones are cut
+PAIRWISE_GREEDY_ROWS = 1000
+# Random rows a stratified duplicate that is left after all shuffles may swap values with, per step
+STRATIFIED_PARTNERS = 1024
+# Swaps tried per duplicate before it is left for a random unused row
+STRATIFIED_STEPS = 100
+
+
+class ActionTemplate:
+    """
+    The actions of a use case with their field values as slots that are filled with sampled values.
+
+    Every distinct field value is one slot, e.g. '["book_time(employee: Hans, project: AI Time, time: 4)",
+    "delete_time(employee: Hans, project: XYZ, time: 1)"]' has the slots Hans, AI Time, 4, XYZ and 1. Like
+    replace_action_values() did, a value that occurs several times gets the same replacement everywhere.
+
+    Parameters:
+        actions (str): Actions of the use case.
+        constraints (dict): Possible values of every field, 'INT' for hours, see get_variables_constraints().
+    """
+
+    def __init__(self, actions, constraints):
+        slots = {}
+        self.fields = []
+
+        def mark(field, value):
+            if value not in slots:
+                slots[value] = len(slots)
+                self.fields.append(field)
+            return f'\0{slots[value]}\0'
+
+        # even parts are the text between the values, odd parts the slot numbers
+        self.parts = replace_field_values(actions, mark).split('\0')
+        self.domains = [np.array([str(hours) for hours in range(MIN_HOURS_BOOKABLE, MAX_HOURS_BOOKABLE + 1)]
+                                 if constraints[field] == 'INT' else list(constraints[field]), dtype=object)
+                        for field in self.fields]
+
+    @property
+    def sizes(self):
+        return [len(domain) for domain in self.domains]
+
+    def fill(self, assignments):
+        """
+        The actions for every row of assignments (one value index per slot), see sample_assignments().
+
+        Returns:
+            list: One actions string per row.
+        """
+        texts = np.full(len(assignments), '', dtype=object)
+        for position, part in enumerate(self.parts):
+            if position % 2 == 0:
+                texts += part
+            else:
+                slot = int(part)
+                texts += self.domains[slot][assignments[:, slot]]
+        return texts.tolist()
+
+
+def _distinct(codes, n, total, rng):
+    """
+    Keeps the first occurrence of every code and adds random unused codes until there are n.
+    """
+    _, first = np.unique(codes, return_index=True)
+    codes = codes[np.sort(first)][:n]
+    missing = n - len(codes)
+    if missing > 0 and total - len(codes) <= 4 * missing:
+        # most of the unused codes are needed, drawing them at random would mostly hit used ones
+        unused = np.setdiff1d(np.arange(total), codes, assume_unique=True)
+        return np.concatenate([codes, rng.choice(unused, missing, replace=False)])
+    while missing > 0:
+        drawn = rng.integers(0, total, size=2 * missing)
+        drawn = drawn[~np.isin(drawn, codes)]
+        _, first = np.unique(drawn, return_index=True)
+        drawn = drawn[np.sort(first)][:missing]
+        codes = np.concatenate([codes, drawn])
+        missing -= len(drawn)
+    return codes
+
+
+def _duplicates(rows, sizes):
+    """
+    Returns:
+        tuple: The codes of the rows, the indices of the rows whose code occurs in an earlier row and the sorted
+        distinct codes.
+    """
+    codes = np.ravel_multi_index(rows.T, sizes)
+    present, first = np.unique(codes, return_index=True)
+    duplicates = np.ones(len(rows), dtype=bool)
+    duplicates[first] = False
+    return codes, np.flatnonzero(duplicates), present
+
+
+def _contains(present, codes):
+    if not len(present):
+        return np.zeros(len(codes), dtype=bool)
+    positions = np.minimum(np.searchsorted(present, codes), len(present) - 1)
+    return present[positions] == codes
+
+
+def _stratified(sizes, n, rng, max_rounds=30):
+    """
+    Every value of a slot is used equally often (up to one), the columns are shuffled independently. Duplicate
+    rows are removed by swapping values with other rows, which keeps the counts of every value: for max_rounds
+    every duplicate swaps the value of a random slot with a random other row if neither is used twice afterwards.
+    The duplicates left after that swap the values of some slots with one of STRATIFIED_PARTNERS random rows so
+    that they are not used twice afterwards, if the partner is then, it is swapped on the same way, up to
+    STRATIFIED_STEPS times. Only a duplicate that is left after that is replaced by a random unused row in
+    sample_assignments(), the one case in which the balance is not exact.
+    """
+    rows = np.column_stack([rng.permutation(np.resize(np.arange(size), n)) for size in sizes])
+    for _ in range(max_rounds):
+        codes, duplicates, present = _duplicates(rows, sizes)
+        if not len(duplicates):
+            return rows
+        # every duplicate swaps the value of a random slot with a distinct other row if neither row is used twice
+        # afterwards, partners drawn with repetition would copy values instead
+        others = np.ones(n, dtype=bool)
+        others[duplicates] = False
+        partners = rng.permutation(np.flatnonzero(others))[:len(duplicates)]
+        duplicates = duplicates[:len(partners)]
+        column = rng.integers(len(sizes))
+        swapped, moved = rows[duplicates], rows[partners]
+        swapped[:, column], moved[:, column] = rows[partners, column], rows[duplicates, column]
+        swapped_codes = np.ravel_multi_index(swapped.T, sizes)
+        moved_codes = np.ravel_multi_index(moved.T, sizes)
+        new_codes, counts = np.unique(np.concatenate([swapped_codes, moved_codes]), return_counts=True)
+        once = new_codes[counts == 1]
+        accepted = (_contains(once, swapped_codes) & _contains(once, moved_codes)
+                    & ~_contains(present, swapped_codes) & ~_contains(present, moved_codes))
+        rows[duplicates[accepted]], rows[partners[accepted]] = swapped[accepted], moved[accepted]
+
+    codes, duplicates, _ = _duplicates(rows, sizes)
+    used = collections.Counter(codes.tolist())
+    subsets = [list(columns) for size in range(1, len(sizes))
+               for columns in itertools.combinations(range(len(sizes)), size)]
+    for row in duplicates:
+        if used[codes[row]] < 2:
+            # fixed as the partner of an earlier duplicate
+            continue
+        for _ in range(STRATIFIED_STEPS):
+            partners = rng.choice(n, size=min(n, STRATIFIED_PARTNERS), replace=False)
+            swaps = []
+            for columns in subsets:
+                # the row takes the values of a partner in these columns, the partner those of the row
+                swapped = np.repeat(rows[row:row + 1], len(partners), axis=0)
+                swapped[:, columns] = rows[partners][:, columns]
+                moved = rows[partners]
+                moved[:, columns] = rows[row, columns]
+                swapped_codes = np.ravel_multi_index(swapped.T, sizes).tolist()
+                moved_codes = np.ravel_multi_index(moved.T, sizes).tolist()
+                swaps += [(not used[moved_code] and moved_code != swapped_code, partner, columns)
+                          for partner, swapped_code, moved_code in zip(partners, swapped_codes, moved_codes)
+                          if not used[swapped_code]]
+            if not swaps:
+                break
+            # a swap after which neither row is used twice, otherwise the partner is the next row to fix
+            done, partner, columns = max(swaps, key=lambda swap: (swap[0], rng.random()))
+            used[codes[row]] -= 1
+            used[codes[partner]] -= 1
+            rows[row, columns], rows[partner, columns] = rows[partner, columns], rows[row, columns]
+            codes[row], codes[partner] = np.ravel_multi_index(rows[[row, partner]].T, sizes)
+            used[codes[row]] += 1
+            used[codes[partner]] += 1
+            if done:
+                break
+            row = partner
+    return rows
+
+
+def _pairwise(sizes, n, rng):
+    """
+    Rows until every pair of values of every two slots occurs in a row (or n rows). All combinations of the two
+    slots with the most values are used and the other slots get shifted values of them, so most pairs are covered
+    without searching. If these rows do not fit into n rows they are cut to n, unless n is at most
+    PAIRWISE_GREEDY_ROWS, then all rows are searched as below.
+    Each pair that is still missing is covered greedily: the row covers a missing pair of the slots with the most
+    missing pairs and, among PAIRWISE_CANDIDATES random candidates, as many other missing pairs as possible.
+    """
+    order = np.argsort(sizes, kind='stable')[::-1]
+    grid = np.indices((sizes[order[0]], sizes[order[1]])).reshape(2, -1)
+    if n < grid.shape[1] and n <= PAIRWISE_GREEDY_ROWS:
+        # not even the pairs of the two largest slots fit, the greedy search covers the most pairs with n rows
+        grid = grid[:, :0]
+    rows = np.empty((grid.shape[1], len(sizes)), dtype=np.int64)
+    rows[:, order[0]], rows[:, order[1]] = grid
+    for step, column in enumerate(order[2:], start=1):
+        values = rng.permutation(sizes[column])
+        rows[:, column] = values[(grid[0] + step * grid[1] + rng.integers(sizes[column])) % sizes[column]]
+    rows = rows[rng.permutation(len(rows))][:n]
+
+    pairs = [(first, second) for first in range(len(sizes)) for second in range(first + 1, len(sizes))]
+    uncovered = [np.ones((sizes[first], sizes[second]), dtype=bool) for first, second in pairs]
+    for table, (first, second) in zip(uncovered, pairs):
+        table[rows[:, first], rows[:, second]] = False
+    left = np.array([table.sum() for table in uncovered])
+
+    added = []
+    while left.any() and len(rows) + len(added) < n:
+        pair = int(np.argmax(left))
+        first_value, second_value = np.unravel_index(rng.choice(np.flatnonzero(uncovered[pair])),
+                                                     uncovered[pair].shape)
+        candidates = rng.integers(0, sizes, size=(PAIRWISE_CANDIDATES, len(sizes)))
+        candidates[:, pairs[pair][0]] = first_value
+        candidates[:, pairs[pair][1]] = second_value
+        gain = sum(table[candidates[:, first], candidates[:, second]]
+                   for table, (first, second) in zip(uncovered, pairs))
+        row = candidates[int(np.argmax(gain))]
+        for number, (table, (first, second)) in enumerate(zip(uncovered, pairs)):
+            left[number] -= table[row[first], row[second]]
+            table[row[first], row[second]] = False
+        added.append(row)
+    return np.concatenate([rows, np.array(added, dtype=np.int64).reshape(-1, len(sizes))])
+
+
+def sample_assignments(sizes, n, rng, strategy='random'):
+    """
+    Draws n distinct combinations of value indices at once.
+
+    Parameters:
+        sizes (list): Number of values of every slot.
+        n (int): Number of combinations, at most the number of possible combinations are returned.
+        rng (numpy.random.Generator): Source of randomness, the same seed gives the same combinations.
+        strategy (str): 'random' draws uniformly without replacement. 'stratified' uses every value of a slot
+        equally often (see _stratified()). 'pairwise' first covers every pair of values of every two slots, as far
+        as n rows allow. Duplicates that remain are replaced by random unused combinations.
+
+    Returns:
+        ndarray: Shape (n, len(sizes)), the value index of every slot per row.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f'Unknown sampling strategy {strategy}, expected one of {STRATEGIES}')
+    total = math.prod(sizes)
+    if total >= 1 << 63:
+        raise ValueError(f'{total} combinations do not fit into 64 bit codes')
+    n = min(n, total)
+    if not sizes:
+        return np.zeros((n, 0), dtype=np.int64)
+
+    if n == total:
+        # every combination is used, which is balanced and covers all pairs anyway
+        strategy = 'random'
+    if strategy == 'stratified' or (strategy == 'pairwise' and len(sizes) < 2):
+        rows = _stratified(sizes, n, rng)
+    elif strategy == 'pairwise':
+        rows = _pairwise(sizes, n, rng)
+    else:
+        return np.column_stack(np.unravel_index(rng.choice(total, n, replace=False), sizes))
+    codes = _distinct(np.ravel_multi_index(rows.T, sizes).astype(np.int64), n, total, rng)
+    return np.column_stack(np.unravel_index(codes, sizes))
+
+
+def sample_actions(actions, constraints, n, seed=None, strategy='random'):
+    """
+    n distinct variations of the actions of a use case with sampled field values, see ActionTemplate.
+
+    Parameters:
+        actions (str): Actions of the use case.
+        constraints (dict): From get_variables_constraints().
+        n (int): Number of variations, fewer if the actions have fewer value combinations.
+        seed: Seed (int or list of int) or numpy.random.Generator, None for a random seed.
+        strategy (str): See sample_assignments().
+
+    Returns:
+        list: The actions strings.
+    """
+    template = ActionTemplate(actions, constraints)
+    return template.fill(sample_assignments(template.sizes, n, np.random.default_rng(seed), strategy))
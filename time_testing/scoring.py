@@ -0,0 +1,260 @@
+import ast
+import csv
+import re
+
+import numpy as np
+import pandas as pd
+
+from lmql_prompting.settings import csv_types_path
+from time_testing.action_parser import action_to_dict, clean_action, csv_action, parse_actions
+from time_testing.literals import parse_literal
+
+
+def get_actions(result):
+    """
+    Extracts and returns the actions from the given lmql result.
+
+    Parameters:
+        result (dict): A dictionary containing the result.
+
+    Returns:
+        list: A list of strings representing the extracted actions.
+    """
+    variables = result.variables['REASONING']
+    result = re.findall(r'Action:(.*?)Observation', variables, re.DOTALL)
+    result = [action.strip() for action in result]
+    return result
+
+
+def get_reasoning(result):
+    """
+    Extracts and returns the reasoning provided by the lmql result.
+
+    Parameters:
+        result (dict): A dictionary containing the result.
+
+    Returns:
+        list: A list of strings representing the extracted actions.
+    """
+    try:
+        variables = result.variables['REASONING']
+        result = re.findall(r'Thought:(.*?)\n\nAction', variables, re.DOTALL)
+        result = '\n'.join([f"{i + 1}. {item}" for i, item in enumerate(result)])
+        return result
+    except Exception as e:
+        print("Something went wrong when evaluating the reasoning:", e)
+        return None
+
+
+def data_formatting(result, provided_actions):
+    actions = get_actions(result)
+    reasoning = get_reasoning(result)
+    try:
+        actions = list(actions)
+    except Exception as e:
+        return print('Could not cast the provided actions to a list', e)
+
+    data_result = []
+
+    for action in actions:
+        data_result.append(parse_actions(clean_action(action, remove_double_spaces=True)))
+
+    # remove all empty actions where nothing happend
+    data_result = [sublist for sublist in data_result if sublist]
+
+    data_solution = []
+    provided_actions = re.sub(r'"', "'", provided_actions)
+    provided_actions = parse_literal(provided_actions)
+    for action in provided_actions:
+        data_solution.append(parse_actions(clean_action(action)))
+
+    return data_solution, data_result, reasoning
+
+
+def get_variables_constraints():
+    """
+    Generate variable and constraint strings based on data from a CSV file.
+
+    Returns:
+        tuple: A tuple containing two strings:
+            1. variable_string (str): A string representing a list of variables.
+            2. constraint_string (str): A string representing the constraints for the variables.
+            This string contains a list as a string with all possible values for a variable.
+    """
+    data_dict = {}
+
+    with open(csv_types_path, 'r') as file:
+        csv_reader = csv.DictReader(file)
+        for row in csv_reader:
+            data_dict = row
+    variable_string = ""
+    constraint_string = ""
+    constraint = {}
+    counter = 1
+    for key, value in data_dict.items():
+        variable_string += f"[{key}]"
+        if value == "INT":
+            constraint_string += f"INT({key})"
+            constraint[key] = value
+        else:
+            try:
+                list(value)
+                constraint_string += f"{key} in {value}"
+                constraint[key] = ast.literal_eval(value)
+            except Exception as e:
+                print('You did not provide a correct list filled with values ', e)
+        if counter < len(data_dict):
+            variable_string += ", "
+            constraint_string += " and "
+            counter += 1
+    return variable_string, constraint
+
+
+def get_variable_names():
+    """
+    Returns the names of the variables of the actions, e.g. ['employee', 'project', 'time'].
+    """
+    variables, constraints = get_variables_constraints()
+    split_elements = variables.split(', ')
+    return [element.strip('[] ') for element in split_elements]
+
+
+def result_columns(variables):
+    """
+    Columns of results.csv for the given variables, see get_variables_constraints().
+    """
+    return (['Use_case_id', 'Test_data_id', 'Correct', 'Correct_Wrong_Order', 'Optional', 'Action_solution',
+             'Endpoint'] + [variable.capitalize() for variable in variables] + ['Reasoning_correct', 'Reasoning'])
+
+
+class _Codes(dict):
+    """
+    Assigns consecutive integer codes to hashable values.
+    """
+
+    def code(self, value):
+        return self.setdefault(value, len(self))
+
+
+def score_test_cases(test_cases, variables, optional_endpoints):
+    """
+    Scores the actions of many test cases at once, with the same results as evaluate_actions_and_reasoning().
+
+    The actions are encoded as integer codes in padded arrays (test case x position), one array for the whole
+    actions and one per field. The expected actions are consumed in order: a test case advances to its next
+    expected action whenever an action matches the current one. All test cases take this step together, so the
+    number of vectorized steps is the length of the longest action sequence.
+
+    Parameters:
+        test_cases (list): (Use_case_id, Test_data_id, data_solution, data_result, reasoning) per test case,
+        data_solution, data_result and reasoning as returned by data_formatting().
+        variables (list): Variables of the actions, see get_variables_constraints().
+        optional_endpoints (list): Endpoints whose unexpected calls count as optional.
+
+    Returns:
+        DataFrame: Rows of results.csv, see result_columns(). Reasoning_correct is False everywhere, the
+        reasoning of the rows with Correct still has to be compared.
+    """
+    fields = ['endpoint'] + list(variables)
+    action_codes = _Codes()
+    field_codes = [_Codes() for _ in fields]
+    optional_endpoints = set(optional_endpoints)
+
+    def field_code(action, field_index):
+        value = getattr(action[0], fields[field_index], None) if action else None
+        if value is None:
+            return -1
+        return field_codes[field_index].code(value)
+
+    number_of_cases = len(test_cases)
+    solution_lengths = np.array([len(case[2]) for case in test_cases], dtype=np.int64)
+    max_solutions = int(solution_lengths.max(initial=0))
+    solution_codes = np.full((number_of_cases, max_solutions), -1, dtype=np.int64)
+    solution_fields = np.full((len(fields), number_of_cases, max_solutions), -1, dtype=np.int64)
+
+    result_case, result_position, result_code, result_action, result_optional = [], [], [], [], []
+    result_fields = [[] for _ in fields]
+    for case, (_, _, data_solution, data_result, _) in enumerate(test_cases):
+        for position, action in enumerate(data_solution):
+            solution_codes[case, position] = action_codes.code(tuple(action))
+            for field_index in range(len(fields)):
+                solution_fields[field_index, case, position] = field_code(action, field_index)
+        for position, action in enumerate(data_result):
+            result_case.append(case)
+            result_position.append(position)
+            result_code.append(action_codes.code(tuple(action)))
+            result_action.append(action[0])
+            result_optional.append(action[0].endpoint in optional_endpoints)
+            for field_index in range(len(fields)):
+                result_fields[field_index].append(field_code(action, field_index))
+
+    result_case = np.array(result_case, dtype=np.int64)
+    result_position = np.array(result_position, dtype=np.int64)
+    result_code = np.array(result_code, dtype=np.int64)
+    result_optional = np.array(result_optional, dtype=bool)
+    result_fields = np.array(result_fields, dtype=np.int64).reshape(len(fields), len(result_case))
+
+    correct = np.zeros(len(result_case), dtype=bool)
+    wrong_order = np.zeros(len(result_case), dtype=bool)
+    field_correct = np.ones((len(fields), len(result_case)), dtype=bool)
+    next_solution = np.zeros(number_of_cases, dtype=np.int64)
+    columns = np.arange(max_solutions)
+
+    for position in range(int(result_position.max(initial=-1)) + 1):
+        rows = np.flatnonzero(result_position == position)
+        cases = result_case[rows]
+        current = next_solution[cases]
+        has_current = current < solution_lengths[cases]
+        current = np.where(has_current, current, 0)
+        current_codes = np.where(has_current, solution_codes[cases, current] if max_solutions else -1, -1)
+
+        match = result_code[rows] == current_codes
+        if max_solutions:
+            current_fields = solution_fields[:, cases, current]
+            row_fields = result_fields[:, rows]
+            field_correct[:, rows] = ~((has_current & ~match) & (row_fields != current_fields) &
+                                       (row_fields >= 0) & (current_fields >= 0))
+            # is the action one of the expected actions that are still left?
+            remaining = columns[None, :] >= next_solution[cases][:, None]
+            in_remaining = ((solution_codes[cases] == result_code[rows][:, None]) & remaining).any(axis=1)
+        else:
+            in_remaining = np.zeros(len(rows), dtype=bool)
+
+        correct[rows] = match
+        wrong_order[rows] = in_remaining
+        next_solution[cases] += match
+
+    # expected actions that were never done
+    missing_case, missing_position = np.nonzero((columns[None, :] >= next_solution[:, None]) &
+                                                (columns[None, :] < solution_lengths[:, None]))
+
+    use_case_ids = np.array([case[0] for case in test_cases], dtype=object)
+    test_data_ids = np.array([case[1] for case in test_cases], dtype=object)
+    reasonings = np.array([case[4] for case in test_cases], dtype=object)
+    action_solutions = np.empty(len(result_case) + len(missing_case), dtype=object)
+    # filled one by one, numpy would unpack the lists of the missing actions
+    for row, action in enumerate(result_action):
+        action_solutions[row] = action_to_dict(action)
+    for row, (case, position) in enumerate(zip(missing_case, missing_position), start=len(result_case)):
+        action_solutions[row] = csv_action(test_cases[case][2][position])
+    missing = np.zeros(len(missing_case), dtype=bool)
+
+    frame = {
+        'Use_case_id': np.concatenate([use_case_ids[result_case], use_case_ids[missing_case]]),
+        'Test_data_id': np.concatenate([test_data_ids[result_case], test_data_ids[missing_case]]),
+        'Correct': np.concatenate([correct, missing]),
+        'Correct_Wrong_Order': np.concatenate([wrong_order, missing]),
+        'Optional': np.concatenate([~wrong_order & result_optional, missing]),
+        'Action_solution': action_solutions,
+    }
+    for field, field_name in zip(field_correct, ['Endpoint'] + [variable.capitalize() for variable in variables]):
+        frame[field_name] = np.concatenate([field, missing])
+    frame['Reasoning_correct'] = np.zeros(len(action_solutions), dtype=bool)
+    frame['Reasoning'] = np.concatenate([reasonings[result_case], np.full(len(missing_case), '', dtype=object)])
+    frame = pd.DataFrame(frame, columns=result_columns(variables))
+
+    # rows of a test case in the order of evaluate_actions_and_reasoning(): the actions, then the missing ones
+    order = np.lexsort((np.concatenate([result_position, missing_position]),
+                        np.concatenate([np.zeros(len(result_case)), np.ones(len(missing_case))]),
+                        np.concatenate([result_case, missing_case])))
+    return frame.iloc[order].reset_index(drop=True)
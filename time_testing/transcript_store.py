@@ -0,0 +1,201 @@
+import json
+import os
+from collections import namedtuple
+
+from lmql_prompting.settings import csv_data_path, csv_results, csv_results_lmql, jsonl_results_lmql
+from time_testing.columnar import read_csv
+from time_testing.literals import parse_literal
+
+# A stored transcript, has the prompt and variables of the LMQLResult it was stored from (without importing LMQL)
+Transcript = namedtuple('Transcript', ['prompt', 'variables'])
+
+# Start of the reasoning in the prompt of a transcript, the task with the prompt of the test case comes before
+REASONING_START = "A: Let's think step by step"
+
+
+class TranscriptStore:
+    """
+    Append-only store for the LMQL transcripts of the test cases.
+
+    Every transcript is one JSON line {"test_data_id": ..., "prompt": ..., "variables": {...}} in the data file.
+    The byte offset of every line is kept in an index file next to it (<path>.idx), so a transcript can be
+    loaded without reading the other ones. If a test case is stored several times the last transcript wins.
+
+    Parameters:
+        path (str): Data file of the store, e.g. results_lmql.jsonl.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + '.idx'
+        self._offsets = {}
+        self._size = 0
+        self._load_index()
+
+    def _load_index(self):
+        try:
+            self._size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            open(self.path, 'w').close()
+            self._size = 0
+
+        indexed_size = 0
+        try:
+            with open(self.index_path, 'r') as index_file:
+                for line in index_file:
+                    test_data_id, offset, length = map(int, line.split())
+                    self._offsets[test_data_id] = (offset, length)
+                    indexed_size = max(indexed_size, offset + length)
+        except (FileNotFoundError, ValueError):
+            indexed_size = -1
+
+        if indexed_size != self._size:
+            self._rebuild_index()
+
+    def _rebuild_index(self):
+        """
+        Scans the data file once and writes a new index, needed if the index is missing or out of date.
+        """
+        self._offsets = {}
+        offset = 0
+        with open(self.path, 'rb') as data_file:
+            for line in data_file:
+                if line.endswith(b'\n'):
+                    self._offsets[json.loads(line)['test_data_id']] = (offset, len(line))
+                    offset += len(line)
+        if offset != self._size:
+            # Drop a line left incomplete by an interrupted write
+            with open(self.path, 'r+b') as data_file:
+                data_file.truncate(offset)
+            self._size = offset
+        with open(self.index_path, 'w') as index_file:
+            index_file.writelines(f'{test_data_id} {offset} {length}\n'
+                                  for test_data_id, (offset, length) in self._offsets.items())
+
+    def append(self, test_data_id, result):
+        """
+        Stores the transcript of a test case.
+
+        Parameters:
+            test_data_id (int): Test case the transcript belongs to.
+            result (LMQLResult): Result of reAct_booking.
+        """
+        self.append_many([(test_data_id, result)])
+
+    def append_many(self, transcripts):
+        """
+        Stores several (test_data_id, result) transcripts with one write.
+        """
+        lines, index = [], []
+        offset = self._size
+        for test_data_id, result in transcripts:
+            line = json.dumps({'test_data_id': int(test_data_id), 'prompt': result.prompt,
+                               'variables': result.variables}, default=str).encode('utf-8') + b'\n'
+            lines.append(line)
+            index.append((int(test_data_id), offset, len(line)))
+            offset += len(line)
+        with open(self.path, 'ab') as data_file:
+            data_file.writelines(lines)
+        with open(self.index_path, 'a') as index_file:
+            index_file.writelines(f'{test_data_id} {offset} {length}\n' for test_data_id, offset, length in index)
+        for test_data_id, offset, length in index:
+            self._offsets[test_data_id] = (offset, length)
+        self._size = offset
+
+    def load(self, test_data_id):
+        """
+        Returns the stored transcript of a test case as Transcript.
+        """
+        offset, length = self._offsets[int(test_data_id)]
+        with open(self.path, 'rb') as data_file:
+            data_file.seek(offset)
+            record = json.loads(data_file.read(length))
+        return Transcript(record['prompt'], record['variables'])
+
+    def load_many(self, test_data_ids):
+        """
+        Returns the stored transcripts of several test cases as list of Transcript, reading the data file once.
+        """
+        spans = [self._offsets[int(test_data_id)] for test_data_id in test_data_ids]
+        results = [None] * len(spans)
+        with open(self.path, 'rb') as data_file:
+            for position in sorted(range(len(spans)), key=lambda position: spans[position][0]):
+                offset, length = spans[position]
+                data_file.seek(offset)
+                record = json.loads(data_file.read(length))
+                results[position] = Transcript(record['prompt'], record['variables'])
+        return results
+
+    def __contains__(self, test_data_id):
+        return int(test_data_id) in self._offsets
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def import_csv(self, csv_path, test_data_path, results_path=None):
+        """
+        Imports a results_lmql.csv of an earlier run. Its rows are in the order of the test cases, but failed test
+        cases have none, so every row is matched to its test case by the prompts of test_data_path:
+            - the n-th row belongs to the n-th test case of results_path (the distinct Test_data_ids in the order
+              they were evaluated), if its prompt is the one of this test case
+            - otherwise to the next test case after the one of the previous row with this prompt
+        Rows whose prompt matches no test case are not imported.
+
+        Older runs store all variables as dict literal, newer ones only the REASONING variable.
+
+        Returns:
+            int: Number of rows that were not imported.
+        """
+        transcripts = read_csv(csv_path)
+        test_prompts = read_csv(test_data_path, ['Test_data_id', 'Prompt']).set_index('Test_data_id')['Prompt']
+        test_data_ids = list(test_prompts.index)
+        recorded = []
+        if results_path is not None and os.path.exists(results_path):
+            recorded = list(dict.fromkeys(read_csv(results_path, ['Test_data_id'])['Test_data_id']))
+
+        records, imported, skipped = [], set(), 0
+        position = 0
+        for row, (prompt, variables) in enumerate(zip(transcripts['prompt'], transcripts['variables'])):
+            if row < len(recorded) and recorded[row] in test_prompts.index and \
+                    transcript_matches(prompt, test_prompts[recorded[row]]):
+                test_data_id = recorded[row]
+            else:
+                test_data_id = next((test_data_id for test_data_id in test_data_ids[position:]
+                                     if test_data_id not in imported
+                                     and transcript_matches(prompt, test_prompts[test_data_id])), None)
+                if test_data_id is None:
+                    skipped += 1
+                    continue
+            position = test_data_ids.index(test_data_id) + 1
+            imported.add(test_data_id)
+            if isinstance(variables, str) and variables.startswith('{'):
+                variables = parse_literal(variables)
+            else:
+                variables = {'REASONING': variables if isinstance(variables, str) else ''}
+            records.append((test_data_id, Transcript(prompt, variables)))
+        self.append_many(records)
+        if skipped:
+            print(f'{csv_path}: {skipped} transcripts match no test case of {test_data_path} and were not imported')
+        return skipped
+
+
+def transcript_matches(transcript_prompt, test_prompt):
+    """
+    Whether a transcript was generated for the prompt of a test case. The transcript starts with the task, which
+    has the prompt of the test case in the template of its run (e.g. "Task: {prompt}"), before the reasoning.
+    """
+    if not isinstance(transcript_prompt, str) or not isinstance(test_prompt, str) or not test_prompt.strip():
+        return False
+    return test_prompt.strip() in transcript_prompt.split(REASONING_START)[0]
+
+
+def open_transcripts(jsonl_path=jsonl_results_lmql, csv_path=csv_results_lmql, test_data_path=csv_data_path,
+                     results_path=csv_results):
+    """
+    Opens the transcript store of the LLM results. If it does not exist yet the transcripts of
+    results_lmql.csv are imported and matched to the test cases of test_data_path, see TranscriptStore.import_csv().
+    """
+    transcripts = TranscriptStore(jsonl_path)
+    if len(transcripts) == 0 and os.path.exists(csv_path):
+        transcripts.import_csv(csv_path, test_data_path, results_path)
+    return transcripts